@@ -1,10 +1,21 @@
+import os
+
 import dash
+from dash import DiskcacheManager
 import dash_bootstrap_components as dbc
+import diskcache
+
+from scenari import DIRECTORY_CACHE
+
+# Le analisi pesanti girano come job in background in processi separati: stato, avanzamento e
+# risultati passano da una cache su disco condivisa dai worker, senza broker esterni
+gestore_job = DiskcacheManager(diskcache.Cache(os.path.join(DIRECTORY_CACHE, 'job')))
 
 app = dash.Dash(
     __name__,
     external_stylesheets=[dbc.themes.LUX], #Tema Chiaro
-    suppress_callback_exceptions=True
+    suppress_callback_exceptions=True,
+    background_callback_manager=gestore_job
 )
 server = app.server
-app.title = "Strawberry Analytics"
\ No newline at end of file
+app.title = "Strawberry Analytics"
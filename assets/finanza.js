@@ -0,0 +1,48 @@
+// Modello finanziario della dashboard eseguito nel browser.
+// Replica simula_performance_finanziaria (data.py) sui valori di produzione e consumo
+// inviati dal server in store-simulazione: gli input economici non generano richieste.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    finanza: {
+        aggiorna_vista_finanziaria: function (simulazione, prezzo, costoAcqua, costoFert, costiExtra,
+                                              commento, figSankey, figCosti) {
+            if (!simulazione) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update,
+                        window.dash_clientside.no_update];
+            }
+
+            // Conversione del valore di un dcc.Input, con fallback a 0 se non valido
+            const numero = function (valore) {
+                const convertito = parseFloat(valore);
+                return Number.isFinite(convertito) ? convertito : 0;
+            };
+
+            // Ricavi, costi (acqua litri -> m³, extra €/Ha -> €/m²) e profitto per m²
+            const ricavi = simulazione.produzione * numero(prezzo);
+            const costi = [
+                (simulazione.acqua / 1000) * numero(costoAcqua),
+                simulazione.fertilizzanti * numero(costoFert),
+                numero(costiExtra) / 10000
+            ];
+            const costiTotali = costi[0] + costi[1] + costi[2];
+            const profitto = ricavi - costiTotali;
+
+            // Le figure vengono ricostruite a partire da quelle correnti senza modificarle sul posto
+            const sankey = figSankey.data[0];
+            const nuovoSankey = Object.assign({}, figSankey, {
+                data: [Object.assign({}, sankey, {
+                    link: Object.assign({}, sankey.link, {value: [costiTotali, profitto]})
+                })].concat(figSankey.data.slice(1))
+            });
+            const nuoveCosti = Object.assign({}, figCosti, {
+                data: [Object.assign({}, figCosti.data[0], {values: costi})].concat(figCosti.data.slice(1))
+            });
+
+            const testo = commento
+                .replace('{ricavi}', ricavi.toFixed(2))
+                .replace('{costi}', costiTotali.toFixed(2))
+                .replace('{profitto}', profitto.toFixed(2));
+            return [nuovoSankey, nuoveCosti, testo];
+        }
+    }
+});
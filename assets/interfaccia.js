@@ -0,0 +1,40 @@
+// Interazioni statiche della dashboard eseguite nel browser: apertura/chiusura dei modali
+// e applicazione dei preset. I contenuti sono già nella pagina, quindi nessuna richiesta al server.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    interfaccia: {
+        // Modale generico: il primo input è il pulsante di apertura, il secondo quello di chiusura
+        commuta_modale: function (nApri, nChiudi, aperto) {
+            const contesto = window.dash_clientside.callback_context;
+            if (!contesto.triggered_id) {
+                return window.dash_clientside.no_update;
+            }
+            return contesto.triggered_id === contesto.inputs_list[0].id ? true
+                : contesto.triggered_id === contesto.inputs_list[1].id ? false : aperto;
+        },
+
+        // Copia i valori del preset del pulsante premuto nei dropdown, nell'ordine degli output
+        applica_preset: function () {
+            const contesto = window.dash_clientside.callback_context;
+            const presets = arguments[arguments.length - 1];
+            const preset = presets[contesto.triggered_id];
+            if (!preset) {
+                return contesto.outputs_list.map(function () { return window.dash_clientside.no_update; });
+            }
+            return contesto.outputs_list.map(function (output) { return preset[output.id]; });
+        },
+
+        // Applica ai dropdown la configurazione suggerita del pulsante premuto e chiude il modale
+        // (l'ultimo output); i pulsanti appena inseriti nella tabella hanno n_clicks 0 e vengono ignorati
+        applica_suggerimento: function (nClicks, suggerimenti) {
+            const contesto = window.dash_clientside.callback_context;
+            const premuto = contesto.triggered.length ? contesto.triggered[0].value : 0;
+            const configurazione = premuto && suggerimenti ? suggerimenti[contesto.triggered_id.index] : null;
+            if (!configurazione) {
+                return contesto.outputs_list.map(function () { return window.dash_clientside.no_update; });
+            }
+            const dropdown = contesto.outputs_list.slice(0, -1);
+            return dropdown.map(function (output) { return configurazione[output.id]; }).concat([false]);
+        }
+    }
+});
@@ -0,0 +1,90 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheRisultati:
+    """
+    Cache in-process limitata per numero di voci (eviction LRU) e per età (TTL),
+    con contatori di hit e miss. È thread-safe, quindi utilizzabile anche con worker a thread.
+    """
+
+    def __init__(self, dimensione_massima: int = 512, ttl_secondi: float = 600.0, orologio=time.monotonic):
+        if dimensione_massima <= 0:
+            raise ValueError("La dimensione massima della cache deve essere positiva")
+        self.dimensione_massima = dimensione_massima
+        self.ttl_secondi = ttl_secondi
+        self._orologio = orologio
+        self._voci = OrderedDict()  # chiave -> (scadenza, valore)
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+        self.scadute = 0
+        self.espulse = 0
+
+    def __len__(self):
+        return len(self._voci)
+
+    def leggi(self, chiave) -> tuple[bool, object]:
+        """
+        Restituisce (True, valore) se la chiave è presente e non scaduta, altrimenti (False, None).
+        """
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is not None:
+                scadenza, valore = voce
+                if self._orologio() < scadenza:
+                    self._voci.move_to_end(chiave)
+                    self.hit += 1
+                    return True, valore
+                del self._voci[chiave]
+                self.scadute += 1
+            self.miss += 1
+            return False, None
+
+    def scrivi(self, chiave, valore) -> None:
+        """
+        Inserisce o aggiorna una voce, espellendo le meno usate di recente oltre il limite.
+        """
+        with self._lock:
+            self._voci[chiave] = (self._orologio() + self.ttl_secondi, valore)
+            self._voci.move_to_end(chiave)
+            while len(self._voci) > self.dimensione_massima:
+                self._voci.popitem(last=False)
+                self.espulse += 1
+
+    def svuota(self) -> None:
+        with self._lock:
+            self._voci.clear()
+
+    def statistiche(self) -> dict:
+        """
+        Contatori della cache, es. per il monitoraggio.
+        """
+        with self._lock:
+            richieste = self.hit + self.miss
+            return {'voci': len(self._voci), 'dimensione_massima': self.dimensione_massima,
+                    'ttl_secondi': self.ttl_secondi, 'hit': self.hit, 'miss': self.miss,
+                    'hit_ratio': self.hit / richieste if richieste else 0.0,
+                    'scadute': self.scadute, 'espulse': self.espulse}
+
+
+def memoizza(cache: CacheRisultati, chiave):
+    """
+    Decoratore che serve dalla cache i risultati di una funzione.
+    `chiave` riceve gli stessi argomenti della funzione e restituisce la chiave normalizzata
+    (hashable). Le eccezioni, come PreventUpdate, non vengono memorizzate.
+    """
+    def decoratore(funzione):
+        @functools.wraps(funzione)
+        def wrapper(*args, **kwargs):
+            chiave_normalizzata = chiave(*args, **kwargs)
+            trovato, valore = cache.leggi(chiave_normalizzata)
+            if trovato:
+                return valore
+            valore = funzione(*args, **kwargs)
+            cache.scrivi(chiave_normalizzata, valore)
+            return valore
+        return wrapper
+    return decoratore
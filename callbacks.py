@@ -1,241 +1,292 @@
-from dash import Input, Output, State, callback_context, dcc, html, no_update
-import dash_bootstrap_components as dbc
+import base64
+import hashlib
+import io
+import os
+import zlib
+
+from dash import ALL, ClientsideFunction, Input, Output, State, ctx, dcc, html, no_update
 from dash.exceptions import PreventUpdate
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
+from flask import jsonify
 import numpy as np
 
 from app import app
+from cache import CacheRisultati, memoizza
 from data import (
-    get_calendario_colturale_fragola,
-    prepare_benchmark_dataframe,
+    MODELLO,
+    NOMI_FATTORI,
+    ORDINE_FATTORI,
+    PRESETS,
+    confronta_configurazioni,
+    distribuzione_monte_carlo,
     simula_consumo_risorse,
-    simula_performance_finanziaria
+    simula_performance_finanziaria,
+    simula_produzione_annua,
+    stima_con_intervallo
 )
-
-# Dizionario dei PRESETS per modificare simultaneamente i fattori
-PRESETS = {
-    "btn-preset-tradizionale": {
-        'dd-temperatura': 'sub-freddo',
-        'dd-luce': 'media',
-        'dd-umidita': 'alta_rischiosa',
-        'dd-irrigazione': 'manuale',
-        'dd-fertilizzazione': 'organica',
-        'dd-patogeni': 'convenzionale',
-        'dd-frequenza-raccolta': 'bassa',
-        'dd-impollinazione': 'naturale',
-        'dd-sistema-colturale': 'suolo_tradizionale'
-    },
-    "btn-preset-soilless": {
-        'dd-temperatura': 'ottimale',
-        'dd-luce': 'alta',
-        'dd-umidita': 'ottimale',
-        'dd-irrigazione': 'goccia',
-        'dd-fertilizzazione': 'fertirrigazione',
-        'dd-patogeni': 'integrata',
-        'dd-frequenza-raccolta': 'media',
-        'dd-impollinazione': 'bombi',
-        'dd-sistema-colturale': 'soilless_aperto'
-    },
-    "btn-preset-idroponica": {
-        'dd-temperatura': 'ottimale',
-        'dd-luce': 'alta',
-        'dd-umidita': 'ottimale',
-        'dd-irrigazione': 'goccia',
-        'dd-fertilizzazione': 'idroponica',
-        'dd-patogeni': 'integrata',
-        'dd-frequenza-raccolta': 'alta',
-        'dd-impollinazione': 'bombi',
-        'dd-sistema-colturale': 'idroponico_ricircolo'
-    },
-    "btn-preset-sfavorevoli": {
-        'dd-temperatura': 'critico', 'dd-luce': 'bassa', 'dd-umidita': 'alta_rischiosa', 'dd-irrigazione': 'manuale',
-        'dd-fertilizzazione': 'organica', 'dd-patogeni': 'convenzionale', 'dd-frequenza-raccolta': 'bassa',
-        'dd-impollinazione': 'manuale', 'dd-sistema-colturale': 'suolo_tradizionale'
-    },
-    "btn-preset-medie": {
-        'dd-temperatura': 'sub-caldo', 'dd-luce': 'media', 'dd-umidita': 'alta_rischiosa',
-        'dd-irrigazione': 'aspersione',
-        'dd-fertilizzazione': 'fertirrigazione', 'dd-patogeni': 'biologico', 'dd-frequenza-raccolta': 'media',
-        'dd-impollinazione': 'naturale', 'dd-sistema-colturale': 'soilless_aperto'
-    },
-    "btn-preset-ottimali": {
-        'dd-temperatura': 'ottimale', 'dd-luce': 'alta', 'dd-umidita': 'ottimale', 'dd-irrigazione': 'goccia',
-        'dd-fertilizzazione': 'idroponica', 'dd-patogeni': 'integrata', 'dd-frequenza-raccolta': 'alta',
-        'dd-impollinazione': 'bombi', 'dd-sistema-colturale': 'idroponico_ricircolo'
-    }
-}
-
-# Chiamata al modale per la costruzione della tabella Distribuzione Mensile
-@app.callback(
-    Output("modale-tabella-mensile", "is_open"),
-    Output("contenuto-tabella-mensile", "children"),
-    Input("btn-distribuzione-mensile", "n_clicks"),
-    Input("btn-chiudi-modale", "n_clicks"),
-    State("modale-tabella-mensile", "is_open"),
-    prevent_initial_call=True
+from grafici import (
+    crea_figura_confronto,
+    crea_figura_distribuzione,
+    crea_figura_flusso_cassa,
+    crea_figura_frontiera,
+    crea_figura_portafoglio,
+    crea_figura_sobol,
+    crea_figura_tornado,
+    crea_figura_whatif,
+    crea_riepilogo_pareggio,
+    crea_tabella_confronto,
+    crea_tabella_pareggio,
+    crea_tabella_portafoglio,
+    crea_tabella_statistiche,
+    crea_tabella_suggerimenti,
+    patch_produttivo,
+    patch_risorse
 )
-def toggle_and_fill_modal(n_open, n_close, is_open):
-    ctx = callback_context
-    if not ctx.triggered_id: raise PreventUpdate
-    button_id = ctx.triggered_id
-    if button_id == "btn-distribuzione-mensile":
-        df_calendario = get_calendario_colturale_fragola()
-        table_header = html.Thead(html.Tr([html.Th(col) for col in df_calendario.columns]))
-        table_body = html.Tbody(
-            [html.Tr([html.Td(df_calendario.iloc[i][col]) for col in df_calendario.columns]) for i in
-             range(len(df_calendario))])
-        tabella = dbc.Table([table_header, table_body], striped=True, bordered=True, hover=True, responsive=True,
-                            className="text-center")
-        return True, tabella
-    if button_id == "btn-chiudi-modale": return False, no_update
-    return is_open, no_update
-
-
-# Chiamata di apertura/chiusura al modale per la costruzione delle INFO su Impollinazione
-@app.callback(
-    Output("modal-info-impollinazione", "is_open"),
-    Output("contenuto-info-impollinazione", "children"),
-    Input("btn-info-impollinazione", "n_clicks"),
-    Input("btn-chiudi-modal-impollinazione", "n_clicks"),
-    State("modal-info-impollinazione", "is_open"),
-    prevent_initial_call=True
+from scenari import ottieni_cubo
+from ottimizzazione import ottimizza_configurazione
+from pareggio import analisi_pareggio, ordina_per_robustezza
+from pareto import frontiera_pareto
+from portafoglio import leggi_portafoglio, portafoglio_esempio, simula_portafoglio
+from serie_mensili import PROFILI_PREZZI, simula_serie_mensili
+from sensibilita import (
+    NOMI_PARAMETRI_ECONOMICI,
+    UNITA_PARAMETRI_ECONOMICI,
+    indici_sobol,
+    oscillazioni_tornado,
+    superficie_profitto
 )
-def toggle_impollinazione_info_modal(n_open, n_close, is_open):
-    ctx = callback_context
-    if not ctx.triggered_id: raise PreventUpdate
-    button_id = ctx.triggered_id
-    if button_id == "btn-info-impollinazione":
-        testo_informativo = """
-        L'impollinazione controllata, specialmente in coltura protetta (serre), è una tecnica fondamentale per garantire un'elevata qualità e uniformità dei frutti.
-
-        Vengono utilizzate arnie di **bombi** (solitamente della specie *Bombus terrestris*) posizionate direttamente tra le coltivazioni. A differenza delle api, i bombi sono impollinatori estremamente efficienti anche a basse temperature e in condizioni di luce non ottimali, tipiche dei periodi di produzione precoce della fragola.
-
-        Questa pratica assicura una fecondazione completa di ogni fiore, che si traduce in:
-        *   **Fragole ben formate e di calibro maggiore.**
-        *   **Riduzione drastica delle malformazioni.**
-        *   **Aumento del valore commerciale e della percentuale di prodotto di prima scelta.**
-
-        Come confermato da diverse realtà lucane nel Metapontino, l'uso dei bombi è ormai uno standard per le produzioni di alta qualità.
-        """
-        contenuto = dcc.Markdown(testo_informativo, style={'textAlign': 'justify'})
-        return True, contenuto
-    if button_id == "btn-chiudi-modal-impollinazione": return False, no_update
-    return is_open, no_update
-
-
-# Chiamata di apertura/chiusura al modale per la costruzione delle INFO su Controllo Patogeni
-@app.callback(
-    Output("modal-info-patogeni", "is_open"),
-    Output("contenuto-info-patogeni", "children"),
-    Input("btn-info-patogeni", "n_clicks"),
-    Input("btn-chiudi-modal-patogeni", "n_clicks"),
-    State("modal-info-patogeni", "is_open"),
-    prevent_initial_call=True
+from testi import (
+    COMMENTO_CONFRONTO,
+    COMMENTO_FLUSSO,
+    COMMENTO_FRONTIERA,
+    COMMENTO_MONTECARLO,
+    COMMENTO_PAREGGIO,
+    COMMENTO_PORTAFOGLIO,
+    COMMENTO_PRODUTTIVO,
+    COMMENTO_RISORSE,
+    COMMENTO_SENSIBILITA
 )
-def toggle_patogeni_info_modal(n_open, n_close, is_open):
-    ctx = callback_context
-    if not ctx.triggered_id: raise PreventUpdate
-    button_id = ctx.triggered_id
-    if button_id == "btn-info-patogeni":
-        testo_informativo = """
-        La gestione delle malattie e dei parassiti è cruciale per la fragolicoltura. Le principali strategie si differenziano per approccio e impatto ambientale.
-
-        #### Lotta Integrata
-        È l'approccio più moderno ed equilibrato, promosso a livello europeo. Non mira a eliminare completamente i patogeni, ma a mantenerli sotto una soglia di danno economico. Si basa su:
-        *   **Monitoraggio costante** delle colture per intervenire solo quando necessario.
-        *   **Utilizzo prioritario di metodi naturali**: insetti utili (antagonisti), trappole, pratiche agronomiche preventive.
-        *   **Interventi chimici mirati**: si ricorre a fitofarmaci solo come ultima risorsa, scegliendo prodotti a basso impatto ambientale e selettivi, per preservare gli organismi utili.
-        
-        È la strategia che garantisce il miglior compromesso tra efficacia, sostenibilità economica e rispetto per l'ambiente.
-
-        ---
-
-        #### Lotta Biologica
-        Prevede l'uso **esclusivo** di organismi viventi (predatori, parassitoidi), microrganismi (funghi, batteri) o sostanze di origine naturale per controllare i patogeni. **Vieta completamente l'uso di fitofarmaci di sintesi**. Sebbene sia la scelta più ecologica, può risultare meno efficace in caso di forti infestazioni.
-
-        #### Lotta Convenzionale (o a Calendario)
-        È l'approccio tradizionale, basato su trattamenti con fitofarmaci di sintesi eseguiti a scadenze fisse ("a calendario"), indipendentemente dalla reale presenza del patogeno. Pur essendo efficace nel breve termine, presenta maggiori rischi di inquinamento, sviluppo di resistenze nei patogeni e danni agli insetti impollinatori.
-        """
-        contenuto = dcc.Markdown(testo_informativo, style={'textAlign': 'justify'})
-        return True, contenuto
-    if button_id == "btn-chiudi-modal-patogeni": return False, no_update
-    return is_open, no_update
-
-
-# Chiamata di apertura/chiusura al modale per la costruzione delle INFO su Tipologia di Coltura
-@app.callback(
-    Output("modal-info-coltura", "is_open"),
-    Output("contenuto-info-coltura", "children"),
-    Input("btn-info-coltura", "n_clicks"),
-    Input("btn-chiudi-modal-coltura", "n_clicks"),
-    State("modal-info-coltura", "is_open"),
+
+# Modalità della vista principale: 'analitica' mostra i valori attesi esatti (deterministici),
+# 'casuale' una singola estrazione casuale ad ogni aggiornamento, 'progressiva' una stima Monte Carlo
+# immediata raffinata poi per passi successivi. Sovrascrivibile con la variabile d'ambiente STRAWBERRY_MODALITA
+MODALITA_DASHBOARD = os.environ.get('STRAWBERRY_MODALITA', 'analitica')
+
+# Cache dei risultati della vista principale: con RISULTATI_DETERMINISTICI la modalità 'casuale'
+# usa semi derivati dalla configurazione, così i valori in cache coincidono con quelli ricalcolati
+CACHE_VISTA_PRINCIPALE = CacheRisultati(dimensione_massima=512, ttl_secondi=600)
+RISULTATI_DETERMINISTICI = True
+
+# Modali della pagina: (id del modale, pulsante di apertura, pulsante di chiusura)
+MODALI = (
+    ('modale-tabella-mensile', 'btn-distribuzione-mensile', 'btn-chiudi-modale'),
+    ('modal-info-impollinazione', 'btn-info-impollinazione', 'btn-chiudi-modal-impollinazione'),
+    ('modal-info-patogeni', 'btn-info-patogeni', 'btn-chiudi-modal-patogeni'),
+    ('modal-info-coltura', 'btn-info-coltura', 'btn-chiudi-modal-coltura'),
+    ('modale-suggerimento', 'btn-suggerisci-configurazione', 'btn-chiudi-modale-suggerimento'),
+)
+
+# Modali e preset sono gestiti interamente nel browser (assets/interfaccia.js): testi, tabella
+# del calendario e valori dei preset sono già nella pagina, quindi non occorre alcuna richiesta.
+# Un'unica funzione generica apre/chiude ciascun modale in base al pulsante che l'ha attivata
+for id_modale, id_apri, id_chiudi in MODALI:
+    app.clientside_callback(
+        ClientsideFunction(namespace='interfaccia', function_name='commuta_modale'),
+        Output(id_modale, 'is_open'),
+        Input(id_apri, 'n_clicks'),
+        Input(id_chiudi, 'n_clicks'),
+        State(id_modale, 'is_open'),
+        prevent_initial_call=True
+    )
+
+# Copia nei nove dropdown i valori del preset associato al pulsante premuto
+app.clientside_callback(
+    ClientsideFunction(namespace='interfaccia', function_name='applica_preset'),
+    [Output(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    [Input(id_pulsante, 'n_clicks') for id_pulsante in PRESETS],
+    State('store-presets', 'data'),
     prevent_initial_call=True
 )
-def toggle_coltura_info_modal(n_open, n_close, is_open):
-    ctx = callback_context
-    if not ctx.triggered_id: raise PreventUpdate
-    button_id = ctx.triggered_id
-    if button_id == "btn-info-coltura":
-        testo_informativo = """
-        Il sistema di coltura definisce l'ambiente in cui le radici della pianta si sviluppano e assorbono nutrienti, influenzando drasticamente l'efficienza e la produttività.
-
-        #### Suolo Tradizionale
-        Le piante vengono coltivate direttamente nel terreno agricolo, in campo aperto o in serre. È il metodo più classico e diffuso.
-        *   **Punti di Forza**: Bassi costi iniziali di impianto, minore complessità tecnologica.
-        *   **Punti di Debolezza**: Maggiore consumo di acqua e fertilizzanti (dovuto a perdite per percolazione ed evaporazione), difficoltà nel controllare patogeni del suolo (stanchezza del terreno), produzione soggetta alle condizioni pedoclimatiche.
-
-        ---
-
-        #### Fuori Suolo (Soilless)
-        Le piante crescono in contenitori (vasi, sacchi) riempiti con un substrato inerte (es. fibra di cocco, perlite, torba) anziché nel terreno. L'irrigazione e la nutrizione sono fornite tramite fertirrigazione a goccia.
-        *   **Punti di Forza**: Eliminazione dei problemi legati ai patogeni del suolo, controllo preciso della nutrizione, maggiore efficienza nell'uso delle risorse rispetto al suolo, produzioni più uniformi e anticipate.
-        *   **Punti di Debolezza**: Costo più elevato dell'impianto, necessità di gestire il drenaggio della soluzione nutritiva in eccesso (ciclo aperto).
-
-        ---
-
-        #### Idroponico a Ricircolo (Ciclo Chiuso)
-        È la forma più avanzata di fuori suolo. Le radici sono immerse direttamente in una soluzione nutritiva liquida o in un film d'acqua che scorre in canali. Non c'è substrato solido o è minimo.
-        *   **Punti di Forza**: **Massima efficienza** nell'uso di acqua e fertilizzanti (rispettivo risparmio fino al 90% e 60%), grazie al recupero e riutilizzo della soluzione nutritiva. Controllo totale dell'ambiente radicale, densità di impianto più elevate e produzioni potenzialmente maggiori.
-        *   **Punti di Debolezza**: **Costi di impianto molto elevati**, alta dipendenza dalla tecnologia (pompe, sensori, sistemi di controllo), rischio di rapida diffusione di malattie radicali in tutto il sistema in caso di contaminazione.
-        """
-        contenuto = dcc.Markdown(testo_informativo, style={'textAlign': 'justify'})
-        return True, contenuto
-    if button_id == "btn-chiudi-modal-coltura": return False, no_update
-    return is_open, no_update
-
-
-# Chiamata di aggiornamento valori dei dropdown dai PRESETS
-@app.callback(
-    [
-        Output("dd-temperatura", "value"),
-        Output("dd-luce", "value"),
-        Output("dd-umidita", "value"),
-        Output("dd-irrigazione", "value"),
-        Output("dd-fertilizzazione", "value"),
-        Output("dd-patogeni", "value"),
-        Output("dd-frequenza-raccolta", "value"),  # 7° posto
-        Output("dd-impollinazione", "value"),  # 8° posto
-        Output("dd-sistema-colturale", "value")
-    ],
-    Input('btn-preset-tradizionale', 'n_clicks'),
-    Input('btn-preset-soilless', 'n_clicks'),
-    Input('btn-preset-idroponica', 'n_clicks'),
-    Input('btn-preset-sfavorevoli', 'n_clicks'),
-    Input('btn-preset-medie', 'n_clicks'),
-    Input('btn-preset-ottimali', 'n_clicks'),
+
+# Copia nei dropdown la configurazione suggerita scelta e chiude il modale
+app.clientside_callback(
+    ClientsideFunction(namespace='interfaccia', function_name='applica_suggerimento'),
+    [Output(id_fattore, 'value', allow_duplicate=True) for id_fattore in ORDINE_FATTORI],
+    Output('modale-suggerimento', 'is_open', allow_duplicate=True),
+    Input({'type': 'btn-applica-suggerimento', 'index': ALL}, 'n_clicks'),
+    State('store-suggerimenti', 'data'),
     prevent_initial_call=True
 )
-def update_dropdowns_from_preset(*button_clicks):
-    ctx = callback_context
-    if not ctx.triggered_id: raise PreventUpdate
-    button_id = ctx.triggered_id.split(".")[0]
-    if button_id in PRESETS:
-        preset_values = PRESETS[button_id]
-        return list(preset_values.values())
-    return [no_update] * 9
+
+
+def valore_numerico(valore) -> float:
+    """
+    Converte il valore di un dcc.Input in float, con fallback a 0 se non valido.
+    """
+    try:
+        return float(valore)
+    except (ValueError, TypeError):
+        return 0
+
+
+def seme_configurazione(fattori: dict) -> int:
+    """
+    Seme stabile (tra processi e riavvii) derivato dalla sola configurazione agronomica.
+    """
+    return zlib.crc32("|".join(f"{k}={v}" for k, v in sorted(fattori.items())).encode())
+
+
+# Pipeline a stadi: estrazioni agronomiche -> estrazioni delle risorse -> finanza.
+# I primi due stadi sono memoizzati sui soli fattori agronomici; la finanza è calcolata nel browser
+# (assets/finanza.js, con simula_performance_finanziaria come riferimento) a partire da store-simulazione
+CACHE_STADIO_AGRONOMICO = CacheRisultati(dimensione_massima=512, ttl_secondi=600)
+CACHE_STADIO_RISORSE = CacheRisultati(dimensione_massima=512, ttl_secondi=600)
+CACHE_STIMA_PROGRESSIVA = CacheRisultati(dimensione_massima=2048, ttl_secondi=600)
+
+# Raffinamento progressivo (modalità 'progressiva'): il livello 0 usa CAMPIONI_INIZIALI estrazioni,
+# ogni livello successivo ne usa il quadruplo (intervallo di confidenza dimezzato) fino a quando
+# la semiampiezza scende sotto PRECISIONE_RELATIVA del valore stimato o si raggiunge LIVELLO_MASSIMO
+CAMPIONI_INIZIALI = 1_024
+LIVELLO_MASSIMO = 6
+PRECISIONE_RELATIVA = 0.002
+
+# Grandezze visualizzate da ciascun tab, sulle quali si valuta la precisione raggiunta
+GRANDEZZE_TAB = {
+    'tab-produttivo': ('produzione',),
+    'tab-risorse': ('acqua', 'fertilizzanti'),
+    'tab-finanziaria': ('produzione', 'acqua', 'fertilizzanti'),
+}
+
+
+def chiave_stadio(fattori: dict):
+    return (MODALITA_DASHBOARD, *(fattori[id_fattore] for id_fattore in ORDINE_FATTORI))
+
+
+def generatore_stadio(fattori: dict, stadio: int):
+    """
+    Generatore casuale di uno stadio: flussi indipendenti per stadio, riproducibili se richiesto.
+    """
+    return np.random.default_rng([seme_configurazione(fattori), stadio]) if RISULTATI_DETERMINISTICI else None
+
+
+def chiave_stima_progressiva(fattori: dict, livello: int):
+    return (*chiave_stadio(fattori), livello)
+
+
+@memoizza(CACHE_STIMA_PROGRESSIVA, chiave=chiave_stima_progressiva)
+def stima_progressiva(fattori: dict, livello: int) -> dict:
+    """
+    Stima Monte Carlo con intervallo di confidenza al livello di raffinamento indicato.
+    """
+    seme = [seme_configurazione(fattori), livello] if RISULTATI_DETERMINISTICI else None
+    return stima_con_intervallo(fattori, CAMPIONI_INIZIALI * 4 ** livello, seed=seme)
+
+
+@memoizza(CACHE_STADIO_AGRONOMICO, chiave=chiave_stadio)
+def stadio_agronomico(fattori: dict) -> float:
+    """
+    Stadio 1: produzione annua (kg/m²) della configurazione.
+    """
+    if MODALITA_DASHBOARD == 'analitica':
+        # Valore atteso esatto letto in O(1) dal cubo precalcolato degli scenari
+        return ottieni_cubo().cerca(fattori)['produzione_media']
+    if MODALITA_DASHBOARD == 'progressiva':
+        return stima_progressiva(fattori, 0)['produzione']['media']
+    return simula_produzione_annua(fattori, rng=generatore_stadio(fattori, 1))
+
+
+@memoizza(CACHE_STADIO_RISORSE, chiave=chiave_stadio)
+def stadio_risorse(fattori: dict) -> dict:
+    """
+    Stadio 2: consumi di acqua (l/m²) e fertilizzanti (kg/m²) della configurazione.
+    """
+    if MODALITA_DASHBOARD == 'analitica':
+        scenario = ottieni_cubo().cerca(fattori)
+        return {'acqua': scenario['acqua_media'], 'fertilizzanti': scenario['fertilizzanti_media']}
+    if MODALITA_DASHBOARD == 'progressiva':
+        stima = stima_progressiva(fattori, 0)
+        return {'acqua': stima['acqua']['media'], 'fertilizzanti': stima['fertilizzanti']['media']}
+    return simula_consumo_risorse(fattori, rng=generatore_stadio(fattori, 2))
+
+
+def nota_precisione(stima: dict, grandezze) -> str:
+    """
+    Riga di commento con il numero di scenari e l'intervallo di confidenza della stima corrente.
+    """
+    unita = {'produzione': ('Produzione', 'kg/m²', '.3f'), 'acqua': ('Acqua', 'l/m²', '.1f'),
+             'fertilizzanti': ('Fertilizzanti', 'kg/m²', '.5f')}
+    intervalli = ", ".join(f"{unita[g][0]} ± {stima[g]['semiampiezza']:{unita[g][2]}} {unita[g][1]}" for g in grandezze)
+    n_campioni = f"{stima[grandezze[0]]['n_campioni']:,}".replace(',', '.')
+    return f"\n\n*Stima Monte Carlo su {n_campioni} scenari (intervallo di confidenza al 95%): {intervalli}.*"
+
+
+def vista_produttivo(produzione: float, stima: dict = None):
+    """
+    Patch del grafico e commento del tab Andamento Produttivo; con una stima progressiva
+    aggiunge la barra d'errore e la nota sulla precisione.
+    """
+    semiampiezza = stima['produzione']['semiampiezza'] if stima else None
+    commentary = COMMENTO_PRODUTTIVO.format(produzione=produzione)
+    if stima:
+        commentary += nota_precisione(stima, GRANDEZZE_TAB['tab-produttivo'])
+    return patch_produttivo(produzione, semiampiezza), commentary
+
+
+def vista_risorse(consumi: dict, idroponico: bool, stima: dict = None):
+    """
+    Patch dei gauge e commento del tab Uso delle Risorse.
+    """
+    commentary = COMMENTO_RISORSE.format(**consumi)
+    if stima:
+        commentary += nota_precisione(stima, GRANDEZZE_TAB['tab-risorse'])
+    return patch_risorse(consumi, idroponico), commentary
+
+
+def stato_raffinamento(active_tab: str, fattori: dict, livello: int):
+    """
+    Contenuto di store-raffinamento: identifica la configurazione e il tab a cui si riferisce
+    il livello raggiunto, così un raffinamento rimasto indietro viene riconosciuto e scartato.
+    """
+    if MODALITA_DASHBOARD != 'progressiva' or active_tab not in GRANDEZZE_TAB:
+        return None
+    return {'chiave': list(chiave_stadio(fattori)), 'tab': active_tab, 'livello': livello}
+
+
+def chiave_vista_principale(active_tab, *fattori):
+    """
+    Chiave normalizzata per la cache: modalità, tab e nove fattori.
+    """
+    return (MODALITA_DASHBOARD, active_tab, *fattori)
+
+
+@app.server.route('/stato-cache')
+def stato_cache():
+    return jsonify(CACHE_VISTA_PRINCIPALE.statistiche())
+
+
+# Stili per la visibilità dei container
+STYLE_HIDDEN = {'display': 'none'}
+STYLE_VISIBLE = {'display': 'block', 'width': '100%'}
+
+# Container mostrato da ciascun tab, nell'ordine degli Output di update_main_view
+CONTAINER_TAB = {
+    'tab-produttivo': 'container-produttivo',
+    'tab-risorse': 'container-risorse',
+    'tab-finanziaria': 'container-finanziario',
+    'tab-montecarlo': 'container-montecarlo',
+    'tab-confronto': 'container-confronto',
+    'tab-sensibilita': 'container-sensibilita',
+    'tab-frontiera': 'container-frontiera',
+    'tab-pareggio': 'container-pareggio',
+    'tab-flusso': 'container-flusso',
+    'tab-portafoglio': 'container-portafoglio',
+}
+
+
+def stili_container(active_tab: str) -> list:
+    """
+    Stili dei container: visibile solo quello del tab attivo.
+    """
+    return [STYLE_VISIBLE if tab == active_tab else STYLE_HIDDEN for tab in CONTAINER_TAB]
 
 
 # Chiamata di aggiornamento tab per commento grafico dinamico e plot grafici
@@ -243,13 +294,11 @@ def update_dropdowns_from_preset(*button_clicks):
     [
         Output('grafico-produttivo', 'figure'),
         Output('grafico-risorse', 'figure'),
-        Output('grafico-sankey-finanziario', 'figure'),
-        Output('grafico-composizione-costi', 'figure'),
+        Output('store-simulazione', 'data'),
 
-        Output('container-produttivo', 'style'),
-        Output('container-risorse', 'style'),
-        Output('container-finanziario', 'style'),
-        Output('testo-commentary', 'children')
+        *[Output(id_container, 'style') for id_container in CONTAINER_TAB.values()],
+        Output('testo-commentary', 'children'),
+        Output('store-raffinamento', 'data')
     ],
     [
         Input('tabs-viste-grafici', 'value'),
@@ -261,25 +310,17 @@ def update_dropdowns_from_preset(*button_clicks):
         Input('dd-patogeni', 'value'),
         Input('dd-frequenza-raccolta', 'value'),
         Input('dd-impollinazione', 'value'),
-        Input('dd-sistema-colturale', 'value'),
-        Input('input-prezzo-vendita', 'value'),
-        Input('input-costo-acqua', 'value'),
-        Input('input-costo-fertilizzanti', 'value'),
-        Input('input-costi-extra', 'value')
+        Input('dd-sistema-colturale', 'value')
     ]
 )
+@memoizza(CACHE_VISTA_PRINCIPALE, chiave=chiave_vista_principale)
 def update_main_view(active_tab,
                      temp, luce, umidita, irrigazione, fertilizzazione,
-                     patogeni, raccolta, impollinazione, sistema,
-                     prezzo_vendita, costo_acqua, costo_fert, costi_extra):
+                     patogeni, raccolta, impollinazione, sistema):
     # Previene l'aggiornamento se i dropdown non sono ancora stati caricati
     if not all([temp, luce, umidita, irrigazione, fertilizzazione, patogeni, raccolta, impollinazione, sistema]):
         raise PreventUpdate
 
-    # Stili per la visibilità dei container
-    style_hidden = {'display': 'none'}
-    style_visible = {'display': 'block', 'width': '100%'}
-
     fattori_agronomici = {
         'dd-temperatura': temp, 'dd-luce': luce, 'dd-umidita': umidita,
         'dd-irrigazione': irrigazione, 'dd-fertilizzazione': fertilizzazione,
@@ -287,220 +328,458 @@ def update_main_view(active_tab,
         'dd-impollinazione': impollinazione, 'dd-sistema-colturale': sistema
     }
 
-    df_plot, produzione_simulata = prepare_benchmark_dataframe(fattori_agronomici)
-    consumi_stimati = simula_consumo_risorse(fattori_agronomici)
-    consumo_acqua_simulato = consumi_stimati['acqua']
-    consumo_fertilizzanti_simulato = consumi_stimati['fertilizzanti']
+    # Ogni tab calcola solo gli stadi che visualizza e invia solo i valori modificati
+    # come Patch sugli scheletri delle figure costruiti una volta in grafici.py.
+    # In modalità 'progressiva' si risponde subito con la stima del livello 0; i livelli
+    # successivi arrivano da raffina_vista_principale, innescato da store-raffinamento
+    stima = stima_progressiva(fattori_agronomici, 0) if MODALITA_DASHBOARD == 'progressiva' else None
+    raffinamento = stato_raffinamento(active_tab, fattori_agronomici, 0)
 
-    # Gestione degli input per Performance Finanziaria, con fallback a 0 se non validi
-    try:
-        prezzo_vendita_val = float(prezzo_vendita)
-    except (ValueError, TypeError):
-        prezzo_vendita_val = 0
-    try:
-        costo_acqua_val = float(costo_acqua)
-    except (ValueError, TypeError):
-        costo_acqua_val = 0
-    try:
-        costo_fert_val = float(costo_fert)
-    except (ValueError, TypeError):
-        costo_fert_val = 0
-    try:
-        costi_extra_val = float(costi_extra)
-    except (ValueError, TypeError):
-        costi_extra_val = 0
+    # Commento dinamico e plot del grafico del tab Andamento Produttivo
+    if active_tab == 'tab-produttivo':
+        figura, commentary = vista_produttivo(stadio_agronomico(fattori_agronomici), stima)
+        return figura, no_update, no_update, *stili_container(active_tab), commentary, raffinamento
 
-    dati_finanziari = simula_performance_finanziaria(produzione_simulata, consumi_stimati, prezzo_vendita_val,
-                                                     costo_acqua_val, costo_fert_val, costi_extra_val)
+    # Commento dinamico e plot dei grafici del tab Uso delle Risorse
+    elif active_tab == 'tab-risorse':
+        idroponico = fattori_agronomici['dd-sistema-colturale'] == 'idroponico_ricircolo'
+        figura, commentary = vista_risorse(stadio_risorse(fattori_agronomici), idroponico, stima)
+        return no_update, figura, no_update, *stili_container(active_tab), commentary, raffinamento
+
+    # Commento dinamico e plot dei grafici del tab Performance Finanziaria
+    elif active_tab == 'tab-finanziaria':
+        # Il modello finanziario gira nel browser (assets/finanza.js) sugli ultimi valori
+        # di produzione e consumo inviati dal server: qui si aggiorna solo lo store
+        simulazione = {'produzione': stadio_agronomico(fattori_agronomici), **stadio_risorse(fattori_agronomici)}
+        return no_update, no_update, simulazione, *stili_container(active_tab), no_update, raffinamento
+
+    # Commento del tab Analisi Monte Carlo: la simulazione parte solo su richiesta, in background
+    elif active_tab == 'tab-montecarlo':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_MONTECARLO, None
+
+    # Commento del tab Confronto Scenari: il confronto parte su richiesta dal pulsante dedicato
+    elif active_tab == 'tab-confronto':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_CONFRONTO, None
+
+    # Commento del tab Analisi di Sensibilità: i grafici sono aggiornati da aggiorna_sensibilita
+    elif active_tab == 'tab-sensibilita':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_SENSIBILITA, None
+
+    # Commento del tab Frontiera di Sostenibilità: il grafico è aggiornato da aggiorna_frontiera
+    elif active_tab == 'tab-frontiera':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_FRONTIERA, None
+
+    # Commento del tab Analisi di Pareggio: riepilogo e classifica sono aggiornati da aggiorna_pareggio
+    elif active_tab == 'tab-pareggio':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_PAREGGIO, None
+
+    # Commento del tab Flusso di Cassa Mensile: il grafico è aggiornato da aggiorna_flusso_cassa
+    elif active_tab == 'tab-flusso':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_FLUSSO, None
+
+    # Commento del tab Portafoglio Aziendale: grafico e tabella sono aggiornati da aggiorna_portafoglio
+    elif active_tab == 'tab-portafoglio':
+        return no_update, no_update, no_update, *stili_container(active_tab), COMMENTO_PORTAFOGLIO, None
+
+    # Fallback per valore di active_tab diverso
+    return [no_update] * (len(CONTAINER_TAB) + 5)
+
+
+# Raffinamento progressivo: ogni passo calcola il livello successivo, aggiorna gli stessi grafici
+# e riscrive store-raffinamento, che innesca il passo seguente. La catena si ferma alla precisione
+# obiettivo; se nel frattempo tab o dropdown sono cambiati il passo viene scartato
+@app.callback(
+    Output('grafico-produttivo', 'figure', allow_duplicate=True),
+    Output('grafico-risorse', 'figure', allow_duplicate=True),
+    Output('store-simulazione', 'data', allow_duplicate=True),
+    Output('testo-commentary', 'children', allow_duplicate=True),
+    Output('store-raffinamento', 'data', allow_duplicate=True),
+    Input('store-raffinamento', 'data'),
+    State('tabs-viste-grafici', 'value'),
+    [State(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    prevent_initial_call=True
+)
+def raffina_vista_principale(raffinamento, active_tab, *valori_fattori):
+    if not raffinamento or raffinamento['livello'] >= LIVELLO_MASSIMO:
+        raise PreventUpdate
+    fattori = dict(zip(ORDINE_FATTORI, valori_fattori))
+    if raffinamento['tab'] != active_tab or raffinamento['chiave'] != list(chiave_stadio(fattori)):
+        raise PreventUpdate
+
+    livello = raffinamento['livello'] + 1
+    stima = stima_progressiva(fattori, livello)
+    grandezze = GRANDEZZE_TAB[active_tab]
+    precisione_raggiunta = all(stima[g]['semiampiezza'] <= PRECISIONE_RELATIVA * abs(stima[g]['media'])
+                               for g in grandezze)
+    prossimo = no_update if precisione_raggiunta else stato_raffinamento(active_tab, fattori, livello)
+    medie = {g: stima[g]['media'] for g in ('produzione', 'acqua', 'fertilizzanti')}
 
-    # Commento dinamico e plot del grafico del tab Andamento Produttivo
     if active_tab == 'tab-produttivo':
-        commentary = f"""
-    Questa sezione analizza i parametri selezionati al fine di determinare una stima di produzione annuale.
-    Basandosi sui suddetti parametri, la produzione annua stimata è di **{produzione_simulata:.2f} kg/m²**.
+        figura, commentary = vista_produttivo(medie['produzione'], stima)
+        return figura, no_update, no_update, commentary, prossimo
+    if active_tab == 'tab-risorse':
+        idroponico = fattori['dd-sistema-colturale'] == 'idroponico_ricircolo'
+        figura, commentary = vista_risorse({'acqua': medie['acqua'], 'fertilizzanti': medie['fertilizzanti']},
+                                           idroponico, stima)
+        return no_update, figura, no_update, commentary, prossimo
+    return no_update, no_update, medie, no_update, prossimo
+
+
+# Modello finanziario eseguito nel browser: ricalcola Sankey, ciambella e commento
+# a ogni modifica degli input economici, senza round trip verso il server
+app.clientside_callback(
+    ClientsideFunction(namespace='finanza', function_name='aggiorna_vista_finanziaria'),
+    Output('grafico-sankey-finanziario', 'figure'),
+    Output('grafico-composizione-costi', 'figure'),
+    Output('testo-commentary', 'children', allow_duplicate=True),
+    Input('store-simulazione', 'data'),
+    Input('input-prezzo-vendita', 'value'),
+    Input('input-costo-acqua', 'value'),
+    Input('input-costo-fertilizzanti', 'value'),
+    Input('input-costi-extra', 'value'),
+    State('store-commento-finanziario', 'data'),
+    State('grafico-sankey-finanziario', 'figure'),
+    State('grafico-composizione-costi', 'figure'),
+    prevent_initial_call=True
+)
 
-    Il grafico confronta questo risultato con i benchmark di riferimento:
-    *   **Produzione Ottimale**: 8.50 kg/m²
-    *   **Produzione Media**: 5.50 kg/m²
-    *   **Produzione Sfavorevole**: 3.00 kg/m²
 
-    La resa produttiva è il risultato diretto delle scelte effettuate. Si noti che il **Sistema di Coltura** è uno dei fattori più determinanti. 
-    
-    Mentre i sistemi tradizionali tendono ad allinearsi con fatica a questi benchmark, le tecnologie avanzate come il **Fuori Suolo** e soprattutto l'**Idroponica a Ricircolo** hanno il potenziale per superarli ampiamente. Questo perché permettono un controllo capillare dell'ambiente di crescita, massimizzando l'efficienza della pianta.
+# Superficie what-if della vista finanziaria, ricalcolata sul server solo col tab visibile (gli input
+# economici sono con debounce): coppie di parametri economici selezionabili sugli assi
+COPPIE_WHATIF = {
+    'prezzo-acqua': ('prezzo_vendita_kg', 'costo_acqua_m3'),
+    'fertilizzanti-extra': ('costo_fert_kg', 'costi_extra_ha'),
+}
 
-    Utilizzando i **PRESET PER TIPO DI COLTURA** si può osservare direttamente questa dinamica e vedere come una gestione ottimale possa portare a risultati produttivi al di sopra dei **10 kg/m²**.
 
-    *Nota: questa è una stima basata su un modello simulativo.*
-    """
+@app.callback(
+    Output('grafico-whatif', 'figure'),
+    Input('tabs-viste-grafici', 'value'),
+    Input('store-simulazione', 'data'),
+    Input('radio-assi-whatif', 'value'),
+    Input('input-prezzo-vendita', 'value'),
+    Input('input-costo-acqua', 'value'),
+    Input('input-costo-fertilizzanti', 'value'),
+    Input('input-costi-extra', 'value'),
+    prevent_initial_call=True
+)
+def aggiorna_whatif(active_tab, simulazione, coppia, *valori):
+    if active_tab != 'tab-finanziaria' or not simulazione:
+        raise PreventUpdate
+    parametri_economici = tuple(valore_numerico(valore) for valore in valori)
+    asse_x, asse_y = COPPIE_WHATIF[coppia]
+    correnti = dict(zip(NOMI_PARAMETRI_ECONOMICI, parametri_economici))
+    titoli = [f"{NOMI_PARAMETRI_ECONOMICI[asse]} ({UNITA_PARAMETRI_ECONOMICI[asse]})" for asse in (asse_x, asse_y)]
+    return crea_figura_whatif(superficie_profitto(simulazione, parametri_economici, asse_x, asse_y), *titoli,
+                              corrente=(correnti[asse_x], correnti[asse_y]))
+
+# Analisi Monte Carlo eseguita come job in background (DiskcacheManager in app.py): il worker
+# viene liberato subito, il browser interroga lo stato del job e riceve l'avanzamento
+@app.callback(
+    Output('grafico-montecarlo', 'figure'),
+    Output('riepilogo-montecarlo', 'children'),
+    Input('btn-avvia-montecarlo', 'n_clicks'),
+    [State(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+    State('dd-campioni-montecarlo', 'value'),
+    background=True,
+    running=[
+        (Output('btn-avvia-montecarlo', 'disabled'), True, False),
+        (Output('btn-annulla-montecarlo', 'disabled'), False, True),
+        (Output('progresso-montecarlo', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'}),
+    ],
+    cancel=[Input('btn-annulla-montecarlo', 'n_clicks')],
+    progress=[Output('progresso-montecarlo', 'value'), Output('progresso-montecarlo', 'label')],
+    prevent_initial_call=True
+)
+def esegui_analisi_montecarlo(set_progress, n_clicks, *valori):
+    valori_fattori, (prezzo_vendita, costo_acqua, costo_fert, costi_extra, n_campioni) = valori[:-5], valori[-5:]
+    if not all(valori_fattori):
+        raise PreventUpdate
+    fattori = dict(zip(ORDINE_FATTORI, valori_fattori))
 
-        fig_produttivo = px.bar(
-            df_plot, x='Produzione (kg/m²)', y='Scenario', orientation='h',
-            title='Confronto Produzione Annua Stimata (kg/m²)', text_auto='.2f', color='Scenario',
-            color_discrete_map={'Produzione Stimata': '#495b52', 'Produzione Sfavorevole': '#d13045',
-                                'Produzione Media': 'gold', 'Produzione Ottimale': '#7eb671'}
-        )
-        fig_produttivo.update_traces(uid='bar-prod-uid', textposition='outside',
-                                     hovertemplate='<b>%{y}</b><br>Produzione: %{x:.2f} kg/m²<extra></extra>')
-        fig_produttivo.update_layout(xaxis_title='Produzione (kg/m²)', yaxis_title=None, showlegend=False,
-                                     plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                                     font=dict(color='#495b52'),
-                                     title_x=0.5, title_xanchor='center', transition_duration=500)
+    def al_progresso(completati, totali):
+        percentuale = round(100 * completati / totali)
+        set_progress((percentuale, f"{percentuale}%"))
 
-        max_range = max(produzione_simulata, 8.5) * 1.1
-        fig_produttivo.update_xaxes(range=[0, max_range])
+    set_progress((0, ""))
+    # Blocchi ridotti subito a statistiche e istogramma: la memoria non cresce con il numero di scenari
+    risultato = distribuzione_monte_carlo(fattori, valore_numerico(prezzo_vendita), valore_numerico(costo_acqua),
+                                          valore_numerico(costo_fert), valore_numerico(costi_extra),
+                                          n_campioni=n_campioni, seed=seme_configurazione(fattori),
+                                          al_progresso=al_progresso)
+    statistiche, istogramma = risultato['statistiche'], risultato['istogrammi']['profitto']
+    return (crea_figura_distribuzione(istogramma['bordi'], istogramma['conteggi'], statistiche['profitto']),
+            crea_tabella_statistiche(statistiche))
 
-        return fig_produttivo, no_update, no_update, no_update, style_visible, style_hidden, style_hidden, commentary
 
-    # Commento dinamico e plot dei grafici del tab Uso delle Risorse
-    elif active_tab == 'tab-risorse':
-        commentary = f"""
-            Questa sezione analizza l'efficienza nell'uso delle risorse idriche e nutritive, fondamentali per una produzione di qualità.
-
-            #### Utilizzo dell'Acqua
-            Il consumo stimato è di **{consumi_stimati['acqua']:.0f} l/m²**. Il range ottimale è 300-450 l/m². Condizioni sfavorevoli possono indicare:
-            *   **Carenza (< 300 l/m²)**: indica uno stress idrico che compromette la crescita della pianta e la pezzatura (dimensione) dei frutti.
-            *   **Spreco (> 650 l/m²)**: rappresenta un impatto economico e ambientale considerevole. Può creare condizioni di asfissia per le radici e favorire lo sviluppo di malattie fungine.
-
-            #### Utilizzo dei Fertilizzanti
-            Il consumo stimato è di **{consumi_stimati['fertilizzanti']:.3f} kg/m²**. Questo valore rappresenta il consumo totale di elementi, calcolato sui fabbisogni principali della fragola: **Azoto (N)**, **Fosforo (P₂O₅)** e **Potassio (K₂O)**. Condizioni sfavorevoli possono indicare:
-            *   **Carenza (< 0.01 kg/m²)**: limita fortemente lo sviluppo vegetativo, la fioritura e l'ingrossamento dei frutti, riducendo la qualità del raccolto.
-            *   **Eccesso (> 0.02 kg/m²)**: oltre a essere un costo superfluo, può causare squilibri nutrizionali, eccessiva vegetazione a scapito dei frutti e potenziale inquinamento delle falde.
-            
-            In un sistema **Idroponico a Ricircolo**, i benchmark tradizionali vengono rivoluzionati: l'efficienza è massima perché acqua e nutrienti vengono recuperati e riutilizzati.
-            
-            **In questo scenario, un basso consumo non indica carenza, ma concreta efficienza.**
-
-            *   **Acqua**: minore sarà il valore, più il risultato sarà considerato eccellente, riflettendo un risparmio idrico che può arrivare fino al 90% rispetto alla coltura in suolo. Lo spreco è quasi nullo.
-            *   **Fertilizzanti**: allo stesso modo, il basso consumo è indice di una gestione ottimale, in ogni grammo di nutriente viene reso disponibile alla pianta, limitando la dispersione/spreco e garantendo un risparmio fino al 60% rispetto alla coltura in suolo. 
-            
-            I grafici mostrano come questa tecnologia ridefinisca il concetto di "ottimale".
-            
-            *Nota: questa è una stima basata su un modello simulativo.*
-            """
-
-        fig_risorse = make_subplots(rows=1, cols=2, specs=[[{'type': 'indicator'}, {'type': 'indicator'}]],
-                                    subplot_titles=('Acqua (l/m²)', 'Fertilizzanti (kg/m²)'))
-
-        # Discrimine dei range sfavorevoli/medi/ottimali per coltura di tipo idroponica
-        if fattori_agronomici['dd-sistema-colturale'] == 'idroponico_ricircolo':
-            gauge_acqua_steps = [{'range': [0, 100], 'color': "#7eb671"},
-                                 {'range': [100, 200], 'color': "gold"},
-                                 {'range': [200, 1000], 'color': "#d13045"}]
-            gauge_acqua_range = [0, 250]
-            acqua_threshold_value = 50
-
-            # Gauge Fertilizzanti per Idroponica
-            gauge_fert_steps = [{'range': [0, 0.008], 'color': "#7eb671"},
-                                {'range': [0.008, 0.015], 'color': "gold"},
-                                {'range': [0.015, 0.035], 'color': "#d13045"}]
-            gauge_fert_range = [0, 0.02]
-            fert_threshold_value = 0.004
-
-        # Discrimine dei range sfavorevoli/medi/ottimali per coltura di altro tipo
-        else:
-            gauge_acqua_steps = [{'range': [0, 300], 'color': "#d13045"},
-                                 {'range': [300, 450], 'color': "#7eb671"},
-                                 {'range': [450, 650], 'color': "gold"},
-                                 {'range': [650, 1000], 'color': "#d13045"}]
-            gauge_acqua_range = [0, 1000]
-            acqua_threshold_value = 375
-
-            gauge_fert_steps = [{'range': [0, 0.010], 'color': "#d13045"},
-                                {'range': [0.010, 0.015], 'color': "#7eb671"},
-                                {'range': [0.015, 0.020], 'color': "gold"},
-                                {'range': [0.020, 0.030], 'color': "#d13045"}]
-            gauge_fert_range = [0, 0.030]
-            fert_threshold_value = 0.0125
-
-        fig_risorse.add_trace(go.Indicator(mode="gauge+number", value=consumo_acqua_simulato, uid='gauge-acqua-background-uid',
-                                           gauge={'shape': "angular",
-                                               'axis': {'range': gauge_acqua_range},
-                                                  'steps': gauge_acqua_steps,
-                                                  }), row=1, col=1)
-        fig_risorse.add_trace(go.Indicator(mode="gauge", value=consumo_acqua_simulato, uid='gauge-acqua-bar-uid',
-                                           gauge={'shape': "angular",
-                                               'axis': {'range': gauge_acqua_range}, 'bar': {'color': "#495b52"},
-                                                  'threshold': {'value': acqua_threshold_value}
-                                                  }), row=1, col=1)
-        fig_risorse.add_trace(
-            go.Indicator(mode="gauge+number", value=consumo_fertilizzanti_simulato, uid='gauge-fert-background-uid',
-                         number={'valueformat': '.3f'},
-                         gauge={'shape': "angular",
-                             'axis': {'range': gauge_fert_range},
-                                'steps': gauge_fert_steps,
-                                }), row=1, col=2)
-        fig_risorse.add_trace(
-            go.Indicator(mode="gauge", value=consumo_fertilizzanti_simulato, uid='gauge-fert-bar-uid',
-                         #number={'valueformat': '.3f'},
-                         gauge={'shape': "angular",
-                             'axis': {'range': gauge_fert_range}, 'bar': {'color': "#495b52"},
-                                #'steps': gauge_fert_steps,
-                                'threshold': {'value': fert_threshold_value}
-                                }), row=1, col=2)
-
-        fig_risorse.update_layout(title_text="Stima del Consumo di Risorse", plot_bgcolor='rgba(0,0,0,0)',
-                                  paper_bgcolor='rgba(0,0,0,0)', font=dict(color='#495b52'), title_x=0.5,
-                                  title_xanchor='center', transition_duration=500)
-
-        return no_update, fig_risorse, no_update, no_update, style_hidden, style_visible, style_hidden, commentary
+# Confronto tra configurazioni con numeri casuali comuni: tutte le configurazioni scelte sono
+# valutate sugli stessi scenari, così le differenze rispetto alla prima hanno intervalli stretti
+CAMPIONI_CONFRONTO = 200_000
 
-    # Commento dinamico e plot dei grafici del tab Performance Finanziaria
-    elif active_tab == 'tab-finanziaria':
 
-        ricavi_val = dati_finanziari['Ricavi (€/m²)']
-        profitto_val = dati_finanziari['Profitto Lordo (€/m²)']
-        costi_totali_val = ricavi_val - profitto_val
-
-        commentary = f"""
-        Questa sezione analizza la sostenibilità economica della coltivazione, mostrando come le scelte agronomiche e i parametri di mercato si traducono in profitto.
-
-        **Interazione e Analisi "What-if":**
-        questa è la sezione più sensibile alle fluttuazioni di mercato. Modificando i **parametri economici** (soprattutto il **prezzo di vendita**) si può osservare come un piccolo cambiamento possa avere un impatto enorme sul profitto. Ad esempio, una produzione alta ad un prezzo di vendita basso potrebbe risultare meno redditizia di una produzione media venduta ad un prezzo più alto.
-
-        **Grafico di Flusso (Sankey)** a sinistra:
-        illustra il percorso economico complessivo. I **Ricavi Totali ({ricavi_val:.2f} €/m²)**, generati dalla vendita della produzione, si dividono in due flussi: i **Costi Totali ({costi_totali_val:.2f} €/m²)** sostenuti e il **Profitto Lordo ({profitto_val:.2f} €/m²)** finale. Questo grafico evidenzia immediatamente la proporzione tra costi e ricavi.
-
-        **Grafico a Ciambella** a destra:
-        offre uno spaccato dettagliato dei **costi variabili**. Mostra il peso percentuale di ogni voce, consentendo di comprendere quali fattori incidono maggiormente sulle spese.
-
-        **Cosa si intende per "Altri Costi Variabili":**
-        questa macro-categoria include tutte le spese operative non legate direttamente ad acqua e fertilizzanti, come ad esempio:
-        *   Manodopera per trapianto, gestione e raccolta.
-        *   Costo delle piante e del materiale di propagazione.
-        *   Noleggio o acquisto di insetti impollinatori (bombi).
-        *   Energia elettrica per pompe e sistemi di controllo.
-        *   Materiali di consumo (es. substrati, teli per pacciamatura).
-        
-        *Nota: questa è una stima basata su un modello simulativo.*
-        """
-
-        fig_sankey = go.Figure(data=[go.Sankey(node=dict(pad=15, thickness=20, line=dict(color="black", width=0.5),
-                                                         label=["Ricavi", "Costi Totali", "Profitto Lordo"],
-                                                         color=["#495b52", "#d13045", "#7eb671"]),
-                                               uid='sankey-flow-uid',
-                                               link=dict(source=[0, 0], target=[1, 2],
-                                                         value=[costi_totali_val, profitto_val]),
-                                               node_hovertemplate='<b>%{label}</b><br>Valore: €%{value:.2f}<extra></extra>')])
-        fig_sankey.update_layout(title_text="Flusso Finanziario (€/m²)", font=dict(size=12, color='#495b52'),
-                                 transition_duration=500,
-                                 plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                                 margin=dict(t=40, b=20, l=10, r=10))
-
-        costi_labels = ['Costo Acqua', 'Costo Fertilizzanti', 'Altri Costi']
-        costi_values = [abs(dati_finanziari[k]) for k in costi_labels]
-        color_map = {'Costo Acqua': '#63cec7', 'Costo Fertilizzanti': '#7eb671', 'Altri Costi': 'gold'}
-        final_colors = [color_map[label] for label in costi_labels]
-
-        fig_ciambella = go.Figure(data=[
-            go.Pie(labels=costi_labels, values=costi_values, hole=0.4, marker=dict(colors=final_colors),
-                   textposition='inside', textinfo='percent+label',
-                   hovertemplate='Costo: € %{value:.2f}<extra></extra>')])
-        fig_ciambella.update_layout(title="Composizione dei Costi Variabili", showlegend=False,
-                                    plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                                    font=dict(color='#495b52'),
-                                    title_x=0.5, title_xanchor='center', margin=dict(t=40, b=20, l=10, r=10))
-
-        return no_update, no_update, fig_sankey, fig_ciambella, style_hidden, style_hidden, style_visible, commentary
+@app.callback(
+    Output('grafico-confronto', 'figure'),
+    Output('riepilogo-confronto', 'children'),
+    Input('btn-avvia-confronto', 'n_clicks'),
+    State('dd-configurazioni-confronto', 'value'),
+    State('dd-configurazioni-confronto', 'options'),
+    [State(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+    prevent_initial_call=True
+)
+def esegui_confronto(n_clicks, selezionate, opzioni, *valori):
+    valori_fattori, parametri_economici = valori[:-4], tuple(valore_numerico(valore) for valore in valori[-4:])
+    if not selezionate or not all(valori_fattori):
+        raise PreventUpdate
+    corrente = dict(zip(ORDINE_FATTORI, valori_fattori))
+    # 'corrente' indica la configurazione dei dropdown, gli altri valori sono id di PRESETS;
+    # i risultati sono indicizzati per etichetta, così grafico e tabella mostrano i nomi leggibili
+    etichette = {opzione['value']: opzione['label'] for opzione in opzioni}
+    configurazioni = {etichette[valore]: corrente if valore == 'corrente' else PRESETS[valore] for valore in selezionate}
+    risultato = confronta_configurazioni(configurazioni, parametri_economici, n_campioni=CAMPIONI_CONFRONTO,
+                                         seed=seme_configurazione(corrente))
+    return crea_figura_confronto(risultato), crea_tabella_confronto(risultato)
+
+
+# Analisi di sensibilità: tornado e indici di Sobol si ricalcolano in un unico lotto vettoriale
+# (circa un decimo di secondo) a ogni modifica di configurazione o all'apertura del tab; i parametri economici
+# si modificano solo nella vista finanziaria, quindi sono letti come State e non generano richieste
+@app.callback(
+    Output('grafico-tornado', 'figure'),
+    Output('grafico-sobol', 'figure'),
+    Input('tabs-viste-grafici', 'value'),
+    [Input(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+)
+def aggiorna_sensibilita(active_tab, *valori):
+    valori_fattori, parametri_economici = valori[:-4], tuple(valore_numerico(valore) for valore in valori[-4:])
+    if active_tab != 'tab-sensibilita' or not all(valori_fattori):
+        raise PreventUpdate
+    fattori = dict(zip(ORDINE_FATTORI, valori_fattori))
+    return (crea_figura_tornado(oscillazioni_tornado(fattori, parametri_economici)),
+            crea_figura_sobol(indici_sobol(fattori, parametri_economici, seed=seme_configurazione(fattori))))
 
-    # Fallback per valore di active_tab diverso
-    return [no_update] * 8
+
+# Suggerimento della configurazione: branch-and-bound sul profitto atteso con i vincoli sui consumi,
+# risposta in pochi millisecondi; le proposte restano in store-suggerimenti per essere applicate nel browser
+@app.callback(
+    Output('risultati-suggerimento', 'children'),
+    Output('store-suggerimenti', 'data'),
+    Input('btn-calcola-suggerimento', 'n_clicks'),
+    State('input-acqua-massima', 'value'),
+    State('input-fertilizzanti-massimi', 'value'),
+    State('checklist-fattori-fissi', 'value'),
+    [State(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+    prevent_initial_call=True
+)
+def suggerisci_configurazione(n_clicks, acqua_massima, fertilizzanti_massimi, fattori_fissi, *valori):
+    valori_fattori, parametri_economici = valori[:-4], tuple(valore_numerico(valore) for valore in valori[-4:])
+    if not all(valori_fattori):
+        raise PreventUpdate
+    corrente = dict(zip(ORDINE_FATTORI, valori_fattori))
+    try:
+        risultato = ottimizza_configurazione(parametri_economici, acqua_massima, fertilizzanti_massimi,
+                                             fissi={id_fattore: corrente[id_fattore] for id_fattore in fattori_fissi or []})
+    except ValueError as errore:
+        return html.P(str(errore), className="text-danger"), None
+    configurazioni = risultato['configurazioni']
+    if not configurazioni:
+        return html.P("Nessuna configurazione rispetta i vincoli indicati.", className="text-danger"), None
+    for configurazione in configurazioni:
+        configurazione['modifiche'] = {NOMI_FATTORI[id_fattore]: opzione
+                                       for id_fattore, opzione in configurazione['fattori'].items()
+                                       if opzione != corrente[id_fattore]}
+    return crea_tabella_suggerimenti(configurazioni), [configurazione['fattori'] for configurazione in configurazioni]
+
+
+# Frontiera di Pareto: solo la colonna del profitto dipende dai parametri economici, quindi il cubo
+# degli scenari resta lo stesso e filtro e grafico si ricalcolano in poche decine di millisecondi, all'apertura
+# del tab o al cambio di configurazione (i parametri economici, modificabili solo nella vista finanziaria, sono State)
+@app.callback(
+    Output('grafico-frontiera', 'figure'),
+    Input('tabs-viste-grafici', 'value'),
+    [Input(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+)
+def aggiorna_frontiera(active_tab, *valori):
+    valori_fattori, parametri_economici = valori[:-4], tuple(valore_numerico(valore) for valore in valori[-4:])
+    if active_tab != 'tab-frontiera' or not all(valori_fattori):
+        raise PreventUpdate
+    cubo = ottieni_cubo()
+    scenario = cubo.cerca(dict(zip(ORDINE_FATTORI, valori_fattori)))
+    consumi = {'acqua': scenario['acqua_media'], 'fertilizzanti': scenario['fertilizzanti_media']}
+    corrente = {'profitto': simula_performance_finanziaria(scenario['produzione_media'], consumi,
+                                                           *parametri_economici)["Profitto Lordo (€/m²)"], **consumi}
+    return crea_figura_frontiera(frontiera_pareto(cubo, *parametri_economici), corrente)
+
+
+# Un clic su un punto della frontiera ne carica la configurazione (chiave in customdata) nei dropdown
+@app.callback(
+    [Output(id_fattore, 'value', allow_duplicate=True) for id_fattore in ORDINE_FATTORI],
+    Input('grafico-frontiera', 'clickData'),
+    prevent_initial_call=True
+)
+def carica_da_frontiera(click_data):
+    punti = (click_data or {}).get('points') or []
+    if not punti or punti[0].get('customdata') is None:
+        raise PreventUpdate
+    fattori = MODELLO.decodifica(int(punti[0]['customdata']))
+    return [fattori[id_fattore] for id_fattore in ORDINE_FATTORI]
+
+
+# Analisi di pareggio di tutte le configurazioni: dipende solo dai parametri economici, quindi il risultato
+# (circa un secondo di calcolo) è memoizzato e condiviso da classifica, riepilogo ed esportazione CSV
+# e si ricalcola solo all'apertura del tab: i parametri economici, modificabili nella vista finanziaria, sono State
+CACHE_PAREGGIO = CacheRisultati(dimensione_massima=16, ttl_secondi=600)
+CONFIGURAZIONI_CLASSIFICA = 20
+SEME_PAREGGIO = 0  # stessi scenari a ogni calcolo, così la classifica non cambia tra un aggiornamento e l'altro
+
+
+@memoizza(CACHE_PAREGGIO, chiave=lambda parametri_economici: parametri_economici)
+def pareggio_configurazioni(parametri_economici: tuple):
+    return analisi_pareggio(ottieni_cubo(), *parametri_economici, seed=SEME_PAREGGIO)
+
+
+@app.callback(
+    Output('riepilogo-pareggio', 'children'),
+    Output('tabella-pareggio', 'children'),
+    Input('tabs-viste-grafici', 'value'),
+    Input('dd-ordinamento-pareggio', 'value'),
+    [Input(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+)
+def aggiorna_pareggio(active_tab, criterio, *valori):
+    valori_fattori, parametri_economici = valori[:-4], tuple(valore_numerico(valore) for valore in valori[-4:])
+    if active_tab != 'tab-pareggio' or not all(valori_fattori):
+        raise PreventUpdate
+    corrente = dict(zip(ORDINE_FATTORI, valori_fattori))
+    try:
+        classifica = ordina_per_robustezza(pareggio_configurazioni(parametri_economici), criterio)
+    except ValueError as errore:
+        return html.P(str(errore), className="text-danger"), None
+    chiave = MODELLO.chiave(corrente)
+    posizione = classifica.index.get_loc(chiave) + 1
+    return (crea_riepilogo_pareggio(classifica.loc[chiave], posizione, len(classifica)),
+            crea_tabella_pareggio(classifica.head(CONFIGURAZIONI_CLASSIFICA), corrente))
+
+
+# Esportazione della classifica completa nell'ordine scelto
+@app.callback(
+    Output('download-pareggio', 'data'),
+    Input('btn-scarica-pareggio', 'n_clicks'),
+    State('dd-ordinamento-pareggio', 'value'),
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+    prevent_initial_call=True
+)
+def scarica_pareggio(n_clicks, criterio, *valori):
+    parametri_economici = tuple(valore_numerico(valore) for valore in valori)
+    try:
+        classifica = ordina_per_robustezza(pareggio_configurazioni(parametri_economici), criterio)
+    except ValueError:
+        raise PreventUpdate
+    return dcc.send_data_frame(classifica.to_csv, "analisi_pareggio.csv")
+
+
+# Flusso di cassa mensile: campioni, stagioni e mesi in un unico array per lotto di stagioni,
+# qualche decimo di secondo anche con l'orizzonte più lungo, solo col tab visibile (parametri economici come State)
+@app.callback(
+    Output('grafico-flusso', 'figure'),
+    Input('tabs-viste-grafici', 'value'),
+    Input('dd-stagioni-flusso', 'value'),
+    Input('radio-profilo-prezzi', 'value'),
+    [Input(id_fattore, 'value') for id_fattore in ORDINE_FATTORI],
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+)
+def aggiorna_flusso_cassa(active_tab, n_stagioni, profilo, *valori):
+    valori_fattori, parametri_economici = valori[:-4], tuple(valore_numerico(valore) for valore in valori[-4:])
+    if active_tab != 'tab-flusso' or not all(valori_fattori) or profilo not in PROFILI_PREZZI:
+        raise PreventUpdate
+    fattori = dict(zip(ORDINE_FATTORI, valori_fattori))
+    return crea_figura_flusso_cassa(simula_serie_mensili(fattori, parametri_economici, n_stagioni=n_stagioni,
+                                                         seed=seme_configurazione(fattori),
+                                                         profilo_prezzi=PROFILI_PREZZI[profilo]))
+
+
+# Portafoglio aziendale: il CSV caricato è decodificato una sola volta (cache sul contenuto), poi a ogni
+# apertura del tab (i parametri economici sono State) si ripete solo la simulazione delle configurazioni distinte
+CACHE_PORTAFOGLIO = CacheRisultati(dimensione_massima=4, ttl_secondi=600)
+SEME_PORTAFOGLIO = 0  # stesso portafoglio di esempio e stessi scenari a ogni calcolo
+
+
+@memoizza(CACHE_PORTAFOGLIO, chiave=lambda contenuto: hashlib.sha256(contenuto.encode()).hexdigest())
+def portafoglio_caricato(contenuto: str):
+    _, dati = contenuto.split(',', 1)
+    return leggi_portafoglio(io.StringIO(base64.b64decode(dati).decode('utf-8')))
+
+
+@app.callback(
+    Output('store-sorgente-portafoglio', 'data'),
+    Input('upload-portafoglio', 'contents'),
+    Input('btn-portafoglio-esempio', 'n_clicks'),
+    State('upload-portafoglio', 'filename'),
+    prevent_initial_call=True
+)
+def scegli_sorgente_portafoglio(contenuto, n_clicks, nome_file):
+    if ctx.triggered_id == 'btn-portafoglio-esempio':
+        return {'sorgente': 'esempio'}
+    if contenuto is None:
+        raise PreventUpdate
+    return {'sorgente': 'csv', 'nome': nome_file}
+
+
+@app.callback(
+    Output('riepilogo-portafoglio', 'children'),
+    Output('grafico-portafoglio', 'figure'),
+    Output('tabella-portafoglio', 'children'),
+    Input('tabs-viste-grafici', 'value'),
+    Input('store-sorgente-portafoglio', 'data'),
+    State('input-prezzo-vendita', 'value'),
+    State('input-costo-acqua', 'value'),
+    State('input-costo-fertilizzanti', 'value'),
+    State('input-costi-extra', 'value'),
+    State('upload-portafoglio', 'contents'),
+)
+def aggiorna_portafoglio(active_tab, sorgente, *valori):
+    valori_economici, contenuto = valori[:-1], valori[-1]
+    if active_tab != 'tab-portafoglio' or not sorgente:
+        raise PreventUpdate
+    parametri_economici = tuple(valore_numerico(valore) for valore in valori_economici)
+    try:
+        if sorgente['sorgente'] == 'esempio':
+            portafoglio, origine = portafoglio_esempio(seed=SEME_PORTAFOGLIO), "Portafoglio di esempio"
+        else:
+            portafoglio, origine = portafoglio_caricato(contenuto), sorgente['nome']
+        risultato = simula_portafoglio(portafoglio, parametri_economici, seed=SEME_PORTAFOGLIO)
+    except ValueError as errore:
+        return html.P(str(errore), className="text-danger"), crea_figura_portafoglio(), None
+    riepilogo = html.P(f"{origine}: {risultato['n_appezzamenti']:,} appezzamenti di {len(risultato['aziende'])} "
+                       f"aziende, {risultato['n_configurazioni']:,} configurazioni distinte simulate "
+                       f"({portafoglio.nbytes / 1e6:.1f} MB in memoria).", className="text-center")
+    return (riepilogo, crea_figura_portafoglio(risultato['aziende']),
+            crea_tabella_portafoglio(risultato['aziende'], risultato['totale']))
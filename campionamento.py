@@ -0,0 +1,201 @@
+import time
+
+import numpy as np
+
+# Campionatori delle uniformi in [0, 1)^d usate dal motore Monte Carlo (trasforma_uniformi):
+# pseudo-casuale, ipercubo latino e sequenza di Sobol con scrambling, tutti in NumPy.
+# Ogni campionatore riceve (n, d, rng) e restituisce una matrice (n, d); la casualità passa
+# solo da rng, così la riproducibilità per blocco del motore resta invariata.
+
+BIT_SOBOL = 32
+
+# Numeri di direzione di Joe e Kuo (new-joe-kuo-6.21201) per le dimensioni successive alla prima:
+# (polinomio primitivo con i coefficienti estremi inclusi, valori iniziali m_1..m_s)
+DIREZIONI_SOBOL = (
+    (3, (1,)),
+    (7, (1, 3)),
+    (11, (1, 3, 1)),
+    (13, (1, 1, 1)),
+    (19, (1, 1, 3, 3)),
+    (25, (1, 3, 5, 13)),
+    (37, (1, 1, 5, 5, 17)),
+    (41, (1, 1, 5, 5, 5)),
+    (47, (1, 1, 7, 11, 19)),
+    (55, (1, 1, 5, 1, 1)),
+    (59, (1, 1, 1, 3, 11)),
+    (61, (1, 3, 5, 5, 31)),
+    (67, (1, 3, 3, 9, 7, 49)),
+    (91, (1, 1, 1, 15, 21, 21)),
+    (97, (1, 3, 1, 13, 27, 49)),
+    (103, (1, 1, 1, 15, 7, 5)),
+    (109, (1, 3, 1, 15, 13, 25)),
+    (115, (1, 1, 5, 5, 19, 61)),
+    (131, (1, 3, 7, 11, 23, 15, 103)),
+    (137, (1, 3, 7, 13, 13, 15, 69)),
+    (143, (1, 1, 3, 13, 7, 35, 63)),
+    (145, (1, 3, 5, 9, 1, 25, 53)),
+    (157, (1, 3, 1, 13, 9, 35, 107)),
+    (167, (1, 3, 1, 5, 27, 61, 31)),
+    (171, (1, 1, 5, 11, 19, 41, 61)),
+    (185, (1, 3, 5, 3, 3, 13, 69)),
+    (191, (1, 1, 7, 13, 1, 19, 1)),
+    (193, (1, 3, 7, 5, 13, 19, 59)),
+    (203, (1, 1, 3, 9, 25, 29, 41)),
+    (211, (1, 3, 5, 13, 23, 1, 55)),
+    (213, (1, 3, 7, 3, 13, 59, 17)),
+)
+DIMENSIONE_MASSIMA_SOBOL = len(DIREZIONI_SOBOL) + 1
+
+
+def _matrice_direzioni() -> np.ndarray:
+    """
+    Vettori di direzione v[d, k] = m_k · 2^(BIT_SOBOL - k - 1) per ogni dimensione e bit.
+    """
+    m = np.ones((DIMENSIONE_MASSIMA_SOBOL, BIT_SOBOL), dtype=np.uint64)  # la prima dimensione ha m_k = 1
+    for d, (polinomio, iniziali) in enumerate(DIREZIONI_SOBOL, start=1):
+        grado = polinomio.bit_length() - 1
+        m[d, :grado] = iniziali
+        for k in range(grado, BIT_SOBOL):
+            # Ricorrenza di Bratley e Fox: m_k = 2^s m_{k-s} xor m_{k-s} xor sum_i 2^i a_i m_{k-i}
+            valore = (m[d, k - grado] << np.uint64(grado)) ^ m[d, k - grado]
+            for i in range(1, grado):
+                if (polinomio >> (grado - i)) & 1:
+                    valore ^= m[d, k - i] << np.uint64(i)
+            m[d, k] = valore
+    esponenti = np.arange(BIT_SOBOL - 1, -1, -1, dtype=np.uint64)
+    return m << esponenti
+
+
+DIREZIONI = _matrice_direzioni()
+DIREZIONI.setflags(write=False)
+
+
+def _scrambling_lineare(direzioni: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Scrambling lineare a matrice (LMS): ogni dimensione moltiplica in GF(2) i propri vettori di
+    direzione per una matrice triangolare inferiore casuale con diagonale unitaria.
+    """
+    d = len(direzioni)
+    triangolari = np.tril(rng.integers(0, 2, size=(d, BIT_SOBOL, BIT_SOBOL), dtype=np.uint8), k=-1)
+    triangolari[:, np.arange(BIT_SOBOL), np.arange(BIT_SOBOL)] = 1
+    spostamenti = np.arange(BIT_SOBOL - 1, -1, -1, dtype=np.uint64)
+    # bit[d, k, q]: bit q (dal più significativo) del k-esimo vettore di direzione
+    bit = ((direzioni[:, :, None] >> spostamenti) & np.uint64(1)).astype(np.uint8)
+    scramblati = np.einsum('dpq,dkq->dkp', triangolari, bit, dtype=np.int64) & 1
+    return (scramblati.astype(np.uint64) << spostamenti).sum(axis=2, dtype=np.uint64)
+
+
+def sobol(n: int, d: int, rng: np.random.Generator = None, scrambling: bool = True) -> np.ndarray:
+    """
+    Primi n punti della sequenza di Sobol in d dimensioni (d <= DIMENSIONE_MASSIMA_SOBOL),
+    con scrambling lineare e spostamento digitale casuali se richiesti. Le proprietà di
+    bilanciamento valgono per n potenza di 2.
+    """
+    if d > DIMENSIONE_MASSIMA_SOBOL:
+        raise ValueError(f"La sequenza di Sobol supporta al massimo {DIMENSIONE_MASSIMA_SOBOL} dimensioni")
+    direzioni = DIREZIONI[:d]
+    spostamento = np.zeros(d, dtype=np.uint64)
+    if scrambling:
+        rng = np.random.default_rng(rng)
+        direzioni = _scrambling_lineare(direzioni, rng)
+        spostamento = rng.integers(0, 2 ** BIT_SOBOL, size=d, dtype=np.uint64)
+
+    # Il punto i è lo xor dei vettori di direzione corrispondenti ai bit del suo codice di Gray
+    indici = np.arange(n, dtype=np.uint64)
+    gray = indici ^ (indici >> np.uint64(1))
+    interi = np.broadcast_to(spostamento, (n, d)).copy()
+    for k in range(max(int(n - 1).bit_length(), 1)):
+        attivi = ((gray >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        interi[attivi] ^= direzioni[:, k]
+    return interi * 2.0 ** -BIT_SOBOL
+
+
+def ipercubo_latino(n: int, d: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Campionamento a ipercubo latino: ogni dimensione è divisa in n strati equiprobabili, ciascuno
+    con esattamente un punto, in posizione casuale all'interno dello strato.
+    """
+    rng = np.random.default_rng(rng)
+    strati = rng.permuted(np.tile(np.arange(n), (d, 1)), axis=1).T
+    return (strati + rng.random((n, d))) / n
+
+
+def casuale(n: int, d: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Uniformi pseudo-casuali indipendenti (Monte Carlo semplice).
+    """
+    return np.random.default_rng(rng).random((n, d))
+
+
+CAMPIONATORI = {
+    'casuale': casuale,
+    'ipercubo_latino': ipercubo_latino,
+    'sobol': sobol,
+}
+
+
+def genera_uniformi(campionatore: str, n: int, d: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Matrice (n, d) di uniformi in [0, 1) prodotta dal campionatore indicato per nome.
+    """
+    try:
+        return CAMPIONATORI[campionatore](n, d, rng)
+    except KeyError:
+        raise ValueError(f"Campionatore '{campionatore}' non valido: scegliere tra {', '.join(CAMPIONATORI)}") from None
+
+
+def confronta_convergenza(fattori: dict, parametri_economici, dimensioni=tuple(2 ** k for k in range(8, 17)),
+                          n_ripetizioni: int = 32, seed: int = 0) -> dict:
+    """
+    Errore quadratico medio delle stime della media di produzione e profitto rispetto al valore
+    esatto (modalità analitica), per ogni campionatore e numero di campioni, su ripetizioni indipendenti.
+    """
+    from data import N_DIMENSIONI, aggiungi_finanza, calcola_valori_attesi, intervalli_configurazione, trasforma_uniformi
+
+    basso, alto = intervalli_configurazione(fattori)
+    esatti = calcola_valori_attesi(fattori, *parametri_economici)
+    radice = np.random.SeedSequence(seed)
+    risultati = {}
+    for nome in CAMPIONATORI:
+        for n in dimensioni:
+            errori = {'produzione': [], 'profitto': []}
+            for seme in radice.spawn(n_ripetizioni):
+                valori = aggiungi_finanza(trasforma_uniformi(genera_uniformi(nome, n, N_DIMENSIONI, seme), basso, alto),
+                                          *parametri_economici)
+                for grandezza in errori:
+                    errori[grandezza].append(valori[grandezza].mean() - esatti[grandezza]['media'])
+            risultati[(nome, n)] = {grandezza: float(np.sqrt(np.mean(np.square(valori))))
+                                    for grandezza, valori in errori.items()}
+    return risultati
+
+
+def campioni_per_precisione(risultati: dict, grandezza: str, errore_obiettivo: float) -> dict:
+    """
+    Per ogni campionatore, il minimo numero di campioni (tra quelli provati) con errore
+    quadratico medio entro l'obiettivo, o None se non raggiunto.
+    """
+    sufficienti = {}
+    for (nome, n), errori in sorted(risultati.items(), key=lambda voce: voce[0][1]):
+        if errori[grandezza] <= errore_obiettivo and sufficienti.get(nome) is None:
+            sufficienti[nome] = n
+        sufficienti.setdefault(nome, None)
+    return sufficienti
+
+
+if __name__ == '__main__':
+    # Benchmark: campioni necessari per una data precisione rispetto al Monte Carlo semplice
+    from data import PRESETS
+
+    fattori = PRESETS['btn-preset-medie']
+    parametri_economici = (3.5, 1.0, 2.5, 5000)
+    inizio = time.perf_counter()
+    risultati = confronta_convergenza(fattori, parametri_economici)
+    print(f"Errore quadratico medio della media (32 ripetizioni, {time.perf_counter() - inizio:.1f} s)\n")
+    print(f"{'campioni':>9} " + " ".join(f"{nome + ' prod.':>22} {nome + ' profitto':>22}" for nome in CAMPIONATORI))
+    for n in sorted({n for _, n in risultati}):
+        print(f"{n:>9} " + " ".join(f"{risultati[(nome, n)]['produzione']:>22.2e} {risultati[(nome, n)]['profitto']:>22.2e}"
+                                    for nome in CAMPIONATORI))
+    for grandezza, obiettivo in (('produzione', 1e-3), ('profitto', 5e-3)):
+        print(f"\nCampioni per errore quadratico medio <= {obiettivo} su {grandezza}: "
+              + ", ".join(f"{nome}: {n if n is not None else '> massimo provato'}"
+                          for nome, n in campioni_per_precisione(risultati, grandezza, obiettivo).items()))
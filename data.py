@@ -1,6 +1,14 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import NamedTuple
+
 import pandas as pd
 import numpy as np
 
+from campionamento import CAMPIONATORI, genera_uniformi
+
 PRODUZIONE_BASE_OTTIMALE = 10.0  # kg/m², potenziale massimo teorico stagionale
 RANGE_OTTIMALE_ACQUA = (300, 450) # l/m², consumo ottimale stagionale d'acqua
 RANGE_OTTIMALE_FERTILIZZANTI = (0.010, 0.015) # kg/m², consumo ottimale stagionale di fertilizzanti
@@ -46,7 +54,7 @@ IMPATTI_RISORSE = {
     },
     'dd-patogeni': { # Impatto nullo sul consumo, ma sulla produzione
         'integrata': {'acqua': (0.0, 0.0), 'fertilizzanti': (0.0, 0.0)},
-        'biologica': {'acqua': (0.0, 0.0), 'fertilizzanti': (0.0, 0.0)},
+        'biologico': {'acqua': (0.0, 0.0), 'fertilizzanti': (0.0, 0.0)},
         'convenzionale': {'acqua': (0.0, 0.0), 'fertilizzanti': (0.0, 0.0)},
     },
     'dd-frequenza-raccolta': { # Impatto nullo sul consumo
@@ -67,64 +75,271 @@ IMPATTI_RISORSE = {
 }
 
 
-def simula_produzione_annua(fattori_selezionati):
+# Dizionario dei PRESETS per modificare simultaneamente i fattori (chiave: id del pulsante)
+PRESETS = {
+    "btn-preset-tradizionale": {
+        'dd-temperatura': 'sub-freddo',
+        'dd-luce': 'media',
+        'dd-umidita': 'alta_rischiosa',
+        'dd-irrigazione': 'manuale',
+        'dd-fertilizzazione': 'organica',
+        'dd-patogeni': 'convenzionale',
+        'dd-frequenza-raccolta': 'bassa',
+        'dd-impollinazione': 'naturale',
+        'dd-sistema-colturale': 'suolo_tradizionale'
+    },
+    "btn-preset-soilless": {
+        'dd-temperatura': 'ottimale',
+        'dd-luce': 'alta',
+        'dd-umidita': 'ottimale',
+        'dd-irrigazione': 'goccia',
+        'dd-fertilizzazione': 'fertirrigazione',
+        'dd-patogeni': 'integrata',
+        'dd-frequenza-raccolta': 'media',
+        'dd-impollinazione': 'bombi',
+        'dd-sistema-colturale': 'soilless_aperto'
+    },
+    "btn-preset-idroponica": {
+        'dd-temperatura': 'ottimale',
+        'dd-luce': 'alta',
+        'dd-umidita': 'ottimale',
+        'dd-irrigazione': 'goccia',
+        'dd-fertilizzazione': 'idroponica',
+        'dd-patogeni': 'integrata',
+        'dd-frequenza-raccolta': 'alta',
+        'dd-impollinazione': 'bombi',
+        'dd-sistema-colturale': 'idroponico_ricircolo'
+    },
+    "btn-preset-sfavorevoli": {
+        'dd-temperatura': 'critico', 'dd-luce': 'bassa', 'dd-umidita': 'alta_rischiosa', 'dd-irrigazione': 'manuale',
+        'dd-fertilizzazione': 'organica', 'dd-patogeni': 'convenzionale', 'dd-frequenza-raccolta': 'bassa',
+        'dd-impollinazione': 'manuale', 'dd-sistema-colturale': 'suolo_tradizionale'
+    },
+    "btn-preset-medie": {
+        'dd-temperatura': 'sub-caldo', 'dd-luce': 'media', 'dd-umidita': 'alta_rischiosa',
+        'dd-irrigazione': 'aspersione',
+        'dd-fertilizzazione': 'fertirrigazione', 'dd-patogeni': 'biologico', 'dd-frequenza-raccolta': 'media',
+        'dd-impollinazione': 'naturale', 'dd-sistema-colturale': 'soilless_aperto'
+    },
+    "btn-preset-ottimali": {
+        'dd-temperatura': 'ottimale', 'dd-luce': 'alta', 'dd-umidita': 'ottimale', 'dd-irrigazione': 'goccia',
+        'dd-fertilizzazione': 'idroponica', 'dd-patogeni': 'integrata', 'dd-frequenza-raccolta': 'alta',
+        'dd-impollinazione': 'bombi', 'dd-sistema-colturale': 'idroponico_ricircolo'
+    }
+}
+
+
+# --- Modello compilato ---
+# Ogni campione del motore vettoriale è una riga di uniformi con un layout fisso delle colonne:
+# [moltiplicatori produzione (uno per fattore) | base acqua | base fertilizzanti |
+#  modificatori acqua (uno per fattore) | modificatori fertilizzanti (uno per fattore)]
+ORDINE_FATTORI = tuple(PESI_FATTORI)
+# Nomi leggibili dei fattori, come nelle etichette dei dropdown
+NOMI_FATTORI = {
+    'dd-temperatura': 'Temperatura',
+    'dd-luce': 'Luce',
+    'dd-irrigazione': 'Irrigazione',
+    'dd-fertilizzazione': 'Fertilizzazione',
+    'dd-patogeni': 'Controllo Patogeni',
+    'dd-frequenza-raccolta': 'Frequenza Raccolta',
+    'dd-impollinazione': 'Impollinazione',
+    'dd-umidita': 'Umidità Relativa',
+    'dd-sistema-colturale': 'Sistema di Coltura',
+}
+N_FATTORI = len(ORDINE_FATTORI)
+N_DIMENSIONI = 3 * N_FATTORI + 2
+RISORSE = ('acqua', 'fertilizzanti')
+
+
+class ErroreModello(ValueError):
+    """Incoerenza tra le tabelle PESI_FATTORI e IMPATTI_RISORSE."""
+
+
+class ModelloCompilato:
     """
-    Calcola la produzione annua simulata in kg/m² basandosi sui fattori selezionati.
+    Forma compilata delle tabelle del modello, costruita una sola volta all'import:
+    fattori e opzioni diventano codici interi, i limiti delle uniformi sono array NumPy
+    contigui e una selezione completa si riduce a un'unica chiave intera a radice mista.
     """
-    produzione_corrente = PRODUZIONE_BASE_OTTIMALE
-    for fattore_id, valore_selezionato in fattori_selezionati.items():
-        # Trova il range di pesi per il valore selezionato di quel fattore
-        range_peso = PESI_FATTORI[fattore_id][valore_selezionato]
-        # Estrai un moltiplicatore casuale da quel range
-        moltiplicatore = np.random.uniform(range_peso[0], range_peso[1])
-        # Applica il moltiplicatore
-        produzione_corrente *= moltiplicatore
-    return produzione_corrente
 
+    def __init__(self, pesi_fattori: dict, impatti_risorse: dict):
+        valida_tabelle(pesi_fattori, impatti_risorse)
+        self.fattori = tuple(pesi_fattori)
+        self.opzioni = {id_fattore: tuple(pesi_fattori[id_fattore]) for id_fattore in self.fattori}
+        self.codici = {id_fattore: {opzione: codice for codice, opzione in enumerate(opzioni)}
+                       for id_fattore, opzioni in self.opzioni.items()}
+
+        # Basi della numerazione a radice mista: chiave = Σ codice_i · passo_i
+        self.basi = np.array([len(self.opzioni[id_fattore]) for id_fattore in self.fattori], dtype=np.int64)
+        self.passi = np.concatenate([np.cumprod(self.basi[::-1])[::-1][1:], [1]])
+        self.n_configurazioni = int(self.basi.prod())
+        # Contributo di ogni opzione alla chiave, per calcolarla con sole somme di interi Python
+        self._contributi = {id_fattore: {opzione: codice * int(passo) for opzione, codice in self.codici[id_fattore].items()}
+                            for id_fattore, passo in zip(self.fattori, self.passi)}
+
+        # Limiti (fattore, opzione, [produzione, acqua, fertilizzanti]); l'ultima opzione
+        # è neutra (moltiplicatore 1, modificatori 0) e corrisponde al codice -1 dei fattori non scelti
+        forma = (len(self.fattori), int(self.basi.max()) + 1, 3)
+        self.basso = np.zeros(forma)
+        self.alto = np.zeros(forma)
+        self.basso[:, :, 0] = self.alto[:, :, 0] = 1.0
+        for i, id_fattore in enumerate(self.fattori):
+            for codice, opzione in enumerate(self.opzioni[id_fattore]):
+                self.basso[i, codice, 0], self.alto[i, codice, 0] = pesi_fattori[id_fattore][opzione]
+                for j, risorsa in enumerate(RISORSE, start=1):
+                    self.basso[i, codice, j], self.alto[i, codice, j] = impatti_risorse[id_fattore][opzione][risorsa]
+        self._indici_fattori = np.arange(len(self.fattori))
+
+    def codifica(self, fattori: dict) -> np.ndarray:
+        """
+        Converte una selezione (anche parziale) nel vettore dei codici; -1 per i fattori non scelti.
+        Solleva ErroreModello per i fattori che il modello non conosce.
+        """
+        sconosciuti = set(fattori) - set(self.fattori)
+        if sconosciuti:
+            raise ErroreModello(f"Fattori sconosciuti: {', '.join(sorted(map(str, sconosciuti)))}")
+        return np.array([self.codici[id_fattore][fattori[id_fattore]] if id_fattore in fattori else -1
+                         for id_fattore in self.fattori], dtype=np.int16)
+
+    def chiave(self, fattori: dict) -> int:
+        """
+        Chiave a radice mista di una selezione completa.
+        """
+        return sum(self._contributi[id_fattore][fattori[id_fattore]] for id_fattore in self.fattori)
+
+    def chiavi(self, codici: np.ndarray) -> np.ndarray:
+        """
+        Chiavi di una matrice (n, N_FATTORI) di codici completi.
+        """
+        return np.asarray(codici, dtype=np.int64) @ self.passi
+
+    def codici_da_chiavi(self, chiavi) -> np.ndarray:
+        """
+        Decodifica una o più chiavi nella matrice (n, N_FATTORI) dei codici delle opzioni.
+        """
+        chiavi = np.atleast_1d(np.asarray(chiavi, dtype=np.int64))
+        return ((chiavi[:, None] // self.passi) % self.basi).astype(np.int16)
 
-def simula_consumo_risorse(fattori: dict) -> tuple[dict, dict]:
+    def decodifica(self, chiave: int) -> dict:
+        """
+        Ricostruisce il dizionario dei fattori (come quello dei dropdown) a partire dalla chiave.
+        """
+        codici = self.codici_da_chiavi(chiave)[0]
+        return {id_fattore: self.opzioni[id_fattore][codice] for id_fattore, codice in zip(self.fattori, codici)}
+
+    def intervalli(self, codici: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Limiti inferiori e superiori delle uniformi, forma (..., N_DIMENSIONI),
+        per uno o più vettori di codici con forma (..., N_FATTORI).
+        """
+        codici = np.asarray(codici)
+        limiti = []
+        for tabella, base_acqua, base_fertilizzanti in ((self.basso, RANGE_OTTIMALE_ACQUA[0], RANGE_OTTIMALE_FERTILIZZANTI[0]),
+                                                        (self.alto, RANGE_OTTIMALE_ACQUA[1], RANGE_OTTIMALE_FERTILIZZANTI[1])):
+            valori = tabella[self._indici_fattori, codici]  # (..., N_FATTORI, 3)
+            risultato = np.empty(codici.shape[:-1] + (N_DIMENSIONI,))
+            risultato[..., :N_FATTORI] = valori[..., 0]
+            risultato[..., N_FATTORI] = base_acqua
+            risultato[..., N_FATTORI + 1] = base_fertilizzanti
+            risultato[..., N_FATTORI + 2:2 * N_FATTORI + 2] = valori[..., 1]
+            risultato[..., 2 * N_FATTORI + 2:] = valori[..., 2]
+            limiti.append(risultato)
+        return limiti[0], limiti[1]
+
+
+def valida_tabelle(pesi_fattori: dict, impatti_risorse: dict) -> None:
     """
-    Simula il consumo di risorse partendo da un range ottimale e applicando
-    una somma di modificatori percentuali casuali basati sulle scelte agronomiche.
-    Mantiene la struttura del dizionario IMPATTI_RISORSE.
+    Verifica la coerenza tra le tabelle dei pesi e degli impatti e solleva ErroreModello
+    con l'elenco di tutte le incoerenze trovate.
+    """
+    errori = []
+
+    def valida_range(nome, valore, minimo=None):
+        try:
+            basso, alto = valore
+            if not (np.isfinite(basso) and np.isfinite(alto) and basso <= alto):
+                errori.append(f"{nome}: range non valido {valore!r}")
+            elif minimo is not None and basso < minimo:
+                errori.append(f"{nome}: il limite inferiore deve essere >= {minimo}")
+        except (TypeError, ValueError):
+            errori.append(f"{nome}: atteso un range (basso, alto), trovato {valore!r}")
+
+    for id_fattore in set(pesi_fattori) ^ set(impatti_risorse):
+        errori.append(f"{id_fattore}: fattore presente in una sola delle due tabelle")
+    for id_fattore in pesi_fattori:
+        if not pesi_fattori[id_fattore]:
+            errori.append(f"{id_fattore}: nessuna opzione definita")
+        for opzione, valore in pesi_fattori[id_fattore].items():
+            valida_range(f"PESI_FATTORI[{id_fattore!r}][{opzione!r}]", valore, minimo=0)
+        if id_fattore not in impatti_risorse:
+            continue
+        for opzione in set(pesi_fattori[id_fattore]) ^ set(impatti_risorse[id_fattore]):
+            errori.append(f"{id_fattore}: opzione {opzione!r} presente in una sola delle due tabelle")
+        for opzione, modificatori in impatti_risorse[id_fattore].items():
+            if set(modificatori) != set(RISORSE):
+                errori.append(f"IMPATTI_RISORSE[{id_fattore!r}][{opzione!r}]: attese le chiavi {RISORSE}")
+                continue
+            for risorsa in RISORSE:
+                valida_range(f"IMPATTI_RISORSE[{id_fattore!r}][{opzione!r}][{risorsa!r}]", modificatori[risorsa])
+
+    if errori:
+        raise ErroreModello("Tabelle del modello incoerenti:\n" + "\n".join(sorted(errori)))
+
+
+MODELLO = ModelloCompilato(PESI_FATTORI, IMPATTI_RISORSE)
+
+
+def intervalli_configurazione(fattori: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Costruisce i limiti inferiori e superiori delle N_DIMENSIONI uniformi
+    che descrivono una configurazione, secondo il layout del motore vettoriale.
+    I fattori non selezionati valgono come moltiplicatore 1 e modificatore 0.
 
     Args:
-        fattori (dict): Un dizionario con le scelte per ogni fattore (es. {'dd-temperatura': 'sub-caldo'}).
+        fattori (dict): Le scelte per ogni fattore (es. {'dd-temperatura': 'sub-caldo'}).
 
     Returns:
-        dict: Un dizionario con 'acqua' (l/mq) e 'fertilizzanti' (kg/mq).
+        tuple[np.ndarray, np.ndarray]: I vettori (N_DIMENSIONI,) dei limiti inferiori e superiori.
     """
+    return MODELLO.intervalli(MODELLO.codifica(fattori))
 
-    mod_totale_acqua = 0.0
-    mod_totale_fertilizzanti = 0.0
-
-    consumo_base_acqua = np.random.uniform(*RANGE_OTTIMALE_ACQUA)
-    consumo_base_fertilizzanti = np.random.uniform(*RANGE_OTTIMALE_FERTILIZZANTI)
 
-    # Iterazione sui fattori scelti dall'utente per calcolarne la somma
-    for id_fattore, scelta_utente in fattori.items():
-        if id_fattore in IMPATTI_RISORSE and scelta_utente in IMPATTI_RISORSE[id_fattore]:
-            modificatori = IMPATTI_RISORSE[id_fattore][scelta_utente]
+def simula_produzione_annua(fattori_selezionati, rng=None):
+    """
+    Calcola la produzione annua simulata in kg/m² basandosi sui fattori selezionati.
+    Se viene passato un np.random.Generator (rng) l'estrazione è riproducibile,
+    altrimenti si usa lo stato globale di np.random.
+    """
+    generatore = np.random if rng is None else rng
+    basso, alto = intervalli_configurazione(fattori_selezionati)
+    # Un moltiplicatore casuale per ogni fattore, estratto dal rispettivo range
+    moltiplicatori = generatore.uniform(basso[:N_FATTORI], alto[:N_FATTORI])
+    return float(PRODUZIONE_BASE_OTTIMALE * moltiplicatori.prod())
 
-            # Estrazione del range di modifica per l'acqua, scelta del valore casuale e somma
-            range_mod_acqua = modificatori['acqua']
-            mod_totale_acqua += np.random.uniform(*range_mod_acqua)
 
-            # Estrazione del range di modifica per i fertilizzanti, scelta del valore casuale e somma
-            range_mod_fertilizzanti = modificatori['fertilizzanti']
-            mod_totale_fertilizzanti += np.random.uniform(*range_mod_fertilizzanti)
+def simula_consumo_risorse(fattori: dict, rng=None) -> dict:
+    """
+    Simula il consumo di risorse partendo da un range ottimale e applicando
+    una somma di modificatori percentuali casuali basati sulle scelte agronomiche.
 
-    #Modificatori totali applicati ai valori di base
-    consumo_finale_acqua = consumo_base_acqua * (1 + mod_totale_acqua)
-    consumo_finale_fertilizzanti = consumo_base_fertilizzanti * (1 + mod_totale_fertilizzanti)
+    Args:
+        fattori (dict): Un dizionario con le scelte per ogni fattore (es. {'dd-temperatura': 'sub-caldo'}).
+        rng (np.random.Generator, opzionale): Generatore per estrazioni riproducibili.
 
-    #Valori sempre postivi
-    consumo_finale_acqua = max(0, consumo_finale_acqua)
-    consumo_finale_fertilizzanti = max(0, consumo_finale_fertilizzanti)
+    Returns:
+        dict: Un dizionario con 'acqua' (l/mq) e 'fertilizzanti' (kg/mq).
+    """
+    generatore = np.random if rng is None else rng
+    basso, alto = intervalli_configurazione(fattori)
+    # Consumi di base e modificatori di tutti i fattori estratti in un'unica chiamata
+    valori = generatore.uniform(basso[N_FATTORI:], alto[N_FATTORI:])
+    mod_totale_acqua = valori[2:N_FATTORI + 2].sum()
+    mod_totale_fertilizzanti = valori[N_FATTORI + 2:].sum()
 
+    #Modificatori totali applicati ai valori di base, valori sempre positivi
     return {
-        'acqua': consumo_finale_acqua,
-        'fertilizzanti': consumo_finale_fertilizzanti
+        'acqua': max(0.0, float(valori[0] * (1 + mod_totale_acqua))),
+        'fertilizzanti': max(0.0, float(valori[1] * (1 + mod_totale_fertilizzanti)))
     }
 
 
@@ -166,21 +381,771 @@ def simula_performance_finanziaria(produzione_kg_mq, consumi_risorse_mq, prezzo_
         "Profitto Lordo (€/m²)": profitto_lordo_mq
     }
 
-def prepare_benchmark_dataframe(fattori: dict) -> tuple[pd.DataFrame, float]:
+
+# --- Motore Monte Carlo vettoriale ---
+DIMENSIONE_BLOCCO = 65_536  # campioni estratti per blocco, limita la memoria temporanea
+GRANDEZZE_SIMULATE = ('produzione', 'acqua', 'fertilizzanti', 'ricavi', 'costi', 'profitto')
+
+
+def trasforma_uniformi(uniformi: np.ndarray, basso: np.ndarray, alto: np.ndarray) -> dict:
+    """
+    Trasforma una matrice di uniformi in [0, 1) nei valori agronomici simulati.
+    È il cuore vettoriale condiviso da tutte le modalità di campionamento.
+
+    Args:
+        uniformi (np.ndarray): Matrice (n, N_DIMENSIONI) di uniformi in [0, 1).
+        basso (np.ndarray): Limiti inferiori restituiti da intervalli_configurazione.
+        alto (np.ndarray): Limiti superiori restituiti da intervalli_configurazione.
+
+    Returns:
+        dict: Array (n,) di 'produzione' (kg/m²), 'acqua' (l/m²) e 'fertilizzanti' (kg/m²).
+    """
+    valori = uniformi * (alto - basso)
+    valori += basso
+    produzione = PRODUZIONE_BASE_OTTIMALE * valori[:, :N_FATTORI].prod(axis=1)
+    mod_acqua = valori[:, N_FATTORI + 2:2 * N_FATTORI + 2].sum(axis=1)
+    mod_fertilizzanti = valori[:, 2 * N_FATTORI + 2:].sum(axis=1)
+    return {
+        'produzione': produzione,
+        # Valori sempre positivi, come nella versione scalare
+        'acqua': np.maximum(0.0, valori[:, N_FATTORI] * (1 + mod_acqua)),
+        'fertilizzanti': np.maximum(0.0, valori[:, N_FATTORI + 1] * (1 + mod_fertilizzanti)),
+    }
+
+
+def verifica_n_campioni(n_campioni, nome: str = 'campioni') -> int:
+    """
+    Controlla che il numero di campioni richiesto (o di altre unità, indicate da nome) sia un intero
+    positivo e lo restituisce come int.
+    """
+    if isinstance(n_campioni, (bool, np.bool_)) or not isinstance(n_campioni, (int, np.integer)) or n_campioni < 1:
+        raise ValueError(f"Il numero di {nome} deve essere un intero positivo, non {n_campioni!r}")
+    return int(n_campioni)
+
+
+def riassumi_campioni(valori: np.ndarray) -> dict:
+    """
+    Calcola le statistiche di sintesi di una distribuzione campionata.
+
+    Returns:
+        dict: 'media', 'std', 'p5', 'p50' e 'p95' dei valori.
+    """
+    if np.size(valori) == 0:
+        raise ValueError("Impossibile riassumere una distribuzione senza campioni")
+    p5, p50, p95 = np.percentile(valori, [5, 50, 95])
+    return {'media': float(valori.mean()), 'std': float(valori.std()),
+            'p5': float(p5), 'p50': float(p50), 'p95': float(p95)}
+
+
+def semi_blocchi(seed, n_blocchi: int) -> list:
+    """
+    Deriva da un unico seme radice un flusso indipendente (SeedSequence) per ogni blocco.
+    Poiché i flussi dipendono solo dall'indice del blocco, il risultato non cambia
+    con il numero di processi tra cui i blocchi vengono distribuiti.
+    """
+    if isinstance(seed, np.random.Generator):
+        radice = seed.bit_generator.seed_seq
+    elif isinstance(seed, np.random.SeedSequence):
+        radice = seed
+    else:
+        radice = np.random.SeedSequence(seed)
+    return radice.spawn(n_blocchi)
+
+
+def _simula_blocchi(basso: np.ndarray, alto: np.ndarray, semi: list, dimensioni: list, al_blocco=None,
+                    campionatore: str = 'casuale') -> dict:
+    """
+    Simula una sequenza contigua di blocchi, ciascuno con il proprio flusso.
+    È una funzione di modulo, così da poter essere eseguita nei processi del pool.
+    """
+    totale = sum(dimensioni)
+    campioni = {nome: np.empty(totale) for nome in ('produzione', 'acqua', 'fertilizzanti')}
+    inizio = 0
+    for seme, dimensione in zip(semi, dimensioni):
+        blocco = trasforma_uniformi(genera_uniformi(campionatore, dimensione, N_DIMENSIONI, seme), basso, alto)
+        for nome, valori in blocco.items():
+            campioni[nome][inizio:inizio + dimensione] = valori
+        inizio += dimensione
+        if al_blocco is not None:
+            al_blocco()
+    return campioni
+
+
+def simula_campioni_agronomici(fattori: dict, n_campioni: int = 100_000, seed=None, n_processi: int = 1,
+                               al_progresso=None, campionatore: str = 'casuale') -> dict:
+    """
+    Estrae n_campioni valori di produzione e consumo di risorse per una configurazione.
+    I blocchi possono essere distribuiti su un pool di processi: con lo stesso seed
+    il risultato è identico bit per bit qualunque sia n_processi.
+
+    Args:
+        fattori (dict): Il dizionario con i valori selezionati dai dropdown.
+        n_campioni (int): Numero di campioni da estrarre.
+        seed: Seme radice (int, SeedSequence o np.random.Generator) per rendere la simulazione riproducibile.
+        n_processi (int): Numero di processi del pool (None = tutti i core, 1 = esecuzione seriale).
+        al_progresso: Funzione opzionale chiamata con (blocchi_completati, n_blocchi) man mano che si procede.
+        campionatore (str): Uno di CAMPIONATORI ('casuale', 'ipercubo_latino', 'sobol'); ogni blocco
+            è un campione stratificato o una sequenza di Sobol randomizzata indipendente.
+
+    Returns:
+        dict: Array (n_campioni,) di 'produzione', 'acqua' e 'fertilizzanti'.
+    """
+    if campionatore not in CAMPIONATORI:
+        raise ValueError(f"Campionatore '{campionatore}' non valido: scegliere tra {', '.join(CAMPIONATORI)}")
+    n_campioni = verifica_n_campioni(n_campioni)
+    basso, alto = intervalli_configurazione(fattori)
+
+    n_blocchi = -(-n_campioni // DIMENSIONE_BLOCCO)
+    semi = semi_blocchi(seed, n_blocchi)
+    dimensioni = [min(DIMENSIONE_BLOCCO, n_campioni - i * DIMENSIONE_BLOCCO) for i in range(n_blocchi)]
+
+    n_processi = min(n_processi or os.cpu_count() or 1, max(n_blocchi, 1))
+    completati = 0
+
+    def avanza(n_completati=1):
+        nonlocal completati
+        completati += n_completati
+        if al_progresso is not None:
+            al_progresso(completati, n_blocchi)
+
+    if n_processi == 1:
+        return _simula_blocchi(basso, alto, semi, dimensioni, al_blocco=avanza, campionatore=campionatore)
+
+    # Ogni processo riceve un gruppo contiguo di blocchi; i risultati si raccolgono nell'ordine dei gruppi
+    gruppi = np.array_split(np.arange(n_blocchi), n_processi)
+    parti = []
+    with ProcessPoolExecutor(max_workers=n_processi) as pool:
+        futuri = [pool.submit(_simula_blocchi, basso, alto, [semi[i] for i in gruppo], [dimensioni[i] for i in gruppo],
+                              campionatore=campionatore)
+                  for gruppo in gruppi]
+        for gruppo, futuro in zip(gruppi, futuri):
+            parti.append(futuro.result())
+            avanza(len(gruppo))
+    return {nome: np.concatenate([parte[nome] for parte in parti]) for nome in parti[0]}
+
+
+def aggiungi_finanza(campioni: dict, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha) -> dict:
+    """
+    Restituisce i campioni agronomici completati con 'ricavi', 'costi' e 'profitto' (€/m²).
+    """
+    # La formula finanziaria è puramente aritmetica e si applica direttamente agli array
+    finanza = simula_performance_finanziaria(campioni['produzione'], campioni, prezzo_vendita_kg,
+                                             costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+    ricavi = finanza["Ricavi (€/m²)"]
+    profitto = finanza["Profitto Lordo (€/m²)"]
+    return {**campioni, 'ricavi': ricavi, 'costi': ricavi - profitto, 'profitto': profitto}
+
+
+def simula_monte_carlo(fattori: dict, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha,
+                       n_campioni: int = 100_000, seed=None, n_processi: int = 1, al_progresso=None,
+                       campionatore: str = 'casuale') -> dict:
+    """
+    Simula in blocco n_campioni scenari per una configurazione, con sole operazioni
+    vettoriali NumPy, e ne restituisce le distribuzioni e le statistiche di sintesi.
+
+    Args:
+        fattori (dict): Il dizionario con i valori selezionati dai dropdown.
+        prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha: Parametri economici
+            con le stesse unità di simula_performance_finanziaria.
+        n_campioni, seed, n_processi, al_progresso, campionatore: Come in simula_campioni_agronomici.
+
+    Returns:
+        dict: 'campioni' con gli array (n_campioni,) di GRANDEZZE_SIMULATE
+              e 'statistiche' con il riassunto di ciascuna grandezza.
+    """
+    campioni = aggiungi_finanza(simula_campioni_agronomici(fattori, n_campioni, seed, n_processi, al_progresso,
+                                                           campionatore),
+                                prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+    return {
+        'campioni': campioni,
+        'statistiche': {nome: riassumi_campioni(campioni[nome]) for nome in GRANDEZZE_SIMULATE},
+    }
+
+
+# Distribuzione Monte Carlo a memoria costante: ogni blocco è ridotto subito a statistiche e conteggi
+CLASSI_FINI = 1 << 16  # classi fisse dell'istogramma accumulato, sull'intervallo teorico di ogni grandezza
+CLASSI_ISTOGRAMMA = 80  # classi (circa) dell'istogramma restituito per il grafico
+
+
+def _intervallo_prodotto(a: tuple, b: tuple) -> tuple:
+    prodotti = (a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1])
+    return min(prodotti), max(prodotti)
+
+
+def intervalli_grandezze(basso: np.ndarray, alto: np.ndarray, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg,
+                         costi_extra_ha) -> dict:
+    """
+    Minimo e massimo teorici di ogni grandezza di GRANDEZZE_SIMULATE per i limiti di una configurazione,
+    con l'aritmetica degli intervalli sulle formule di trasforma_uniformi e simula_performance_finanziaria.
+    """
+    produzione = (PRODUZIONE_BASE_OTTIMALE, PRODUZIONE_BASE_OTTIMALE)
+    for i in range(N_FATTORI):
+        produzione = _intervallo_prodotto(produzione, (basso[i], alto[i]))
+    consumi = {}
+    for j, nome in enumerate(RISORSE):
+        modificatori = slice((1 + j) * N_FATTORI + 2, (2 + j) * N_FATTORI + 2)
+        minimo, massimo = _intervallo_prodotto((basso[N_FATTORI + j], alto[N_FATTORI + j]),
+                                               (1 + basso[modificatori].sum(), 1 + alto[modificatori].sum()))
+        consumi[nome] = (max(0.0, minimo), max(0.0, massimo))
+    ricavi = _intervallo_prodotto(produzione, (prezzo_vendita_kg, prezzo_vendita_kg))
+    costo_acqua = _intervallo_prodotto(consumi['acqua'], (costo_acqua_m3 / 1000, costo_acqua_m3 / 1000))
+    costo_fert = _intervallo_prodotto(consumi['fertilizzanti'], (costo_fert_kg, costo_fert_kg))
+    costi = tuple(a + f + costi_extra_ha / 10000 for a, f in zip(costo_acqua, costo_fert))
+    return {'produzione': produzione, **consumi, 'ricavi': ricavi, 'costi': costi,
+            'profitto': (ricavi[0] - costi[1], ricavi[1] - costi[0])}
+
+
+def _riassumi_blocchi(basso: np.ndarray, alto: np.ndarray, semi: list, dimensioni: list, parametri_economici,
+                      limiti: np.ndarray, al_blocco=None, campionatore: str = 'casuale') -> dict:
+    """
+    Come _simula_blocchi, ma ogni blocco è ridotto subito a statistiche incrementali, estremi osservati
+    e conteggi su CLASSI_FINI classi fisse tra i limiti (len(GRANDEZZE_SIMULATE), 2): la memoria non
+    dipende dal numero di campioni. È una funzione di modulo, eseguibile nei processi del pool.
+    """
+    statistiche = StatisticheIncrementali(GRANDEZZE_SIMULATE)
+    conteggi = np.zeros((len(GRANDEZZE_SIMULATE), CLASSI_FINI), dtype=np.int64)
+    estremi = np.tile([np.inf, -np.inf], (len(GRANDEZZE_SIMULATE), 1))
+    scale = CLASSI_FINI / (limiti[:, 1] - limiti[:, 0])
+    for seme, dimensione in zip(semi, dimensioni):
+        blocco = aggiungi_finanza(_simula_blocchi(basso, alto, [seme], [dimensione], campionatore=campionatore),
+                                  *parametri_economici)
+        statistiche.aggiorna(blocco)
+        for g, nome in enumerate(GRANDEZZE_SIMULATE):
+            valori = blocco[nome]
+            estremi[g] = min(estremi[g, 0], valori.min()), max(estremi[g, 1], valori.max())
+            classi = np.clip(((valori - limiti[g, 0]) * scale[g]).astype(np.int64), 0, CLASSI_FINI - 1)
+            conteggi[g] += np.bincount(classi, minlength=CLASSI_FINI)
+        if al_blocco is not None:
+            al_blocco()
+    return {'statistiche': statistiche, 'conteggi': conteggi, 'estremi': estremi}
+
+
+def distribuzione_monte_carlo(fattori: dict, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha,
+                              n_campioni: int = 100_000, seed=None, n_processi: int = 1, al_progresso=None,
+                              campionatore: str = 'casuale', classi: int = CLASSI_ISTOGRAMMA) -> dict:
+    """
+    Variante di simula_monte_carlo a memoria costante, per milioni di campioni: gli stessi blocchi (stesso
+    seed, stessi campioni) sono ridotti man mano a statistiche e a un istogramma fine con classi fisse
+    sull'intervallo teorico di ogni grandezza (intervalli_grandezze), senza conservare i campioni.
+    Media e deviazione standard sono esatte; i percentili sono interpolati nell'istogramma fine, con
+    un errore inferiore a 1/CLASSI_FINI dell'intervallo teorico.
+
+    Args:
+        Come simula_monte_carlo; classi è il numero indicativo di classi dell'istogramma restituito.
+
+    Returns:
+        dict: 'statistiche' come in simula_monte_carlo e 'istogrammi' con, per ogni grandezza, 'conteggi'
+              e 'bordi' dell'istogramma tra il minimo e il massimo osservati.
+    """
+    if campionatore not in CAMPIONATORI:
+        raise ValueError(f"Campionatore '{campionatore}' non valido: scegliere tra {', '.join(CAMPIONATORI)}")
+    n_campioni = verifica_n_campioni(n_campioni)
+    parametri_economici = (prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+    basso, alto = intervalli_configurazione(fattori)
+    limiti = np.array([intervalli_grandezze(basso, alto, *parametri_economici)[nome] for nome in GRANDEZZE_SIMULATE])
+    # Intervallo non degenere anche per grandezze costanti (es. ricavi a prezzo nullo)
+    limiti[:, 1] = np.maximum(limiti[:, 1], limiti[:, 0] + 1e-9)
+
+    n_blocchi = -(-n_campioni // DIMENSIONE_BLOCCO)
+    semi = semi_blocchi(seed, n_blocchi)
+    dimensioni = [min(DIMENSIONE_BLOCCO, n_campioni - i * DIMENSIONE_BLOCCO) for i in range(n_blocchi)]
+    n_processi = min(n_processi or os.cpu_count() or 1, max(n_blocchi, 1))
+    completati = 0
+
+    def avanza(n_completati=1):
+        nonlocal completati
+        completati += n_completati
+        if al_progresso is not None:
+            al_progresso(completati, n_blocchi)
+
+    if n_processi == 1:
+        parti = [_riassumi_blocchi(basso, alto, semi, dimensioni, parametri_economici, limiti, al_blocco=avanza,
+                                   campionatore=campionatore)]
+    else:
+        gruppi = np.array_split(np.arange(n_blocchi), n_processi)
+        parti = []
+        with ProcessPoolExecutor(max_workers=n_processi) as pool:
+            futuri = [pool.submit(_riassumi_blocchi, basso, alto, [semi[i] for i in gruppo],
+                                  [dimensioni[i] for i in gruppo], parametri_economici, limiti,
+                                  campionatore=campionatore)
+                      for gruppo in gruppi]
+            for gruppo, futuro in zip(gruppi, futuri):
+                parti.append(futuro.result())
+                avanza(len(gruppo))
+
+    statistiche = parti[0]['statistiche']
+    for parte in parti[1:]:
+        statistiche.unisci(parte['statistiche'])
+    conteggi = sum(parte['conteggi'] for parte in parti)
+    estremi = np.column_stack([np.min([parte['estremi'][:, 0] for parte in parti], axis=0),
+                               np.max([parte['estremi'][:, 1] for parte in parti], axis=0)])
+
+    larghezze = (limiti[:, 1] - limiti[:, 0]) / CLASSI_FINI
+    deviazioni = np.sqrt(statistiche.varianza_popolazione)
+    riassunto, istogrammi = {}, {}
+    for g, nome in enumerate(GRANDEZZE_SIMULATE):
+        # Percentili: classe in cui la frequenza cumulata supera il quantile, con interpolazione lineare
+        cumulati = np.cumsum(conteggi[g])
+        obiettivi = np.array([0.05, 0.50, 0.95]) * n_campioni
+        indici = np.searchsorted(cumulati, obiettivi)
+        precedenti = cumulati[indici] - conteggi[g][indici]
+        percentili = limiti[g, 0] + (indici + (obiettivi - precedenti) / conteggi[g][indici]) * larghezze[g]
+        p5, p50, p95 = np.clip(percentili, *estremi[g])
+        riassunto[nome] = {'media': float(statistiche.media[g]), 'std': float(deviazioni[g]),
+                           'p5': float(p5), 'p50': float(p50), 'p95': float(p95)}
+
+        # Istogramma per il grafico: classi fini tra gli estremi osservati, accorpate in gruppi uguali
+        prima, ultima = np.clip(((estremi[g] - limiti[g, 0]) / larghezze[g]).astype(np.int64), 0, CLASSI_FINI - 1)
+        per_classe = -(-(ultima - prima + 1) // classi)
+        n_classi = -(-(ultima - prima + 1) // per_classe)
+        fini = np.zeros(n_classi * per_classe, dtype=np.int64)
+        fini[:ultima - prima + 1] = conteggi[g][prima:ultima + 1]
+        istogrammi[nome] = {'conteggi': fini.reshape(n_classi, per_classe).sum(axis=1),
+                            'bordi': limiti[g, 0] + (prima + per_classe * np.arange(n_classi + 1)) * larghezze[g]}
+    return {'statistiche': riassunto, 'istogrammi': istogrammi}
+
+
+def stima_con_intervallo(fattori: dict, n_campioni: int, seed=None, confidenza: float = 0.95,
+                         campionatore: str = 'casuale') -> dict:
+    """
+    Stima Monte Carlo dei valori attesi di produzione e consumi con il relativo intervallo di confidenza.
+    Con 'ipercubo_latino' e 'sobol' l'intervallo calcolato dalla varianza campionaria è conservativo:
+    l'errore effettivo è in genere molto minore (vedi il benchmark in campionamento.py).
+
+    Returns:
+        dict: Per 'produzione', 'acqua' e 'fertilizzanti' la 'media' campionaria, la 'semiampiezza'
+              dell'intervallo di confidenza (approssimazione normale) e 'n_campioni'.
+    """
+    campioni = simula_campioni_agronomici(fattori, n_campioni, seed, campionatore=campionatore)
+    quantile = NormalDist().inv_cdf((1 + confidenza) / 2)
+    return {nome: {'media': float(valori.mean()),
+                   'semiampiezza': float(quantile * valori.std(ddof=1) / np.sqrt(n_campioni)),
+                   'n_campioni': n_campioni}
+            for nome, valori in campioni.items()}
+
+
+# --- Campionamento adattivo con criteri di arresto ---
+CAMPIONI_LOTTO_INIZIALE = 1_024  # primo lotto, usato anche per stimare il tempo per campione
+
+
+class StatisticheIncrementali:
+    """
+    Media e varianza aggiornate online, lotto per lotto (algoritmo di Welford nella forma
+    di Chan et al. per l'unione di due insiemi), senza conservare i campioni.
+    """
+
+    def __init__(self, nomi):
+        self.nomi = tuple(nomi)
+        self.n = 0
+        self.media = np.zeros(len(self.nomi))
+        self._m2 = np.zeros(len(self.nomi))
+
+    def aggiorna(self, valori: dict) -> None:
+        lotto = np.column_stack([valori[nome] for nome in self.nomi])
+        n_lotto = len(lotto)
+        if n_lotto == 0:
+            return
+        media_lotto = lotto.mean(axis=0)
+        m2_lotto = ((lotto - media_lotto) ** 2).sum(axis=0)
+        delta = media_lotto - self.media
+        totale = self.n + n_lotto
+        self.media = self.media + delta * (n_lotto / totale)
+        self._m2 = self._m2 + m2_lotto + delta ** 2 * (self.n * n_lotto / totale)
+        self.n = totale
+
+    def unisci(self, altre: 'StatisticheIncrementali') -> None:
+        """
+        Unisce le statistiche di un altro insieme di campioni delle stesse grandezze.
+        """
+        if altre.n == 0:
+            return
+        delta = altre.media - self.media
+        totale = self.n + altre.n
+        self.media = self.media + delta * (altre.n / totale)
+        self._m2 = self._m2 + altre._m2 + delta ** 2 * (self.n * altre.n / totale)
+        self.n = totale
+
+    @property
+    def varianza(self) -> np.ndarray:
+        return self._m2 / (self.n - 1) if self.n > 1 else np.full(len(self.nomi), np.inf)
+
+    @property
+    def varianza_popolazione(self) -> np.ndarray:
+        """
+        Varianza dei campioni osservati (divisore n, come np.std con ddof=0).
+        """
+        return self._m2 / self.n if self.n > 0 else np.full(len(self.nomi), np.nan)
+
+    def semiampiezza(self, confidenza: float = 0.95) -> np.ndarray:
+        """
+        Semiampiezza dell'intervallo di confidenza della media (approssimazione normale).
+        """
+        return NormalDist().inv_cdf((1 + confidenza) / 2) * np.sqrt(self.varianza / max(self.n, 1))
+
+
+def campiona_adattivo(fattori: dict, semiampiezza_obiettivo: dict = None, precisione_relativa: float = None,
+                      max_campioni: int = 10_000_000, budget_secondi: float = None, parametri_economici=None,
+                      confidenza: float = 0.95, seed=None, orologio=time.perf_counter) -> dict:
+    """
+    Estrae campioni a lotti finché non si verifica il primo dei criteri di arresto:
+    precisione obiettivo raggiunta, max_campioni estratti o budget di tempo esaurito.
+    La dimensione di ogni lotto è scelta in base ai campioni ancora necessari per la precisione
+    e al tempo residuo, stimato dalla velocità dei lotti precedenti.
+
+    Args:
+        fattori (dict): Il dizionario con i valori selezionati dai dropdown.
+        semiampiezza_obiettivo (dict): Semiampiezza massima dell'intervallo di confidenza per
+            grandezza, es. {'profitto': 0.05} per ±0.05 €/m².
+        precisione_relativa (float): In alternativa, semiampiezza massima in rapporto alla media
+            per tutte le grandezze campionate.
+        max_campioni (int): Numero massimo di campioni.
+        budget_secondi (float): Tempo massimo di calcolo, es. 0.05 per un percorso interattivo.
+        parametri_economici: Tupla (prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+            per campionare anche ricavi, costi e profitto.
+        confidenza (float): Livello dell'intervallo di confidenza.
+        seed: Seme radice; ogni lotto usa un flusso figlio indipendente.
+
+    Returns:
+        dict: 'statistiche' per grandezza ('media', 'std', 'semiampiezza'), 'n_campioni',
+              'tempo_secondi', 'motivo_arresto' ('precisione', 'max_campioni' o 'budget')
+              e 'precisione_raggiunta'.
+    """
+    inizio = orologio()
+    max_campioni = verifica_n_campioni(max_campioni)
+    basso, alto = intervalli_configurazione(fattori)
+    nomi = GRANDEZZE_SIMULATE if parametri_economici is not None else ('produzione', 'acqua', 'fertilizzanti')
+    if semiampiezza_obiettivo and set(semiampiezza_obiettivo) - set(nomi):
+        raise ValueError(f"Grandezze non campionate: {sorted(set(semiampiezza_obiettivo) - set(nomi))}")
+    if semiampiezza_obiettivo and not all(valore > 0 for valore in semiampiezza_obiettivo.values()):
+        raise ValueError("Le semiampiezze obiettivo devono essere positive")
+    if precisione_relativa is not None and not precisione_relativa > 0:
+        raise ValueError("La precisione relativa deve essere positiva")
+    radice = semi_blocchi(seed, 1)[0]
+    statistiche = StatisticheIncrementali(nomi)
+
+    def obiettivi() -> np.ndarray:
+        limiti = np.full(len(nomi), np.inf)
+        for i, nome in enumerate(nomi):
+            if semiampiezza_obiettivo and nome in semiampiezza_obiettivo:
+                limiti[i] = semiampiezza_obiettivo[nome]
+            elif precisione_relativa is not None and not semiampiezza_obiettivo:
+                limiti[i] = precisione_relativa * abs(statistiche.media[i])
+        return limiti
+
+    motivo = 'max_campioni'
+    lotto = min(CAMPIONI_LOTTO_INIZIALE, max_campioni)
+    while lotto > 0:
+        rng = np.random.default_rng(radice.spawn(1)[0])
+        valori = trasforma_uniformi(rng.random((lotto, N_DIMENSIONI)), basso, alto)
+        if parametri_economici is not None:
+            valori = aggiungi_finanza(valori, *parametri_economici)
+        statistiche.aggiorna(valori)
+
+        trascorso = orologio() - inizio
+        limiti = obiettivi()
+        semiampiezze = statistiche.semiampiezza(confidenza)
+        if np.isfinite(limiti).any() and np.all(semiampiezze <= limiti):
+            motivo = 'precisione'
+            break
+        if budget_secondi is not None and trascorso >= budget_secondi:
+            motivo = 'budget'
+            break
+
+        # Campioni ancora necessari per la precisione: n · (semiampiezza / obiettivo)², limitati a max_campioni
+        # (un obiettivo relativo su una media quasi nulla porterebbe il rapporto a infinito)
+        with np.errstate(over='ignore'):
+            rapporti = np.where(np.isfinite(limiti), (semiampiezze / np.maximum(limiti, 1e-300)) ** 2, 0.0)
+        richiesti = min(statistiche.n * float(rapporti.max()), max_campioni)
+        necessari = int(np.ceil(richiesti)) - statistiche.n if np.isfinite(limiti).any() else max_campioni
+        lotto = min(max(necessari, CAMPIONI_LOTTO_INIZIALE), DIMENSIONE_BLOCCO, max_campioni - statistiche.n)
+        if budget_secondi is not None:
+            # Il lotto successivo deve stare nel tempo residuo, con un margine del 20%
+            secondi_per_campione = trascorso / statistiche.n
+            lotto = min(lotto, int(0.8 * (budget_secondi - trascorso) / secondi_per_campione))
+            if lotto <= 0:
+                motivo = 'budget'
+                break
+
+    semiampiezze = statistiche.semiampiezza(confidenza)
+    return {
+        'statistiche': {nome: {'media': float(statistiche.media[i]), 'std': float(np.sqrt(statistiche.varianza[i])),
+                               'semiampiezza': float(semiampiezze[i])} for i, nome in enumerate(nomi)},
+        'n_campioni': statistiche.n,
+        'tempo_secondi': orologio() - inizio,
+        'motivo_arresto': motivo,
+        'precisione_raggiunta': bool(np.all(semiampiezze <= obiettivi())) if np.isfinite(obiettivi()).any() else None,
+    }
+
+
+# --- Confronto tra configurazioni con numeri casuali comuni ---
+def confronta_configurazioni(configurazioni: dict, parametri_economici=None, n_campioni: int = 200_000,
+                             seed=None, riferimento: str = None, confidenza: float = 0.95,
+                             campionatore: str = 'casuale') -> dict:
+    """
+    Confronta più configurazioni valutandole sulle stesse estrazioni uniformi (numeri casuali comuni):
+    ogni scenario simulato applica a tutte le configurazioni gli stessi quantili di ciascun moltiplicatore
+    e consumo, così le differenze appaiate eliminano il rumore comune e si stimano con pochi campioni.
+
+    Args:
+        configurazioni (dict): Nome -> dizionario dei fattori (come i valori di PRESETS).
+        parametri_economici: Tupla (prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+            per confrontare anche ricavi, costi e profitto.
+        n_campioni (int): Numero di scenari comuni.
+        seed: Seme radice, come in simula_campioni_agronomici.
+        riferimento (str): Configurazione rispetto a cui calcolare le differenze (predefinita la prima).
+        confidenza (float): Livello degli intervalli di confidenza.
+        campionatore (str): Uno di CAMPIONATORI.
+
+    Returns:
+        dict: 'riferimento', 'n_campioni', 'configurazioni' con 'media', 'std' e 'semiampiezza' per nome
+              e grandezza, e 'differenze' (nome - riferimento) con 'media', 'semiampiezza' appaiata,
+              'semiampiezza_indipendente' (a parità di campioni con estrazioni indipendenti),
+              'riduzione_varianza' e 'probabilita_superiore' (quota di scenari in cui nome > riferimento).
+    """
+    if not configurazioni:
+        raise ValueError("Nessuna configurazione da confrontare")
+    nomi_configurazioni = list(configurazioni)
+    riferimento = nomi_configurazioni[0] if riferimento is None else riferimento
+    if riferimento not in configurazioni:
+        raise ValueError(f"Configurazione di riferimento '{riferimento}' non presente")
+    n_campioni = verifica_n_campioni(n_campioni)
+    grandezze = GRANDEZZE_SIMULATE if parametri_economici is not None else ('produzione', 'acqua', 'fertilizzanti')
+    intervalli = {nome: intervalli_configurazione(fattori) for nome, fattori in configurazioni.items()}
+    statistiche = {nome: StatisticheIncrementali(grandezze) for nome in nomi_configurazioni}
+    differenze = {nome: StatisticheIncrementali(grandezze) for nome in nomi_configurazioni if nome != riferimento}
+    superiori = {nome: np.zeros(len(grandezze)) for nome in differenze}
+
+    n_blocchi = -(-n_campioni // DIMENSIONE_BLOCCO)
+    for indice, seme in enumerate(semi_blocchi(seed, n_blocchi)):
+        dimensione = min(DIMENSIONE_BLOCCO, n_campioni - indice * DIMENSIONE_BLOCCO)
+        uniformi = genera_uniformi(campionatore, dimensione, N_DIMENSIONI, seme)
+        valori = {}
+        for nome, (basso, alto) in intervalli.items():
+            valori[nome] = trasforma_uniformi(uniformi, basso, alto)
+            if parametri_economici is not None:
+                valori[nome] = aggiungi_finanza(valori[nome], *parametri_economici)
+            statistiche[nome].aggiorna(valori[nome])
+        for nome in differenze:
+            delta = {g: valori[nome][g] - valori[riferimento][g] for g in grandezze}
+            differenze[nome].aggiorna(delta)
+            superiori[nome] += [np.count_nonzero(delta[g] > 0) for g in grandezze]
+
+    quantile = NormalDist().inv_cdf((1 + confidenza) / 2)
+    risultato = {'riferimento': riferimento, 'n_campioni': n_campioni, 'configurazioni': {}, 'differenze': {}}
+    for nome, stat in statistiche.items():
+        semiampiezze = stat.semiampiezza(confidenza)
+        risultato['configurazioni'][nome] = {
+            g: {'media': float(stat.media[i]), 'std': float(np.sqrt(stat.varianza[i])),
+                'semiampiezza': float(semiampiezze[i])} for i, g in enumerate(grandezze)}
+    base = statistiche[riferimento]
+    for nome, stat in differenze.items():
+        semiampiezze = stat.semiampiezza(confidenza)
+        # Varianza della differenza se le due configurazioni fossero simulate indipendentemente
+        varianza_indipendente = statistiche[nome].varianza + base.varianza
+        risultato['differenze'][nome] = {
+            g: {'media': float(stat.media[i]), 'semiampiezza': float(semiampiezze[i]),
+                'semiampiezza_indipendente': float(quantile * np.sqrt(varianza_indipendente[i] / stat.n)),
+                'riduzione_varianza': float(varianza_indipendente[i] / stat.varianza[i]) if stat.varianza[i] > 0
+                else float('inf'),
+                'probabilita_superiore': float(superiori[nome][i] / stat.n)}
+            for i, g in enumerate(grandezze)}
+    return risultato
+
+
+# --- Modalità analitica: momenti esatti senza campionamento ---
+MODALITA_DISPONIBILI = ('casuale', 'analitica')
+
+
+def _momenti_parte_positiva(costante: np.ndarray, larghezze: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calcola E[(c + T)+] ed E[(c + T)+²] con T = Σ w_j·V_j e V_j ~ U(0, 1) indipendenti.
+    Se c + T non può diventare negativo si usano i momenti polinomiali; altrimenti
+    si applica la formula di inclusione-esclusione sulle sole larghezze non nulle:
+    E[f(T)] = Σ_A (-1)^(m-|A|) F_m(Σ_A w) / Π w, con F_m primitiva m-esima di f.
+
+    Args:
+        costante (np.ndarray): Valori c con forma (...).
+        larghezze (np.ndarray): Larghezze w >= 0 con forma (..., m).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Primo e secondo momento della parte positiva, forma (...).
+    """
+    costante, larghezze = np.broadcast_arrays(np.asarray(costante, dtype=float)[..., None],
+                                              np.asarray(larghezze, dtype=float))
+    costante = costante[..., 0]
+    media_t = larghezze.sum(axis=-1) / 2
+    varianza_t = (larghezze ** 2).sum(axis=-1) / 12
+    primo = costante + media_t
+    secondo = primo ** 2 + varianza_t
+
+    # Casi interamente negativi: la parte positiva è sempre nulla
+    negativi = costante + 2 * media_t <= 0
+    primo = np.where(negativi, 0.0, primo)
+    secondo = np.where(negativi, 0.0, secondo)
+
+    # Casi a cavallo dello zero: inclusione-esclusione, raggruppati per numero di larghezze non nulle
+    a_cavallo = (costante < 0) & ~negativi
+    if np.any(a_cavallo):
+        c = costante[a_cavallo]
+        w = larghezze[a_cavallo]
+        attive = w > 0
+        # Porta le larghezze non nulle in testa a ogni riga
+        w = np.take_along_axis(w, np.argsort(~attive, axis=-1, kind='stable'), axis=-1)
+        n_attive = attive.sum(axis=-1)
+        m1 = np.empty(len(c))
+        m2 = np.empty(len(c))
+        for m in np.unique(n_attive):
+            righe = n_attive == m
+            w_m = w[righe, :m]
+            sottoinsiemi = ((np.arange(2 ** m)[:, None] >> np.arange(m)) & 1).astype(float)  # (2^m, m)
+            segni = (-1.0) ** (m - sottoinsiemi.sum(axis=1))
+            punti = np.maximum(c[righe, None] + w_m @ sottoinsiemi.T, 0.0)  # (righe, 2^m)
+            prodotto_w = w_m.prod(axis=-1)
+            fattoriale = np.prod(np.arange(1, m + 1, dtype=float))
+            m1[righe] = (punti ** (m + 1) @ segni) / (fattoriale * (m + 1) * prodotto_w)
+            m2[righe] = 2 * (punti ** (m + 2) @ segni) / (fattoriale * (m + 1) * (m + 2) * prodotto_w)
+        primo[a_cavallo] = m1
+        secondo[a_cavallo] = m2
+    return primo, secondo
+
+
+def momenti_analitici(basso: np.ndarray, alto: np.ndarray) -> dict:
+    """
+    Calcola media, varianza e limiti esatti di produzione, acqua e fertilizzanti
+    a partire dai limiti delle uniformi (vedi intervalli_configurazione).
+    Lavora su qualsiasi numero di dimensioni iniziali, quindi su una o molte configurazioni.
+
+    Args:
+        basso (np.ndarray): Limiti inferiori con forma (..., N_DIMENSIONI).
+        alto (np.ndarray): Limiti superiori con forma (..., N_DIMENSIONI).
+
+    Returns:
+        dict: Per 'produzione', 'acqua' e 'fertilizzanti' un dict con
+              'media', 'varianza', 'min' e 'max' (array con forma (...)).
+    """
+    basso = np.asarray(basso, dtype=float)
+    alto = np.asarray(alto, dtype=float)
+    media_u = (basso + alto) / 2
+    quadrato_u = (basso ** 2 + basso * alto + alto ** 2) / 3
+
+    # Produzione: prodotto di uniformi indipendenti e positive
+    media_prod = PRODUZIONE_BASE_OTTIMALE * media_u[..., :N_FATTORI].prod(axis=-1)
+    quadrato_prod = PRODUZIONE_BASE_OTTIMALE ** 2 * quadrato_u[..., :N_FATTORI].prod(axis=-1)
+    risultati = {'produzione': {
+        'media': media_prod,
+        'varianza': np.maximum(quadrato_prod - media_prod ** 2, 0.0),
+        'min': PRODUZIONE_BASE_OTTIMALE * basso[..., :N_FATTORI].prod(axis=-1),
+        'max': PRODUZIONE_BASE_OTTIMALE * alto[..., :N_FATTORI].prod(axis=-1),
+    }}
+
+    # Risorse: base uniforme per la parte positiva di (1 + somma di uniformi), fattori indipendenti
+    for nome, col_base, colonne in (('acqua', N_FATTORI, slice(N_FATTORI + 2, 2 * N_FATTORI + 2)),
+                                    ('fertilizzanti', N_FATTORI + 1, slice(2 * N_FATTORI + 2, None))):
+        costante = 1 + basso[..., colonne].sum(axis=-1)
+        primo, secondo = _momenti_parte_positiva(costante, alto[..., colonne] - basso[..., colonne])
+        media = media_u[..., col_base] * primo
+        risultati[nome] = {
+            'media': media,
+            'varianza': np.maximum(quadrato_u[..., col_base] * secondo - media ** 2, 0.0),
+            'min': basso[..., col_base] * np.maximum(costante, 0.0),
+            'max': alto[..., col_base] * np.maximum(1 + alto[..., colonne].sum(axis=-1), 0.0),
+        }
+    return risultati
+
+
+def calcola_valori_attesi(fattori: dict, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg,
+                          costi_extra_ha) -> dict:
+    """
+    Versione analitica di simula_monte_carlo: restituisce valori attesi, varianze
+    e limiti esatti per una configurazione, senza alcun campionamento.
+
+    Args:
+        fattori (dict): Il dizionario con i valori selezionati dai dropdown.
+        prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha: Parametri economici
+            con le stesse unità di simula_performance_finanziaria.
+
+    Returns:
+        dict: Per ogni grandezza di GRANDEZZE_SIMULATE un dict con
+              'media', 'varianza', 'std', 'min' e 'max'.
+    """
+    momenti = momenti_analitici(*intervalli_configurazione(fattori))
+    risultati = {nome: {chiave: float(valore) for chiave, valore in statistiche.items()}
+                 for nome, statistiche in momenti.items()}
+
+    # Le grandezze finanziarie sono combinazioni lineari di variabili indipendenti
+    coefficienti = {'produzione': prezzo_vendita_kg, 'acqua': costo_acqua_m3 / 1000,
+                    'fertilizzanti': costo_fert_kg}
+    altri_costi_mq = costi_extra_ha / 10000
+
+    def combinazione(termini, costante):
+        media = costante + sum(k * risultati[n]['media'] for n, k in termini)
+        varianza = sum(k ** 2 * risultati[n]['varianza'] for n, k in termini)
+        estremi = [(k * risultati[n]['min'], k * risultati[n]['max']) for n, k in termini]
+        return {'media': media, 'varianza': varianza,
+                'min': costante + sum(min(e) for e in estremi),
+                'max': costante + sum(max(e) for e in estremi)}
+
+    risultati['ricavi'] = combinazione([('produzione', coefficienti['produzione'])], 0.0)
+    risultati['costi'] = combinazione([('acqua', coefficienti['acqua']),
+                                       ('fertilizzanti', coefficienti['fertilizzanti'])], altri_costi_mq)
+    risultati['profitto'] = combinazione([('produzione', coefficienti['produzione']),
+                                          ('acqua', -coefficienti['acqua']),
+                                          ('fertilizzanti', -coefficienti['fertilizzanti'])], -altri_costi_mq)
+    for statistiche in risultati.values():
+        statistiche['std'] = statistiche['varianza'] ** 0.5
+    return risultati
+
+
+def produzione_attesa(fattori_selezionati: dict) -> float:
+    """
+    Controparte analitica di simula_produzione_annua: la produzione attesa in kg/m².
+    """
+    basso, alto = intervalli_configurazione(fattori_selezionati)
+    return float(PRODUZIONE_BASE_OTTIMALE * ((basso[:N_FATTORI] + alto[:N_FATTORI]) / 2).prod())
+
+
+def consumo_risorse_atteso(fattori: dict) -> dict:
+    """
+    Controparte analitica di simula_consumo_risorse: i consumi attesi per m².
+
+    Returns:
+        dict: Un dizionario con 'acqua' (l/mq) e 'fertilizzanti' (kg/mq).
+    """
+    momenti = momenti_analitici(*intervalli_configurazione(fattori))
+    return {'acqua': float(momenti['acqua']['media']),
+            'fertilizzanti': float(momenti['fertilizzanti']['media'])}
+
+
+def prepare_benchmark_dataframe(fattori: dict, modalita: str = 'casuale', rng=None) -> tuple[pd.DataFrame, float]:
     """
     Calcola la produzione simulata e la confronta con i benchmark,
     restituendo un DataFrame pronto per il plotting e il valore simulato.
 
     Args:
         fattori (dict): Il dizionario con i valori selezionati dai dropdown.
+        modalita (str): 'casuale' per un'estrazione, 'analitica' per il valore atteso esatto.
+        rng (np.random.Generator, opzionale): Generatore per estrazioni riproducibili.
 
     Returns:
         tuple[pd.DataFrame, float]: Un DataFrame per il grafico a barre e
                                       il valore numerico della produzione simulata.
     """
+    if modalita not in MODALITA_DISPONIBILI:
+        raise ValueError(f"Modalità di simulazione non valida: {modalita!r}")
+
     # Calcolo del valore della produzione simulata
-    produzione_simulata = simula_produzione_annua(fattori)
+    if modalita == 'analitica':
+        produzione_simulata = produzione_attesa(fattori)
+    else:
+        produzione_simulata = simula_produzione_annua(fattori, rng=rng)
+
+    return crea_dataframe_benchmark(produzione_simulata), produzione_simulata
 
+
+def crea_dataframe_benchmark(produzione_simulata: float) -> pd.DataFrame:
+    """
+    Costruisce il DataFrame di confronto tra una produzione già calcolata e i benchmark.
+    """
     # 2. Benchmark di confronto
     benchmark = {'Sfavorevole': 3.0, 'Media': 5.5, 'Ottimale': 8.5}
 
@@ -196,49 +1161,54 @@ def prepare_benchmark_dataframe(fattori: dict) -> tuple[pd.DataFrame, float]:
     }
 
     # 4. Creazione del DataFrame
-    df_plot = pd.DataFrame(data_to_plot)
+    return pd.DataFrame(data_to_plot)
 
-    # Return del DataFrame e del valore numerico
-    return df_plot, produzione_simulata
+
+# --- Calendario colturale ---
+
+class MeseCalendario(NamedTuple):
+    """
+    Un mese del calendario colturale: peso è la quota (0-1) della produzione annua raccolta nel mese.
+    """
+    mese: str
+    peso: float
+    descrizione: str
+
+
+# Calendario colturale della fragola nel Metapontino, basato su dati reali e articoli di settore.
+# Costruito una sola volta all'import e immutabile (tupla di NamedTuple)
+CALENDARIO_COLTURALE = (
+    MeseCalendario("Gennaio", 0.05, "Ripresa vegetativa e avvio raccolte delle varietà più precoci"),
+    MeseCalendario("Febbraio", 0.08, "Intensificazione delle prime raccolte, piena fioritura"),
+    MeseCalendario("Marzo", 0.18, "Inizio del picco produttivo per le principali cultivar come la Candonga"),
+    MeseCalendario("Aprile", 0.28, "Picco massimo della campagna di raccolta, massima richiesta di mercato"),
+    MeseCalendario("Maggio", 0.23, "Piena produzione, inizio della fase calante verso la fine del mese"),
+    MeseCalendario("Giugno", 0.08, "Raccolte tardive e conclusione della campagna di produzione"),
+    MeseCalendario("Luglio", 0.02, "Fine completa delle raccolte, estirpo delle piante e preparazione terreni"),
+    MeseCalendario("Agosto", 0.02, "Pratiche agronomiche: solarizzazione del terreno per la disinfezione"),
+    MeseCalendario("Settembre", 0.02, "Preparazione del suolo e inizio trapianti per il nuovo ciclo produttivo"),
+    MeseCalendario("Ottobre", 0.02, "Fase principale dei trapianti delle nuove piantine radicate"),
+    MeseCalendario("Novembre", 0.01, "Sviluppo vegetativo iniziale delle nuove piante"),
+    MeseCalendario("Dicembre", 0.01, "Fase di riposo vegetativo o crescita minima in attesa della ripresa"),
+)
+
+# Pesi mensili come array numerico in sola lettura, nell'ordine dei mesi
+PESI_MENSILI = np.array([mese.peso for mese in CALENDARIO_COLTURALE])
+PESI_MENSILI.setflags(write=False)
+if len(CALENDARIO_COLTURALE) != 12 or not np.isclose(PESI_MENSILI.sum(), 1.0):
+    raise ErroreModello("Il calendario colturale deve avere 12 mesi con pesi a somma 1")
 
 
 def get_calendario_colturale_fragola():
     """
-    Restituisce un DataFrame statico con il calendario colturale della fragola
-    nel Metapontino, basato su dati reali e articoli di settore.
-    """
-    dati_calendario = [
-        {"Mese": "Gennaio", "Peso (%)": "5%",
-         "Descrizione": "Ripresa vegetativa e avvio raccolte delle varietà più precoci"},
-        {"Mese": "Febbraio", "Peso (%)": "8%",
-         "Descrizione": "Intensificazione delle prime raccolte, piena fioritura"},
-        {"Mese": "Marzo", "Peso (%)": "18%",
-         "Descrizione": "Inizio del picco produttivo per le principali cultivar come la Candonga"},
-        {"Mese": "Aprile", "Peso (%)": "28%",
-         "Descrizione": "Picco massimo della campagna di raccolta, massima richiesta di mercato"},
-        {"Mese": "Maggio", "Peso (%)": "23%",
-         "Descrizione": "Piena produzione, inizio della fase calante verso la fine del mese"},
-        {"Mese": "Giugno", "Peso (%)": "8%",
-         "Descrizione": "Raccolte tardive e conclusione della campagna di produzione"},
-        {"Mese": "Luglio", "Peso (%)": "2%",
-         "Descrizione": "Fine completa delle raccolte, estirpo delle piante e preparazione terreni"},
-        {"Mese": "Agosto", "Peso (%)": "2%",
-         "Descrizione": "Pratiche agronomiche: solarizzazione del terreno per la disinfezione"},
-        {"Mese": "Settembre", "Peso (%)": "2%",
-         "Descrizione": "Preparazione del suolo e inizio trapianti per il nuovo ciclo produttivo"},
-        {"Mese": "Ottobre", "Peso (%)": "2%",
-         "Descrizione": "Fase principale dei trapianti delle nuove piantine radicate"},
-        {"Mese": "Novembre", "Peso (%)": "1%", "Descrizione": "Sviluppo vegetativo iniziale delle nuove piante"},
-        {"Mese": "Dicembre", "Peso (%)": "1%",
-         "Descrizione": "Fase di riposo vegetativo o crescita minima in attesa della ripresa"},
-    ]
-
-    df_calendario = pd.DataFrame(dati_calendario)
-
-    df_calendario.rename(columns={
-        'Mese': 'Mese',
-        'Peso': 'Peso (%)',
-        'Descrizione': 'Descrizione Attività'
-    }, inplace=True)
-
-    return df_calendario
+    Restituisce un DataFrame con il calendario colturale della fragola nel Metapontino.
+    La colonna 'Peso (%)' è numerica in punti percentuali (5.0 = 5%, come nell'etichetta; la quota 0-1
+    è in CALENDARIO_COLTURALE e PESI_MENSILI); ogni chiamata restituisce una copia indipendente.
+    """
+    calendario = pd.DataFrame(CALENDARIO_COLTURALE).rename(columns={
+        'mese': 'Mese',
+        'peso': 'Peso (%)',
+        'descrizione': 'Descrizione Attività'
+    })
+    calendario['Peso (%)'] = (calendario['Peso (%)'] * 100).round(6)
+    return calendario
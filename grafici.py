@@ -0,0 +1,517 @@
+from dash import Patch, html
+import dash_bootstrap_components as dbc
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from data import NOMI_FATTORI, crea_dataframe_benchmark
+
+# Gli scheletri delle figure vengono costruiti una sola volta e inseriti nel layout;
+# i callback inviano poi solo i valori modificati come Patch parziali.
+
+COLORI_COSTI = {'Costo Acqua': '#63cec7', 'Costo Fertilizzanti': '#7eb671', 'Altri Costi': 'gold'}
+ETICHETTE_COSTI = list(COLORI_COSTI)
+
+
+def configurazione_gauge(idroponico: bool) -> dict:
+    """
+    Range, fasce colorate e soglie dei due gauge, che dipendono dal sistema colturale.
+    """
+    # Discrimine dei range sfavorevoli/medi/ottimali per coltura di tipo idroponica
+    if idroponico:
+        return {
+            'acqua': {'steps': [{'range': [0, 100], 'color': "#7eb671"},
+                                {'range': [100, 200], 'color': "gold"},
+                                {'range': [200, 1000], 'color': "#d13045"}],
+                      'range': [0, 250], 'threshold': 50},
+            'fertilizzanti': {'steps': [{'range': [0, 0.008], 'color': "#7eb671"},
+                                        {'range': [0.008, 0.015], 'color': "gold"},
+                                        {'range': [0.015, 0.035], 'color': "#d13045"}],
+                              'range': [0, 0.02], 'threshold': 0.004},
+        }
+    # Discrimine dei range sfavorevoli/medi/ottimali per coltura di altro tipo
+    return {
+        'acqua': {'steps': [{'range': [0, 300], 'color': "#d13045"},
+                            {'range': [300, 450], 'color': "#7eb671"},
+                            {'range': [450, 650], 'color': "gold"},
+                            {'range': [650, 1000], 'color': "#d13045"}],
+                  'range': [0, 1000], 'threshold': 375},
+        'fertilizzanti': {'steps': [{'range': [0, 0.010], 'color': "#d13045"},
+                                    {'range': [0.010, 0.015], 'color': "#7eb671"},
+                                    {'range': [0.015, 0.020], 'color': "gold"},
+                                    {'range': [0.020, 0.030], 'color': "#d13045"}],
+                          'range': [0, 0.030], 'threshold': 0.0125},
+    }
+
+
+def crea_figura_produttivo() -> dict:
+    """
+    Scheletro del grafico a barre di confronto con i benchmark (la barra stimata è la traccia 0).
+    """
+    fig_produttivo = px.bar(
+        crea_dataframe_benchmark(0.0), x='Produzione (kg/m²)', y='Scenario', orientation='h',
+        title='Confronto Produzione Annua Stimata (kg/m²)', text_auto='.2f', color='Scenario',
+        color_discrete_map={'Produzione Stimata': '#495b52', 'Produzione Sfavorevole': '#d13045',
+                            'Produzione Media': 'gold', 'Produzione Ottimale': '#7eb671'}
+    )
+    fig_produttivo.update_traces(uid='bar-prod-uid', textposition='outside',
+                                 hovertemplate='<b>%{y}</b><br>Produzione: %{x:.2f} kg/m²<extra></extra>')
+    fig_produttivo.update_layout(xaxis_title='Produzione (kg/m²)', yaxis_title=None, showlegend=False,
+                                 plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                 font=dict(color='#495b52'),
+                                 title_x=0.5, title_xanchor='center', transition_duration=500)
+    fig_produttivo.update_xaxes(range=[0, 8.5 * 1.1])
+    return fig_produttivo.to_dict()
+
+
+def crea_figura_risorse() -> dict:
+    """
+    Scheletro dei gauge di acqua e fertilizzanti: per ogni risorsa una traccia di sfondo
+    con le fasce (indici 0 e 2) e una con barra e soglia (indici 1 e 3).
+    """
+    gauge = configurazione_gauge(idroponico=False)
+    fig_risorse = make_subplots(rows=1, cols=2, specs=[[{'type': 'indicator'}, {'type': 'indicator'}]],
+                                subplot_titles=('Acqua (l/m²)', 'Fertilizzanti (kg/m²)'))
+    fig_risorse.add_trace(go.Indicator(mode="gauge+number", value=0, uid='gauge-acqua-background-uid',
+                                       gauge={'shape': "angular",
+                                              'axis': {'range': gauge['acqua']['range']},
+                                              'steps': gauge['acqua']['steps'],
+                                              }), row=1, col=1)
+    fig_risorse.add_trace(go.Indicator(mode="gauge", value=0, uid='gauge-acqua-bar-uid',
+                                       gauge={'shape': "angular",
+                                              'axis': {'range': gauge['acqua']['range']}, 'bar': {'color': "#495b52"},
+                                              'threshold': {'value': gauge['acqua']['threshold']}
+                                              }), row=1, col=1)
+    fig_risorse.add_trace(
+        go.Indicator(mode="gauge+number", value=0, uid='gauge-fert-background-uid',
+                     number={'valueformat': '.3f'},
+                     gauge={'shape': "angular",
+                            'axis': {'range': gauge['fertilizzanti']['range']},
+                            'steps': gauge['fertilizzanti']['steps'],
+                            }), row=1, col=2)
+    fig_risorse.add_trace(
+        go.Indicator(mode="gauge", value=0, uid='gauge-fert-bar-uid',
+                     gauge={'shape': "angular",
+                            'axis': {'range': gauge['fertilizzanti']['range']}, 'bar': {'color': "#495b52"},
+                            'threshold': {'value': gauge['fertilizzanti']['threshold']}
+                            }), row=1, col=2)
+
+    fig_risorse.update_layout(title_text="Stima del Consumo di Risorse", plot_bgcolor='rgba(0,0,0,0)',
+                              paper_bgcolor='rgba(0,0,0,0)', font=dict(color='#495b52'), title_x=0.5,
+                              title_xanchor='center', transition_duration=500)
+    return fig_risorse.to_dict()
+
+
+def crea_figura_sankey() -> dict:
+    """
+    Scheletro del diagramma di flusso Ricavi -> Costi Totali / Profitto Lordo.
+    """
+    fig_sankey = go.Figure(data=[go.Sankey(node=dict(pad=15, thickness=20, line=dict(color="black", width=0.5),
+                                                     label=["Ricavi", "Costi Totali", "Profitto Lordo"],
+                                                     color=["#495b52", "#d13045", "#7eb671"]),
+                                           uid='sankey-flow-uid',
+                                           link=dict(source=[0, 0], target=[1, 2], value=[0, 0]),
+                                           node_hovertemplate='<b>%{label}</b><br>Valore: €%{value:.2f}<extra></extra>')])
+    fig_sankey.update_layout(title_text="Flusso Finanziario (€/m²)", font=dict(size=12, color='#495b52'),
+                             transition_duration=500,
+                             plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                             margin=dict(t=40, b=20, l=10, r=10))
+    return fig_sankey.to_dict()
+
+
+def crea_figura_costi() -> dict:
+    """
+    Scheletro del grafico a ciambella della composizione dei costi variabili.
+    """
+    fig_ciambella = go.Figure(data=[
+        go.Pie(labels=ETICHETTE_COSTI, values=[0, 0, 0], hole=0.4,
+               marker=dict(colors=[COLORI_COSTI[etichetta] for etichetta in ETICHETTE_COSTI]),
+               textposition='inside', textinfo='percent+label',
+               hovertemplate='Costo: € %{value:.2f}<extra></extra>')])
+    fig_ciambella.update_layout(title="Composizione dei Costi Variabili", showlegend=False,
+                                plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                font=dict(color='#495b52'),
+                                title_x=0.5, title_xanchor='center', margin=dict(t=40, b=20, l=10, r=10))
+    return fig_ciambella.to_dict()
+
+
+def crea_figura_distribuzione(bordi=None, conteggi=None, statistiche: dict = None) -> dict:
+    """
+    Istogramma della distribuzione simulata del profitto lordo (€/m²), già aggregato in classi,
+    con le linee del 5°, 50° e 95° percentile. Senza argomenti restituisce la figura vuota.
+    """
+    fig_distribuzione = go.Figure()
+    if bordi is not None:
+        fig_distribuzione.add_trace(go.Bar(x=(bordi[:-1] + bordi[1:]) / 2, y=conteggi / conteggi.sum(),
+                                           width=np.diff(bordi), marker_color='#7eb671',
+                                           hovertemplate='Profitto: € %{x:.2f}<br>Frequenza: %{y:.2%}<extra></extra>'))
+        for percentile, colore in (('p5', '#d13045'), ('p50', '#495b52'), ('p95', '#d13045')):
+            fig_distribuzione.add_vline(x=statistiche[percentile], line_dash='dash', line_color=colore,
+                                        annotation_text=f"{percentile.upper()}: € {statistiche[percentile]:.2f}")
+    fig_distribuzione.update_layout(title="Distribuzione del Profitto Lordo Simulato (€/m²)",
+                                    xaxis_title='Profitto Lordo (€/m²)', yaxis_title='Frequenza relativa',
+                                    yaxis_tickformat='.0%', bargap=0, showlegend=False,
+                                    plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                    font=dict(color='#495b52'), title_x=0.5, title_xanchor='center')
+    return fig_distribuzione.to_dict()
+
+
+def crea_tabella_statistiche(statistiche: dict) -> dbc.Table:
+    """
+    Tabella riassuntiva (media, deviazione standard e percentili) delle grandezze simulate.
+    """
+    righe = (('Produzione (kg/m²)', 'produzione', '.2f'), ('Acqua (l/m²)', 'acqua', '.0f'),
+             ('Fertilizzanti (kg/m²)', 'fertilizzanti', '.4f'), ('Ricavi (€/m²)', 'ricavi', '.2f'),
+             ('Costi (€/m²)', 'costi', '.2f'), ('Profitto Lordo (€/m²)', 'profitto', '.2f'))
+    colonne = (('Media', 'media'), ('Dev. Std', 'std'), ('P5', 'p5'), ('Mediana', 'p50'), ('P95', 'p95'))
+    table_header = html.Thead(html.Tr([html.Th("Grandezza")] + [html.Th(titolo) for titolo, _ in colonne]))
+    table_body = html.Tbody([html.Tr([html.Td(etichetta)] + [html.Td(format(statistiche[grandezza][campo], formato))
+                                                             for _, campo in colonne])
+                             for etichetta, grandezza, formato in righe])
+    return dbc.Table([table_header, table_body], striped=True, bordered=True, hover=True, responsive=True,
+                     className="text-center")
+
+
+def crea_figura_confronto(risultato: dict = None, grandezza: str = 'profitto') -> dict:
+    """
+    Confronto tra configurazioni (risultato di confronta_configurazioni): a sinistra il valore atteso
+    di ciascuna, a destra la differenza rispetto al riferimento con l'intervallo appaiato e,
+    più chiaro, quello che si avrebbe con estrazioni indipendenti. Senza argomenti restituisce la figura vuota.
+    """
+    fig_confronto = make_subplots(rows=1, cols=2, horizontal_spacing=0.25,
+                                  subplot_titles=('Profitto Lordo Atteso (€/m²)', 'Differenza dal Riferimento (€/m²)'))
+    if risultato is not None:
+        nomi = list(risultato['configurazioni'])
+        valori = [risultato['configurazioni'][nome][grandezza] for nome in nomi]
+        fig_confronto.add_trace(go.Bar(x=[v['media'] for v in valori], y=nomi, orientation='h', marker_color='#7eb671',
+                                       error_x={'type': 'data', 'array': [v['semiampiezza'] for v in valori],
+                                                'color': '#495b52'},
+                                       hovertemplate='<b>%{y}</b><br>€ %{x:.2f}<extra></extra>'), row=1, col=1)
+        altre = list(risultato['differenze'])
+        differenze = [risultato['differenze'][nome][grandezza] for nome in altre]
+        for chiave, colore, spessore in (('semiampiezza_indipendente', 'rgba(73, 91, 82, 0.3)', 12),
+                                         ('semiampiezza', '#495b52', 4)):
+            fig_confronto.add_trace(go.Scatter(x=[d['media'] for d in differenze], y=altre, mode='markers',
+                                               marker={'color': colore, 'size': 10},
+                                               error_x={'type': 'data', 'array': [d[chiave] for d in differenze],
+                                                        'color': colore, 'thickness': spessore, 'width': 0},
+                                               hovertemplate='<b>%{y}</b><br>Differenza: € %{x:.3f}<extra></extra>'),
+                                    row=1, col=2)
+        fig_confronto.add_vline(x=0, line_dash='dash', line_color='#d13045', row=1, col=2,
+                                annotation_text=risultato['riferimento'])
+    fig_confronto.update_layout(showlegend=False, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                font=dict(color='#495b52'))
+    return fig_confronto.to_dict()
+
+
+def crea_tabella_confronto(risultato: dict) -> dbc.Table:
+    """
+    Tabella delle differenze appaiate rispetto alla configurazione di riferimento.
+    """
+    colonne = ("Configurazione", "Δ Profitto (€/m²)", "Δ Produzione (kg/m²)", "Δ Acqua (l/m²)",
+               "P(profitto > riferimento)", "Riduzione varianza")
+    righe = []
+    for nome, differenze in risultato['differenze'].items():
+        profitto = differenze['profitto']
+        righe.append(html.Tr([
+            html.Td(nome),
+            html.Td(f"{profitto['media']:+.3f} ± {profitto['semiampiezza']:.3f}"),
+            html.Td(f"{differenze['produzione']['media']:+.3f} ± {differenze['produzione']['semiampiezza']:.3f}"),
+            html.Td(f"{differenze['acqua']['media']:+.1f} ± {differenze['acqua']['semiampiezza']:.1f}"),
+            html.Td(f"{profitto['probabilita_superiore']:.1%}"),
+            html.Td(f"{profitto['riduzione_varianza']:.1f}×"),
+        ]))
+    table_header = html.Thead(html.Tr([html.Th(colonna) for colonna in colonne]))
+    return dbc.Table([table_header, html.Tbody(righe)], striped=True, bordered=True, hover=True, responsive=True,
+                     className="text-center")
+
+
+def crea_figura_tornado(tornado: dict = None) -> dict:
+    """
+    Grafico a tornado (risultato di oscillazioni_tornado): per ogni input la barra va dal profitto
+    con l'opzione peggiore a quello con la migliore, attorno al profitto della configurazione corrente.
+    Senza argomenti restituisce la figura vuota.
+    """
+    fig_tornado = go.Figure()
+    if tornado is not None:
+        base = tornado['base']
+        voci = tornado['voci'][::-1]  # la voce più influente in alto
+        nomi = [voce['nome'] for voce in voci]
+        for estremo, colore in (('minimo', '#d13045'), ('massimo', '#7eb671')):
+            fig_tornado.add_trace(go.Bar(y=nomi, x=[voce[estremo] - base for voce in voci], base=base,
+                                         orientation='h', marker_color=colore,
+                                         text=[voce[f'etichetta_{estremo}'] for voce in voci], textposition='auto',
+                                         customdata=[voce[estremo] for voce in voci],
+                                         hovertemplate='<b>%{y}</b>: %{text}<br>Profitto: € %{customdata:.2f}<extra></extra>'))
+        fig_tornado.add_vline(x=base, line_color='#495b52', annotation_text=f"Attuale: € {base:.2f}")
+    fig_tornado.update_layout(title="Oscillazione del Profitto Lordo Atteso (€/m²)", barmode='overlay',
+                              xaxis_title='Profitto Lordo (€/m²)', showlegend=False,
+                              plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                              font=dict(color='#495b52'), title_x=0.5, title_xanchor='center')
+    return fig_tornado.to_dict()
+
+
+def crea_figura_sobol(sobol: dict = None) -> dict:
+    """
+    Indici di Sobol del primo ordine e totali (risultato di indici_sobol) come barre orizzontali affiancate.
+    Senza argomenti restituisce la figura vuota.
+    """
+    fig_sobol = go.Figure()
+    if sobol is not None:
+        nomi = list(sobol['indici'])[::-1]
+        for campo, etichetta, colore in (('primo_ordine', 'Primo ordine', '#7eb671'), ('totale', 'Totale', '#495b52')):
+            fig_sobol.add_trace(go.Bar(y=nomi, x=[max(sobol['indici'][nome][campo], 0.0) for nome in nomi],
+                                       name=etichetta, orientation='h', marker_color=colore,
+                                       hovertemplate='<b>%{y}</b><br>' + etichetta + ': %{x:.1%}<extra></extra>'))
+    fig_sobol.update_layout(title="Quota della Varianza del Profitto (Indici di Sobol)", barmode='group',
+                            xaxis_tickformat='.0%', legend=dict(orientation='h', y=-0.15),
+                            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                            font=dict(color='#495b52'), title_x=0.5, title_xanchor='center')
+    return fig_sobol.to_dict()
+
+
+def crea_tabella_suggerimenti(configurazioni: list) -> dbc.Table:
+    """
+    Tabella delle configurazioni proposte dall'ottimizzatore, con i fattori che differiscono dalla
+    configurazione corrente e un pulsante per applicarle (id {'type': 'btn-applica-suggerimento', 'index': i}).
+    """
+    table_header = html.Thead(html.Tr([html.Th(colonna) for colonna in
+                                       ("#", "Profitto (€/m²)", "Produzione (kg/m²)", "Acqua (l/m²)",
+                                        "Fertilizzanti (kg/m²)", "Modifiche", "")]))
+    righe = []
+    for i, configurazione in enumerate(configurazioni):
+        modifiche = configurazione['modifiche']
+        righe.append(html.Tr([
+            html.Td(i + 1),
+            html.Td(f"{configurazione['profitto']:.2f}"),
+            html.Td(f"{configurazione['produzione']:.2f}"),
+            html.Td(f"{configurazione['acqua']:.0f}"),
+            html.Td(f"{configurazione['fertilizzanti']:.4f}"),
+            html.Td(", ".join(f"{nome}: {opzione}" for nome, opzione in modifiche.items()) or "Nessuna"),
+            html.Td(dbc.Button("Applica", id={'type': 'btn-applica-suggerimento', 'index': i}, n_clicks=0,
+                               size="sm", className="custom-button-green")),
+        ]))
+    return dbc.Table([table_header, html.Tbody(righe)], striped=True, bordered=True, hover=True, responsive=True,
+                     className="text-center")
+
+
+def crea_figura_frontiera(frontiera=None, corrente: dict = None) -> dict:
+    """
+    Frontiera di Pareto (DataFrame di frontiera_pareto): acqua attesa in ascissa, profitto atteso in
+    ordinata e fertilizzanti attesi come colore; la chiave di ogni configurazione è in customdata, così
+    un clic la può caricare nei dropdown. 'corrente' (profitto, acqua, fertilizzanti) aggiunge il
+    punto della configurazione selezionata. Senza argomenti restituisce la figura vuota.
+    """
+    fig_frontiera = go.Figure()
+    if frontiera is not None:
+        descrizioni = ["<br>".join(f"{NOMI_FATTORI[id_fattore]}: {riga[id_fattore]}" for id_fattore in NOMI_FATTORI)
+                       for _, riga in frontiera.iterrows()]
+        fig_frontiera.add_trace(go.Scatter(
+            x=frontiera['acqua_media'], y=frontiera['profitto'], mode='markers', name='Frontiera',
+            customdata=frontiera.index, text=descrizioni,
+            marker=dict(size=14, color=frontiera['fertilizzanti_media'], colorscale=[[0, '#7eb671'], [1, '#d13045']],
+                        colorbar=dict(title='Fert. (kg/m²)', tickformat='.3f'), line=dict(width=1, color='#495b52')),
+            hovertemplate='Profitto: € %{y:.2f}<br>Acqua: %{x:.0f} l/m²<br>Fertilizzanti: %{marker.color:.4f} kg/m²'
+                          '<br><br>%{text}<extra></extra>'))
+    if corrente is not None:
+        fig_frontiera.add_trace(go.Scatter(
+            x=[corrente['acqua']], y=[corrente['profitto']], mode='markers', name='Configurazione corrente',
+            marker=dict(symbol='star', size=18, color='gold', line=dict(width=1, color='#495b52')),
+            hovertemplate='Configurazione corrente<br>Profitto: € %{y:.2f}<br>Acqua: %{x:.0f} l/m²<extra></extra>'))
+    fig_frontiera.update_layout(title="Frontiera Profitto - Acqua - Fertilizzanti", xaxis_title='Acqua attesa (l/m²)',
+                                yaxis_title='Profitto Lordo atteso (€/m²)', legend=dict(orientation='h', y=-0.2),
+                                clickmode='event', plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                                font=dict(color='#495b52'), title_x=0.5, title_xanchor='center')
+    return fig_frontiera.to_dict()
+
+
+def crea_figura_whatif(superficie: dict = None, titolo_x: str = None, titolo_y: str = None,
+                       corrente: tuple = None) -> dict:
+    """
+    Mappa di calore del profitto lordo (risultato di superficie_profitto) con la curva di pareggio
+    (profitto nullo) e il punto corrente (x, y). Senza argomenti restituisce la figura vuota.
+    """
+    fig_whatif = go.Figure()
+    if superficie is not None:
+        profitto = superficie['profitto'].astype(np.float32)  # dimezza il payload della griglia
+        limite = float(np.abs(profitto).max()) or 1.0
+        fig_whatif.add_trace(go.Heatmap(x=superficie['x'], y=superficie['y'], z=profitto, zmid=0, zmin=-limite,
+                                        zmax=limite, colorscale=[[0, '#d13045'], [0.5, '#f7f3e3'], [1, '#7eb671']],
+                                        colorbar=dict(title='€/m²'),
+                                        hovertemplate=f'{titolo_x}: %{{x:.2f}}<br>{titolo_y}: %{{y:.2f}}'
+                                                      '<br>Profitto: € %{z:.2f}<extra></extra>'))
+        fig_whatif.add_trace(go.Scatter(x=superficie['x'], y=superficie['pareggio'], mode='lines', name='Pareggio',
+                                        line=dict(color='#495b52', width=3, dash='dash'),
+                                        hovertemplate='Pareggio<br>%{x:.2f} / %{y:.2f}<extra></extra>'))
+        if corrente is not None:
+            fig_whatif.add_trace(go.Scatter(x=[corrente[0]], y=[corrente[1]], mode='markers', name='Valori correnti',
+                                            marker=dict(symbol='x', size=14, color='#495b52'), hoverinfo='skip'))
+    fig_whatif.update_layout(title="Profitto Lordo al Variare dei Parametri Economici (€/m²)",
+                             xaxis_title=titolo_x, yaxis_title=titolo_y, showlegend=False,
+                             plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                             font=dict(color='#495b52'), title_x=0.5, title_xanchor='center')
+    return fig_whatif.to_dict()
+
+
+def crea_figura_flusso_cassa(serie: dict = None) -> dict:
+    """
+    Flusso di cassa mensile (risultato di simula_serie_mensili): barre del flusso medio di ogni mese,
+    verdi se positivo e rosse se negativo, e sull'asse destro il flusso cumulato medio con la fascia
+    tra 5° e 95° percentile. Senza argomenti restituisce la figura vuota.
+    """
+    fig_flusso = make_subplots(specs=[[{'secondary_y': True}]])
+    if serie is not None:
+        etichette = [f"{mese[:3]} S{stagione}" if serie['n_stagioni'] > 1 else mese
+                     for stagione in range(1, serie['n_stagioni'] + 1) for mese in serie['mesi']]
+        flusso, cumulato = serie['serie']['flusso'], serie['serie']['cumulato']
+        medie = flusso['media'].ravel()
+        fig_flusso.add_trace(go.Bar(x=etichette, y=medie, name='Flusso mensile',
+                                    marker_color=np.where(medie >= 0, '#7eb671', '#d13045'),
+                                    error_y=dict(type='data', symmetric=False, color='#495b52', thickness=1,
+                                                 array=flusso['p95'].ravel() - medie,
+                                                 arrayminus=medie - flusso['p5'].ravel()),
+                                    hovertemplate='%{x}<br>Flusso: € %{y:.2f}<extra></extra>'), secondary_y=False)
+        fig_flusso.add_trace(go.Scatter(x=etichette + etichette[::-1],
+                                        y=np.concatenate([cumulato['p95'].ravel(), cumulato['p5'].ravel()[::-1]]),
+                                        fill='toself', fillcolor='rgba(99, 206, 199, 0.25)', line=dict(width=0),
+                                        name='Cumulato (P5-P95)', hoverinfo='skip'), secondary_y=True)
+        fig_flusso.add_trace(go.Scatter(x=etichette, y=cumulato['media'].ravel(), mode='lines', name='Cumulato medio',
+                                        line=dict(color='#63cec7', width=3),
+                                        hovertemplate='%{x}<br>Cumulato: € %{y:.2f}<extra></extra>'), secondary_y=True)
+    fig_flusso.update_yaxes(title_text='Flusso mensile (€/m²)', secondary_y=False)
+    fig_flusso.update_yaxes(title_text='Flusso cumulato (€/m²)', secondary_y=True, showgrid=False)
+    fig_flusso.update_layout(title="Flusso di Cassa Mensile", legend=dict(orientation='h', y=-0.2),
+                             plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                             font=dict(color='#495b52'), title_x=0.5, title_xanchor='center')
+    return fig_flusso.to_dict()
+
+
+def crea_riepilogo_pareggio(riga, posizione: int, totale: int) -> dbc.Table:
+    """
+    Indicatori di pareggio della configurazione corrente (riga di analisi_pareggio) e la sua
+    posizione nella classifica di robustezza.
+    """
+    voci = (("Prezzo di pareggio", f"{riga['prezzo_pareggio']:.2f} €/kg"),
+            ("Resa di pareggio", f"{riga['resa_pareggio']:.2f} kg/m²"),
+            ("Margine di sicurezza", f"{riga['margine_sicurezza']:.1%}"),
+            ("Probabilità di perdita", f"{riga['probabilita_perdita']:.1%}"),
+            ("Posizione in classifica", f"{posizione} di {totale}"))
+    table_header = html.Thead(html.Tr([html.Th(titolo) for titolo, _ in voci]))
+    table_body = html.Tbody(html.Tr([html.Td(valore) for _, valore in voci]))
+    return dbc.Table([table_header, table_body], bordered=True, responsive=True, className="text-center")
+
+
+def crea_tabella_pareggio(classifica, corrente: dict) -> dbc.Table:
+    """
+    Tabella delle prime configurazioni della classifica di robustezza (DataFrame ordinato di
+    analisi_pareggio), con i fattori che differiscono dalla configurazione corrente.
+    """
+    table_header = html.Thead(html.Tr([html.Th(colonna) for colonna in
+                                       ("#", "Profitto (€/m²)", "Prezzo Pareggio (€/kg)", "Resa Pareggio (kg/m²)",
+                                        "Margine", "Prob. Perdita", "Modifiche")]))
+    righe = []
+    for posizione, (_, riga) in enumerate(classifica.iterrows(), start=1):
+        modifiche = [f"{NOMI_FATTORI[id_fattore]}: {riga[id_fattore]}" for id_fattore in NOMI_FATTORI
+                     if riga[id_fattore] != corrente[id_fattore]]
+        righe.append(html.Tr([
+            html.Td(posizione),
+            html.Td(f"{riga['profitto']:.2f}"),
+            html.Td(f"{riga['prezzo_pareggio']:.2f}"),
+            html.Td(f"{riga['resa_pareggio']:.2f}"),
+            html.Td(f"{riga['margine_sicurezza']:.1%}"),
+            html.Td(f"{riga['probabilita_perdita']:.1%}"),
+            html.Td(", ".join(modifiche) or "Configurazione corrente"),
+        ]))
+    return dbc.Table([table_header, html.Tbody(righe)], striped=True, bordered=True, hover=True, responsive=True,
+                     className="text-center")
+
+
+# Grandezze del portafoglio aziendale: titolo del grafico e intestazione della tabella
+TITOLI_PORTAFOGLIO = {'produzione': 'Produzione (kg)', 'acqua': 'Acqua (m³)',
+                      'fertilizzanti': 'Fertilizzanti (kg)', 'profitto': 'Profitto Lordo (€)'}
+
+
+def crea_figura_portafoglio(aziende=None) -> dict:
+    """
+    Risultati per azienda del portafoglio (DataFrame 'aziende' di simula_portafoglio): un pannello per
+    grandezza con la media di ogni azienda e l'intervallo tra 5° e 95° percentile.
+    Senza argomenti restituisce la figura vuota.
+    """
+    fig_portafoglio = make_subplots(rows=2, cols=2, subplot_titles=list(TITOLI_PORTAFOGLIO.values()),
+                                    vertical_spacing=0.18)
+    if aziende is not None:
+        for i, (grandezza, titolo) in enumerate(TITOLI_PORTAFOGLIO.items()):
+            medie = aziende[f"{grandezza}_media"]
+            fig_portafoglio.add_trace(go.Bar(x=aziende.index, y=medie, name=titolo, showlegend=False,
+                                             marker_color=np.where(medie >= 0, '#7eb671', '#d13045'),
+                                             error_y=dict(type='data', symmetric=False, color='#495b52', thickness=1,
+                                                          array=aziende[f"{grandezza}_p95"] - medie,
+                                                          arrayminus=medie - aziende[f"{grandezza}_p5"]),
+                                             hovertemplate=f'%{{x}}<br>{titolo}: %{{y:,.0f}}<extra></extra>'),
+                                      row=i // 2 + 1, col=i % 2 + 1)
+    fig_portafoglio.update_layout(title="Risultati per Azienda", plot_bgcolor='rgba(0,0,0,0)',
+                                  paper_bgcolor='rgba(0,0,0,0)', font=dict(color='#495b52'),
+                                  title_x=0.5, title_xanchor='center')
+    return fig_portafoglio.to_dict()
+
+
+def crea_tabella_portafoglio(aziende, totale) -> dbc.Table:
+    """
+    Tabella dei risultati di simula_portafoglio: una riga per azienda e il totale del portafoglio,
+    con la media di ogni grandezza e tra parentesi l'intervallo tra 5° e 95° percentile.
+    """
+    def celle(riga):
+        return [html.Td(f"{riga['appezzamenti']:,.0f}"), html.Td(f"{riga['superficie'] / 10000:,.1f}")] + [
+            html.Td([f"{riga[f'{grandezza}_media']:,.0f}",
+                     html.Br(), html.Small(f"({riga[f'{grandezza}_p5']:,.0f} – {riga[f'{grandezza}_p95']:,.0f})")])
+            for grandezza in TITOLI_PORTAFOGLIO]
+
+    table_header = html.Thead(html.Tr([html.Th(colonna) for colonna in
+                                       ("Azienda", "Appezzamenti", "Superficie (Ha)", *TITOLI_PORTAFOGLIO.values())]))
+    righe = [html.Tr([html.Td(azienda), *celle(riga)]) for azienda, riga in aziende.iterrows()]
+    righe.append(html.Tr([html.Th("Totale"), *celle(totale)], className="fw-bold"))
+    return dbc.Table([table_header, html.Tbody(righe)], striped=True, bordered=True, hover=True, responsive=True,
+                     className="text-center")
+
+
+FIGURA_PRODUTTIVO = crea_figura_produttivo()
+FIGURA_RISORSE = crea_figura_risorse()
+FIGURA_SANKEY = crea_figura_sankey()
+FIGURA_COSTI = crea_figura_costi()
+FIGURA_DISTRIBUZIONE = crea_figura_distribuzione()
+FIGURA_CONFRONTO = crea_figura_confronto()
+FIGURA_TORNADO = crea_figura_tornado()
+FIGURA_SOBOL = crea_figura_sobol()
+FIGURA_FRONTIERA = crea_figura_frontiera()
+FIGURA_WHATIF = crea_figura_whatif()
+FIGURA_FLUSSO_CASSA = crea_figura_flusso_cassa()
+FIGURA_PORTAFOGLIO = crea_figura_portafoglio()
+
+
+def patch_produttivo(produzione_simulata: float, semiampiezza: float = None) -> Patch:
+    """
+    Aggiorna solo la barra stimata e l'estensione dell'asse x; con una stima Monte Carlo
+    mostra anche l'intervallo di confidenza come barra d'errore.
+    """
+    patch = Patch()
+    patch['data'][0]['x'] = [produzione_simulata]
+    if semiampiezza is not None:
+        patch['data'][0]['error_x'] = {'type': 'data', 'array': [semiampiezza], 'visible': True, 'color': '#495b52'}
+    patch['layout']['xaxis']['range'] = [0, max(produzione_simulata, 8.5) * 1.1]
+    return patch
+
+
+def patch_risorse(consumi: dict, idroponico: bool) -> Patch:
+    """
+    Aggiorna i valori dei gauge e, poiché dipendono dal sistema colturale, range, fasce e soglie.
+    """
+    gauge = configurazione_gauge(idroponico)
+    patch = Patch()
+    for indice, risorsa in ((0, 'acqua'), (2, 'fertilizzanti')):
+        sfondo, barra = patch['data'][indice], patch['data'][indice + 1]
+        sfondo['value'] = barra['value'] = consumi[risorsa]
+        sfondo['gauge']['axis']['range'] = barra['gauge']['axis']['range'] = gauge[risorsa]['range']
+        sfondo['gauge']['steps'] = gauge[risorsa]['steps']
+        barra['gauge']['threshold']['value'] = gauge[risorsa]['threshold']
+    return patch
@@ -1,6 +1,44 @@
+import functools
+
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 from app import app
+from grafici import (
+    FIGURA_CONFRONTO,
+    FIGURA_COSTI,
+    FIGURA_DISTRIBUZIONE,
+    FIGURA_FLUSSO_CASSA,
+    FIGURA_FRONTIERA,
+    FIGURA_PORTAFOGLIO,
+    FIGURA_PRODUTTIVO,
+    FIGURA_RISORSE,
+    FIGURA_SANKEY,
+    FIGURA_SOBOL,
+    FIGURA_TORNADO,
+    FIGURA_WHATIF
+)
+from data import CALENDARIO_COLTURALE, NOMI_FATTORI, PRESETS
+from pareggio import CRITERI_ROBUSTEZZA
+from serie_mensili import PROFILI_PREZZI
+from testi import COMMENTO_FINANZIARIO, INFO_COLTURA, INFO_IMPOLLINAZIONE, INFO_PATOGENI, INFO_SUGGERIMENTO
+
+
+# Secondi di pausa nella digitazione prima di inviare un parametro economico: i callback che ne dipendono
+# partono una volta per valore inserito invece che a ogni tasto
+DEBOUNCE_ECONOMICI = 0.5
+
+
+# --- Funzione Helper per la tabella del calendario colturale ---
+@functools.lru_cache(maxsize=None)
+def create_tabella_calendario():
+    """
+    Crea (una sola volta, poi riusata) la tabella del calendario colturale mostrata nel modale Distribuzione Mensile.
+    """
+    table_header = html.Thead(html.Tr([html.Th(col) for col in ("Mese", "Peso (%)", "Descrizione Attività")]))
+    table_body = html.Tbody([html.Tr([html.Td(mese.mese), html.Td(f"{mese.peso:.0%}"), html.Td(mese.descrizione)])
+                             for mese in CALENDARIO_COLTURALE])
+    return dbc.Table([table_header, table_body], striped=True, bordered=True, hover=True, responsive=True,
+                     className="text-center")
 
 
 # --- Funzione Helper per creare i dropdown ---
@@ -85,6 +123,17 @@ OPTIONS_SISTEMA = [
     {'label': 'Idroponico (Ricircolo)', 'value': 'idroponico_ricircolo'},
 ]
 
+# Configurazioni confrontabili nel tab Confronto Scenari: quella corrente e i preset (per id del pulsante)
+OPTIONS_CONFRONTO = [
+    {'label': 'Configurazione corrente', 'value': 'corrente'},
+    {'label': 'Tradizionale', 'value': 'btn-preset-tradizionale'},
+    {'label': 'Soilless', 'value': 'btn-preset-soilless'},
+    {'label': 'Idroponica', 'value': 'btn-preset-idroponica'},
+    {'label': 'Condizioni sfavorevoli', 'value': 'btn-preset-sfavorevoli'},
+    {'label': 'Condizioni medie', 'value': 'btn-preset-medie'},
+    {'label': 'Condizioni ottimali', 'value': 'btn-preset-ottimali'},
+]
+
 # --- Layout Principale ---
 layout = dbc.Container([
     dbc.Row([
@@ -142,22 +191,42 @@ layout = dbc.Container([
             ])
         ], lg=5, md=12, className="mb-3 mb-lg-0"),
 
-        # Pulsante Distribuzione Mensile
+        # Pulsanti Suggerisci Configurazione e Distribuzione Mensile
         dbc.Col([
-            html.Div(
+            html.Div([
+                dbc.Button("Suggerisci Configurazione", id="btn-suggerisci-configurazione", n_clicks=0,
+                           className="custom-button-green w-100"),
                 dbc.Button("Distribuzione Mensile", id="btn-distribuzione-mensile", n_clicks=0,
                            className="custom-button-green w-100"),
-                className="d-grid"
-            )
+            ], className="d-grid gap-2")
         ], lg=2, md=12)
     ], align="end", className="mb-4"),
 
     html.Hr(),
 
+    # Ultimi valori di produzione e consumo calcolati dal server, usati dal modello finanziario clientside
+    dcc.Store(id='store-simulazione'),
+    dcc.Store(id='store-commento-finanziario', data=COMMENTO_FINANZIARIO),
+    # Livello di raffinamento progressivo raggiunto per la configurazione e il tab correnti
+    dcc.Store(id='store-raffinamento'),
+    # Valori dei preset, applicati ai dropdown direttamente nel browser
+    dcc.Store(id='store-presets', data=PRESETS),
+    # Configurazioni proposte dall'ottimizzatore, applicabili ai dropdown come i preset
+    dcc.Store(id='store-suggerimenti'),
+    # Origine del portafoglio aziendale: file CSV caricato o portafoglio di esempio
+    dcc.Store(id='store-sorgente-portafoglio'),
+
     dcc.Tabs(id="tabs-viste-grafici", value='tab-produttivo', children=[
         dcc.Tab(label='Andamento Produttivo', value='tab-produttivo'),
         dcc.Tab(label='Uso delle Risorse', value='tab-risorse'),
         dcc.Tab(label='Performance Finanziaria', value='tab-finanziaria'),
+        dcc.Tab(label='Analisi Monte Carlo', value='tab-montecarlo'),
+        dcc.Tab(label='Confronto Scenari', value='tab-confronto'),
+        dcc.Tab(label='Analisi di Sensibilità', value='tab-sensibilita'),
+        dcc.Tab(label='Frontiera di Sostenibilità', value='tab-frontiera'),
+        dcc.Tab(label='Analisi di Pareggio', value='tab-pareggio'),
+        dcc.Tab(label='Flusso di Cassa Mensile', value='tab-flusso'),
+        dcc.Tab(label='Portafoglio Aziendale', value='tab-portafoglio'),
     ]),
     dbc.Card(
         dbc.CardBody([
@@ -177,7 +246,7 @@ layout = dbc.Container([
                         id='container-produttivo',
                         style={'display': 'block', 'width': '100%'},
                         children=[
-                            dcc.Graph(id='grafico-produttivo', style={'height': '50vh'}, animate=True,
+                            dcc.Graph(id='grafico-produttivo', figure=FIGURA_PRODUTTIVO, style={'height': '50vh'}, animate=True,
                                       config={'displayModeBar': False})
                         ],
                         role="figure",
@@ -190,7 +259,7 @@ layout = dbc.Container([
                         id='container-risorse',
                         style={'display': 'none', 'width': '100%'},
                         children=[
-                            dcc.Graph(id='grafico-risorse', style={'height': '50vh'}, animate=True,
+                            dcc.Graph(id='grafico-risorse', figure=FIGURA_RISORSE, style={'height': '50vh'}, animate=True,
                                       config={'displayModeBar': False})
                         ],
                         role="figure",
@@ -210,22 +279,22 @@ layout = dbc.Container([
                                         dbc.Col([
                                             html.Label("Costo Acqua (€/m³)", className="form-label"),
                                             dcc.Input(id='input-costo-acqua', type='number', value=1.00, step=0.01,
-                                                      className="form-control")
+                                                      debounce=DEBOUNCE_ECONOMICI, className="form-control")
                                         ], lg=3, md=6, sm=12, className="mb-3"),
                                         dbc.Col([
                                             html.Label("Costo Fertilizzanti (€/kg)", className="form-label"),
                                             dcc.Input(id='input-costo-fertilizzanti', type='number', value=2.50,
-                                                      step=0.01, className="form-control")
+                                                      step=0.01, debounce=DEBOUNCE_ECONOMICI, className="form-control")
                                         ], lg=3, md=6, sm=12, className="mb-3"),
                                         dbc.Col([
                                             html.Label("Altri Costi Variabili (€/Ha)", className="form-label"),
                                             dcc.Input(id='input-costi-extra', type='number', value=5000, step=100,
-                                                      className="form-control")
+                                                      debounce=DEBOUNCE_ECONOMICI, className="form-control")
                                         ], lg=3, md=6, sm=12, className="mb-3"),
                                         dbc.Col([
                                             html.Label("Prezzo di Vendita (€/kg)", className="form-label"),
                                             dcc.Input(id='input-prezzo-vendita', type='number', value=3.50, step=0.05,
-                                                      className="form-control")
+                                                      debounce=DEBOUNCE_ECONOMICI, className="form-control")
                                         ], lg=3, md=6, sm=12, className="mb-3")
                                     ]),
                                 ]),
@@ -234,23 +303,237 @@ layout = dbc.Container([
                             dbc.Row([
                                 dbc.Col(
                                     html.Div([
-                                        dcc.Graph(id='grafico-sankey-finanziario',
+                                        dcc.Graph(id='grafico-sankey-finanziario', figure=FIGURA_SANKEY,
                                                   config={'displayModeBar': False})],
                                         role="figure",
                                         **{"aria-label": "Diagramma di Sankey che mostra i flussi di costi e ricavi."}
                                     ), lg=6, md=12, ),
                                 dbc.Col(
                                     html.Div([
-                                        dcc.Graph(id='grafico-composizione-costi',
+                                        dcc.Graph(id='grafico-composizione-costi', figure=FIGURA_COSTI,
                                                   config={'displayModeBar': False})],
                                         role="figure",
                                         **{"aria-label": "Grafico a torta che mostra la composizione dei costi."}
                                     ), lg=6, md=12,
                                 )
+                            ]),
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("Parametri a confronto", className="form-label me-3"),
+                                    dbc.RadioItems(id='radio-assi-whatif', inline=True, value='prezzo-acqua',
+                                                   options=[{'label': 'Prezzo di vendita × Costo acqua',
+                                                             'value': 'prezzo-acqua'},
+                                                            {'label': 'Costo fertilizzanti × Altri costi',
+                                                             'value': 'fertilizzanti-extra'}]),
+                                    html.Div([
+                                        dcc.Graph(id='grafico-whatif', figure=FIGURA_WHATIF, style={'height': '50vh'},
+                                                  config={'displayModeBar': False})],
+                                        role="figure",
+                                        **{"aria-label": "Mappa di calore del profitto lordo al variare di due "
+                                                         "parametri economici, con la curva di pareggio."}
+                                    ),
+                                ], width=12, className="mt-4")
                             ])
                         ],
                         **{"aria-label": "Vista della performance finanziaria"}
                     ),
+                    html.Div(
+                        id='container-montecarlo',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            dbc.Card(
+                                dbc.CardBody([
+                                    html.H5("Simulazione in Background", className="card-title text-center"),
+                                    dbc.Row([
+                                        dbc.Col([
+                                            html.Label("Numero di Scenari", className="form-label"),
+                                            dcc.Dropdown(id='dd-campioni-montecarlo', value=1_000_000, clearable=False,
+                                                         options=[{'label': f"{n:,}".replace(',', '.'), 'value': n}
+                                                                  for n in (100_000, 1_000_000, 5_000_000, 10_000_000)])
+                                        ], lg=4, md=12, className="mb-3"),
+                                        dbc.Col(
+                                            dbc.Button("Avvia Analisi", id="btn-avvia-montecarlo", n_clicks=0,
+                                                       className="custom-button-green w-100"),
+                                            lg=4, md=6, className="mb-3"),
+                                        dbc.Col(
+                                            dbc.Button("Annulla", id="btn-annulla-montecarlo", n_clicks=0,
+                                                       disabled=True, color="secondary", className="w-100"),
+                                            lg=4, md=6, className="mb-3"),
+                                    ], align="end"),
+                                    dbc.Progress(id='progresso-montecarlo', value=0, striped=True, animated=True,
+                                                 style={'visibility': 'hidden'}),
+                                ]),
+                                className="mb-4",
+                            ),
+                            html.Div([
+                                dcc.Graph(id='grafico-montecarlo', figure=FIGURA_DISTRIBUZIONE,
+                                          config={'displayModeBar': False})],
+                                role="figure",
+                                **{"aria-label": "Istogramma della distribuzione simulata del profitto lordo.",
+                                   "aria-describedby": "testo-commentary"}
+                            ),
+                            html.Div(id='riepilogo-montecarlo')
+                        ],
+                        **{"aria-label": "Vista dell'analisi Monte Carlo"}
+                    ),
+                    html.Div(
+                        id='container-confronto',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            dbc.Card(
+                                dbc.CardBody([
+                                    html.H5("Configurazioni a Confronto", className="card-title text-center"),
+                                    dbc.Row([
+                                        dbc.Col([
+                                            html.Label("Configurazioni (la prima è il riferimento)", className="form-label"),
+                                            dcc.Dropdown(id='dd-configurazioni-confronto', options=OPTIONS_CONFRONTO,
+                                                         value=['btn-preset-soilless', 'btn-preset-idroponica'],
+                                                         multi=True, clearable=False)
+                                        ], lg=8, md=12, className="mb-3"),
+                                        dbc.Col(
+                                            dbc.Button("Confronta", id="btn-avvia-confronto", n_clicks=0,
+                                                       className="custom-button-green w-100"),
+                                            lg=4, md=12, className="mb-3"),
+                                    ], align="end"),
+                                ]),
+                                className="mb-4",
+                            ),
+                            dcc.Loading(
+                                html.Div([
+                                    dcc.Graph(id='grafico-confronto', figure=FIGURA_CONFRONTO,
+                                              config={'displayModeBar': False})],
+                                    role="figure",
+                                    **{"aria-label": "Profitto atteso delle configurazioni e differenze appaiate "
+                                                     "rispetto al riferimento, con intervalli di confidenza.",
+                                       "aria-describedby": "testo-commentary"}
+                                ),
+                                color="#7eb671"
+                            ),
+                            html.Div(id='riepilogo-confronto')
+                        ],
+                        **{"aria-label": "Vista del confronto tra configurazioni"}
+                    ),
+                    html.Div(
+                        id='container-sensibilita',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            html.Div([
+                                dcc.Graph(id='grafico-tornado', figure=FIGURA_TORNADO,
+                                          config={'displayModeBar': False})],
+                                role="figure",
+                                **{"aria-label": "Grafico a tornado dell'oscillazione del profitto al variare "
+                                                 "di ciascun fattore e parametro economico.",
+                                   "aria-describedby": "testo-commentary"}
+                            ),
+                            html.Div([
+                                dcc.Graph(id='grafico-sobol', figure=FIGURA_SOBOL,
+                                          config={'displayModeBar': False})],
+                                role="figure",
+                                **{"aria-label": "Indici di Sobol: quota della varianza del profitto "
+                                                 "attribuibile a ciascun input.",
+                                   "aria-describedby": "testo-commentary"}
+                            ),
+                        ],
+                        **{"aria-label": "Vista dell'analisi di sensibilità"}
+                    ),
+                    html.Div(
+                        id='container-frontiera',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            html.Div([
+                                dcc.Graph(id='grafico-frontiera', figure=FIGURA_FRONTIERA, style={'height': '60vh'},
+                                          config={'displayModeBar': False})],
+                                role="figure",
+                                **{"aria-label": "Frontiera di Pareto tra profitto atteso, consumo di acqua e di "
+                                                 "fertilizzanti; un clic su un punto ne carica la configurazione.",
+                                   "aria-describedby": "testo-commentary"}
+                            ),
+                        ],
+                        **{"aria-label": "Vista della frontiera di sostenibilità"}
+                    ),
+                    html.Div(
+                        id='container-pareggio',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            html.H5("Configurazione Corrente", className="text-center"),
+                            dcc.Loading(html.Div(id='riepilogo-pareggio'), color="#7eb671"),
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("Ordina per", className="form-label"),
+                                    dcc.Dropdown(id='dd-ordinamento-pareggio', value='margine_sicurezza',
+                                                 clearable=False,
+                                                 options=[{'label': etichetta, 'value': criterio}
+                                                          for criterio, (etichetta, _) in CRITERI_ROBUSTEZZA.items()])
+                                ], lg=8, md=12, className="mb-3"),
+                                dbc.Col([
+                                    dbc.Button("Scarica CSV", id="btn-scarica-pareggio", n_clicks=0,
+                                               className="custom-button-green w-100"),
+                                    dcc.Download(id='download-pareggio')
+                                ], lg=4, md=12, className="mb-3"),
+                            ], align="end"),
+                            html.Div(id='tabella-pareggio')
+                        ],
+                        **{"aria-label": "Vista dell'analisi di pareggio"}
+                    ),
+                    html.Div(
+                        id='container-flusso',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("Numero di Stagioni", className="form-label"),
+                                    dcc.Dropdown(id='dd-stagioni-flusso', value=3, clearable=False,
+                                                 options=[{'label': str(n), 'value': n} for n in (1, 3, 5, 10)])
+                                ], lg=6, md=12, className="mb-3"),
+                                dbc.Col([
+                                    html.Label("Curva dei Prezzi", className="form-label"),
+                                    dbc.RadioItems(id='radio-profilo-prezzi', value='stagionale', inline=True,
+                                                   options=[{'label': profilo.capitalize(), 'value': profilo}
+                                                            for profilo in PROFILI_PREZZI])
+                                ], lg=6, md=12, className="mb-3"),
+                            ], align="end"),
+                            html.Div([
+                                dcc.Graph(id='grafico-flusso', figure=FIGURA_FLUSSO_CASSA, style={'height': '60vh'},
+                                          config={'displayModeBar': False})],
+                                role="figure",
+                                **{"aria-label": "Flusso di cassa mensile medio con intervallo e flusso cumulato "
+                                                 "sulle stagioni simulate.",
+                                   "aria-describedby": "testo-commentary"}
+                            ),
+                        ],
+                        **{"aria-label": "Vista del flusso di cassa mensile"}
+                    ),
+                    html.Div(
+                        id='container-portafoglio',
+                        style={'display': 'none', 'width': '100%'},
+                        children=[
+                            dbc.Row([
+                                dbc.Col([
+                                    dcc.Upload(id='upload-portafoglio', accept='.csv',
+                                               children=html.Div(["Trascina o ", html.A("seleziona"),
+                                                                  " il CSV degli appezzamenti"]),
+                                               style={'borderWidth': '1px', 'borderStyle': 'dashed',
+                                                      'borderRadius': '5px', 'textAlign': 'center',
+                                                      'padding': '8px'})
+                                ], lg=8, md=12, className="mb-3"),
+                                dbc.Col([
+                                    dbc.Button("Portafoglio di Esempio", id="btn-portafoglio-esempio", n_clicks=0,
+                                               className="custom-button-green w-100")
+                                ], lg=4, md=12, className="mb-3"),
+                            ], align="center"),
+                            dcc.Loading(html.Div(id='riepilogo-portafoglio'), color="#7eb671"),
+                            html.Div([
+                                dcc.Graph(id='grafico-portafoglio', figure=FIGURA_PORTAFOGLIO,
+                                          style={'height': '60vh'}, config={'displayModeBar': False})],
+                                role="figure",
+                                **{"aria-label": "Produzione, acqua, fertilizzanti e profitto di ogni azienda "
+                                                 "del portafoglio, con intervallo tra 5° e 95° percentile.",
+                                   "aria-describedby": "testo-commentary"}
+                            ),
+                            html.Div(id='tabella-portafoglio')
+                        ],
+                        **{"aria-label": "Vista del portafoglio aziendale"}
+                    ),
                 ], lg=8, md=12, className="p-3")
             ])
         ]),
@@ -260,14 +543,45 @@ layout = dbc.Container([
     # Modale per la tabella mensile
     dbc.Modal([
         dbc.ModalHeader(dbc.ModalTitle("Distribuzione Mensile della Produzione")),
-        dbc.ModalBody(id="contenuto-tabella-mensile"),
+        dbc.ModalBody(create_tabella_calendario(), id="contenuto-tabella-mensile"),
         dbc.ModalFooter(dbc.Button("Chiudi", id="btn-chiudi-modale", className="ms-auto", n_clicks=0)),
     ], id="modale-tabella-mensile", size="xl", is_open=False),
 
+    # Modale per il suggerimento della configurazione ottimale sotto vincoli
+    dbc.Modal([
+        dbc.ModalHeader(dbc.ModalTitle("Suggerisci Configurazione")),
+        dbc.ModalBody([
+            dcc.Markdown(INFO_SUGGERIMENTO, style={'textAlign': 'justify'}),
+            dbc.Row([
+                dbc.Col([
+                    html.Label("Acqua massima (l/m²)", className="form-label"),
+                    dcc.Input(id='input-acqua-massima', type='number', min=0, step=10,
+                              placeholder="Nessun limite", className="form-control")
+                ], md=6, className="mb-3"),
+                dbc.Col([
+                    html.Label("Fertilizzanti massimi (kg/m²)", className="form-label"),
+                    dcc.Input(id='input-fertilizzanti-massimi', type='number', min=0, step=0.001,
+                              placeholder="Nessun limite", className="form-control")
+                ], md=6, className="mb-3"),
+            ]),
+            html.Label("Fattori da mantenere come selezionati", className="form-label"),
+            dbc.Checklist(id='checklist-fattori-fissi', inline=True, className="mb-3",
+                          options=[{'label': nome, 'value': id_fattore} for id_fattore, nome in NOMI_FATTORI.items()],
+                          value=['dd-temperatura', 'dd-luce', 'dd-umidita']),
+            dbc.Button("Calcola", id="btn-calcola-suggerimento", n_clicks=0, className="custom-button-green mb-3"),
+            html.Div(id='risultati-suggerimento'),
+        ]),
+        dbc.ModalFooter(dbc.Button("Chiudi", id="btn-chiudi-modale-suggerimento", n_clicks=0)),
+    ],
+        id="modale-suggerimento",
+        size="xl",
+        is_open=False,
+    ),
+
     # Modale per l'info impollinazione
     dbc.Modal([
         dbc.ModalHeader(dbc.ModalTitle("Impollinazione Controllata")),
-        dbc.ModalBody(id="contenuto-info-impollinazione"),
+        dbc.ModalBody(dcc.Markdown(INFO_IMPOLLINAZIONE, style={'textAlign': 'justify'}), id="contenuto-info-impollinazione"),
         dbc.ModalFooter(dbc.Button("Chiudi", id="btn-chiudi-modal-impollinazione", n_clicks=0)),
     ],
         id="modal-info-impollinazione",
@@ -278,7 +592,7 @@ layout = dbc.Container([
     # Modale per l'info patogeni
     dbc.Modal([
         dbc.ModalHeader(dbc.ModalTitle("Controllo patogeni e Lotta Integrata")),
-        dbc.ModalBody(id="contenuto-info-patogeni"),
+        dbc.ModalBody(dcc.Markdown(INFO_PATOGENI, style={'textAlign': 'justify'}), id="contenuto-info-patogeni"),
         dbc.ModalFooter(dbc.Button("Chiudi", id="btn-chiudi-modal-patogeni", n_clicks=0)),
     ],
         id="modal-info-patogeni",
@@ -289,7 +603,7 @@ layout = dbc.Container([
     # Modale per l'info tipologia coltura
     dbc.Modal([
         dbc.ModalHeader(dbc.ModalTitle("Tipologia di Coltura")),
-        dbc.ModalBody(id="contenuto-info-coltura"),
+        dbc.ModalBody(dcc.Markdown(INFO_COLTURA, style={'textAlign': 'justify'}), id="contenuto-info-coltura"),
         dbc.ModalFooter(dbc.Button("Chiudi", id="btn-chiudi-modal-coltura", n_clicks=0)),
     ],
         id="modal-info-coltura",
@@ -0,0 +1,133 @@
+import heapq
+
+import numpy as np
+
+from data import (
+    MODELLO,
+    ORDINE_FATTORI,
+    PRODUZIONE_BASE_OTTIMALE,
+    RANGE_OTTIMALE_ACQUA,
+    RANGE_OTTIMALE_FERTILIZZANTI,
+    momenti_analitici,
+    simula_performance_finanziaria
+)
+
+# Ottimizzazione vincolata della configurazione: massimizza il profitto lordo atteso (€/m²) con
+# consumi attesi di acqua e fertilizzanti entro i limiti dati e alcuni fattori eventualmente fissati.
+# La ricerca è un branch-and-bound in profondità sui fattori: a ogni nodo i limiti ottimistici
+# (miglior moltiplicatore e minor modificatore di ciascun fattore ancora libero) permettono di
+# scartare interi sottoalberi senza valutarne le configurazioni.
+
+SUGGERIMENTI_PREDEFINITI = 5
+
+# Valori medi di ciascuna opzione: moltiplicatore di produzione e modificatori di acqua e fertilizzanti,
+# forma (N_FATTORI, opzioni, 3) come MODELLO.basso/alto
+MEDIE_OPZIONI = (MODELLO.basso + MODELLO.alto) / 2
+MEDIA_BASE_ACQUA = sum(RANGE_OTTIMALE_ACQUA) / 2
+MEDIA_BASE_FERTILIZZANTI = sum(RANGE_OTTIMALE_FERTILIZZANTI) / 2
+
+
+def ottimizza_configurazione(parametri_economici, acqua_massima: float = None, fertilizzanti_massimi: float = None,
+                             fissi: dict = None, k: int = SUGGERIMENTI_PREDEFINITI) -> dict:
+    """
+    Le k configurazioni con il profitto lordo atteso più alto che rispettano i vincoli sui consumi attesi.
+
+    Args:
+        parametri_economici: Tupla (prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha), non negativi.
+        acqua_massima (float): Consumo atteso massimo di acqua (l/m²); None = nessun vincolo.
+        fertilizzanti_massimi (float): Consumo atteso massimo di fertilizzanti (kg/m²); None = nessun vincolo.
+        fissi (dict): Fattori da non modificare, es. {'dd-temperatura': 'sub-caldo'}.
+        k (int): Numero di configurazioni da restituire.
+
+    Returns:
+        dict: 'configurazioni' in ordine di profitto decrescente, ciascuna con 'fattori', 'chiave',
+              'profitto', 'produzione', 'acqua' e 'fertilizzanti' attesi; 'nodi_esplorati' e
+              'n_configurazioni' (combinazioni ammesse dai fattori fissi, per confronto).
+    """
+    prezzo, costo_acqua, costo_fert, costi_extra = parametri_economici
+    if min(prezzo, costo_acqua, costo_fert) < 0:
+        raise ValueError("Prezzo di vendita e costi unitari devono essere non negativi")
+    fissi = fissi or {}
+    acqua_massima = np.inf if acqua_massima is None else acqua_massima
+    fertilizzanti_massimi = np.inf if fertilizzanti_massimi is None else fertilizzanti_massimi
+
+    # Opzioni ammesse per fattore, dalla più produttiva; si ramifica prima sui fattori fissi
+    # e poi su quelli con la maggiore escursione del moltiplicatore, che stringono prima i limiti
+    codici_fissi = MODELLO.codifica(fissi)
+    ammesse = []
+    for i, id_fattore in enumerate(ORDINE_FATTORI):
+        codici = ([int(codici_fissi[i])] if codici_fissi[i] >= 0
+                  else list(range(len(MODELLO.opzioni[id_fattore]))))
+        ammesse.append(sorted(codici, key=lambda codice: -MEDIE_OPZIONI[i, codice, 0]))
+    ordine = sorted(range(len(ORDINE_FATTORI)),
+                    key=lambda i: (len(ammesse[i]) > 1, -np.ptp(MEDIE_OPZIONI[i, ammesse[i], 0])))
+
+    # Limiti ottimistici dei fattori ancora liberi dalla posizione p in poi
+    n = len(ordine)
+    miglior_prodotto = np.ones(n + 1)
+    minima_acqua = np.zeros(n + 1)
+    minimi_fert = np.zeros(n + 1)
+    for p in range(n - 1, -1, -1):
+        medie = MEDIE_OPZIONI[ordine[p], ammesse[ordine[p]]]
+        miglior_prodotto[p] = miglior_prodotto[p + 1] * medie[:, 0].max()
+        minima_acqua[p] = minima_acqua[p + 1] + medie[:, 1].min()
+        minimi_fert[p] = minimi_fert[p + 1] + medie[:, 2].min()
+
+    migliori = []  # min-heap di (profitto, -chiave, codici, momenti) con le k configurazioni migliori
+    codici = np.zeros(n, dtype=np.int16)
+    nodi_esplorati = 0
+
+    def profitto(produzione, acqua, fertilizzanti):
+        return simula_performance_finanziaria(produzione, {'acqua': acqua, 'fertilizzanti': fertilizzanti}, prezzo,
+                                              costo_acqua, costo_fert, costi_extra)["Profitto Lordo (€/m²)"]
+
+    def esplora(p, prodotto, mod_acqua, mod_fert):
+        nonlocal nodi_esplorati
+        nodi_esplorati += 1
+        # Per Jensen E[max(0, 1 + S)] >= max(0, 1 + E[S]): limiti inferiori validi dei consumi attesi
+        acqua_minima = MEDIA_BASE_ACQUA * max(0.0, 1 + mod_acqua + minima_acqua[p])
+        fert_minimi = MEDIA_BASE_FERTILIZZANTI * max(0.0, 1 + mod_fert + minimi_fert[p])
+        if acqua_minima > acqua_massima or fert_minimi > fertilizzanti_massimi:
+            return
+        limite = profitto(PRODUZIONE_BASE_OTTIMALE * prodotto * miglior_prodotto[p], acqua_minima, fert_minimi)
+        if len(migliori) == k and limite <= migliori[0][0]:
+            return
+
+        if p == n:
+            # Foglia: valori attesi esatti (la produzione coincide con il limite, i consumi includono la parte positiva)
+            codici_fattori = np.empty(n, dtype=np.int16)
+            codici_fattori[ordine] = codici
+            momenti = momenti_analitici(*MODELLO.intervalli(codici_fattori))
+            attesi = {nome: float(momenti[nome]['media']) for nome in ('produzione', 'acqua', 'fertilizzanti')}
+            if attesi['acqua'] > acqua_massima or attesi['fertilizzanti'] > fertilizzanti_massimi:
+                return
+            voce = (float(profitto(**attesi)), -int(MODELLO.chiavi(codici_fattori)), codici_fattori, attesi)
+            if len(migliori) < k:
+                heapq.heappush(migliori, voce)
+            elif voce[:2] > migliori[0][:2]:
+                heapq.heapreplace(migliori, voce)
+            return
+
+        i = ordine[p]
+        for codice in ammesse[i]:
+            codici[p] = codice
+            medie = MEDIE_OPZIONI[i, codice]
+            esplora(p + 1, prodotto * medie[0], mod_acqua + medie[1], mod_fert + medie[2])
+
+    if k > 0:
+        esplora(0, 1.0, 0.0, 0.0)
+
+    configurazioni = []
+    for valore, chiave_negativa, codici_fattori, attesi in sorted(migliori, key=lambda voce: voce[:2], reverse=True):
+        configurazioni.append({
+            'fattori': {id_fattore: MODELLO.opzioni[id_fattore][codice]
+                        for id_fattore, codice in zip(ORDINE_FATTORI, codici_fattori)},
+            'chiave': -chiave_negativa,
+            'profitto': valore,
+            **attesi,
+        })
+    return {
+        'configurazioni': configurazioni,
+        'nodi_esplorati': nodi_esplorati,
+        'n_configurazioni': int(np.prod([len(codici) for codici in ammesse])),
+    }
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from data import (
+    MODELLO,
+    N_DIMENSIONI,
+    N_FATTORI,
+    ORDINE_FATTORI,
+    PRODUZIONE_BASE_OTTIMALE,
+    RANGE_OTTIMALE_ACQUA,
+    RANGE_OTTIMALE_FERTILIZZANTI,
+    semi_blocchi,
+    simula_performance_finanziaria,
+    verifica_n_campioni
+)
+from scenari import N_SCENARI, CuboScenari
+
+# Analisi di pareggio e margine di sicurezza, per una configurazione o per tutte insieme:
+# prezzo di vendita e resa di pareggio derivano dai valori attesi del cubo degli scenari,
+# la probabilità di perdita da una simulazione Monte Carlo con numeri casuali comuni.
+
+CAMPIONI_PERDITA = 4_096
+CAMPIONI_PER_LOTTO = 32  # campioni per lotto nella simulazione dell'intero cubo (~3 MB per componente in float32)
+
+# Colonne delle uniformi che determinano, per ogni fattore, moltiplicatore di produzione e modificatori dei consumi
+_COLONNE_FATTORI = np.stack([np.arange(N_FATTORI), N_FATTORI + 2 + np.arange(N_FATTORI),
+                             2 * N_FATTORI + 2 + np.arange(N_FATTORI)])
+
+
+def _contributi(uniformi: np.ndarray, parametri_economici) -> tuple:
+    """
+    Contributi economici (€/m²) di ogni fattore e opzione per gli scenari dati, forma (N_FATTORI, opzioni, 3, n),
+    e valori iniziali (3, n) delle tre componenti: ricavo (moltiplicativo), costo dell'acqua e dei fertilizzanti
+    (additivi). Le stesse uniformi valgono per tutte le opzioni (numeri casuali comuni), come in
+    trasforma_uniformi applicata a ciascuna configurazione; prezzo e costi unitari, con le basi dei consumi,
+    sono già inclusi, perché con costi non negativi c · max(0, 1 + Σm) = max(0, c + Σ c·m).
+    I valori sono in float32, che dimezza memoria e tempo delle operazioni sull'intero cubo.
+    """
+    prezzo, costo_acqua, costo_fert, _ = parametri_economici
+    base_acqua = RANGE_OTTIMALE_ACQUA[0] + uniformi[:, N_FATTORI] * (RANGE_OTTIMALE_ACQUA[1] - RANGE_OTTIMALE_ACQUA[0])
+    base_fert = (RANGE_OTTIMALE_FERTILIZZANTI[0]
+                 + uniformi[:, N_FATTORI + 1] * (RANGE_OTTIMALE_FERTILIZZANTI[1] - RANGE_OTTIMALE_FERTILIZZANTI[0]))
+    # Stessa formula di simula_performance_finanziaria, scomposta per componente
+    iniziali = np.stack([np.full(len(uniformi), prezzo * PRODUZIONE_BASE_OTTIMALE),
+                         base_acqua / 1000 * costo_acqua, base_fert * costo_fert])
+    u = uniformi[:, _COLONNE_FATTORI].transpose(2, 1, 0)  # (N_FATTORI, 3, n)
+    valori = MODELLO.basso[..., None] + u[:, None] * (MODELLO.alto - MODELLO.basso)[..., None]
+    valori[:, :, 1:] *= iniziali[1:]
+    return valori.astype(np.float32), iniziali.astype(np.float32)
+
+
+def probabilita_perdita(parametri_economici, chiavi=None, n_campioni: int = CAMPIONI_PERDITA, seed=None) -> np.ndarray:
+    """
+    Probabilità di profitto lordo negativo per le configurazioni indicate (None = tutte, nell'ordine
+    delle chiavi), stimata su n_campioni scenari comuni a tutte. Per l'intero cubo i valori sono
+    costruiti fattore per fattore come prodotti esterni lungo gli assi della chiave a radice mista,
+    senza cicli sulle configurazioni; a parità di seme un sottoinsieme dà gli stessi valori.
+    """
+    if min(parametri_economici[:3]) < 0:
+        raise ValueError("Prezzo di vendita e costi unitari devono essere non negativi")
+    n_campioni = verifica_n_campioni(n_campioni)
+    altri_costi = parametri_economici[3] / 10000
+    tutte = chiavi is None
+    codici = None if tutte else MODELLO.codici_da_chiavi(chiavi)
+    perdite = np.zeros(N_SCENARI if tutte else len(codici), dtype=np.int64)
+    n_lotti = -(-n_campioni // CAMPIONI_PER_LOTTO)
+    for indice, seme in enumerate(semi_blocchi(seed, n_lotti)):
+        n = min(CAMPIONI_PER_LOTTO, n_campioni - indice * CAMPIONI_PER_LOTTO)
+        valori, iniziali = _contributi(np.random.default_rng(seme).random((n, N_DIMENSIONI)), parametri_economici)
+        if tutte:
+            ricavo, acqua, fert = iniziali[:, None]
+            for i, base in enumerate(MODELLO.basi):
+                opzioni = valori[i, :base]
+                ricavo = (ricavo[:, None] * opzioni[:, 0]).reshape(-1, n)
+                acqua = (acqua[:, None] + opzioni[:, 1]).reshape(-1, n)
+                fert = (fert[:, None] + opzioni[:, 2]).reshape(-1, n)
+        else:
+            selezionati = valori[np.arange(N_FATTORI), codici]  # (k, N_FATTORI, 3, n)
+            ricavo = iniziali[0] * selezionati[:, :, 0].prod(axis=1)
+            acqua = iniziali[1] + selezionati[:, :, 1].sum(axis=1)
+            fert = iniziali[2] + selezionati[:, :, 2].sum(axis=1)
+        # Profitto negativo: ricavo < costo acqua + costo fertilizzanti + altri costi (operazioni sul posto)
+        np.maximum(acqua, 0, out=acqua)
+        np.maximum(fert, 0, out=fert)
+        acqua += fert
+        acqua += altri_costi
+        perdite += np.count_nonzero(ricavo < acqua, axis=1)
+    return perdite / n_campioni
+
+
+def analisi_pareggio(cubo: CuboScenari, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha,
+                     chiavi=None, n_campioni: int = CAMPIONI_PERDITA, seed=None) -> pd.DataFrame:
+    """
+    Prezzo di pareggio, resa di pareggio, margine di sicurezza e probabilità di perdita per le configurazioni
+    indicate (None = tutte), calcolati in blocco su array.
+
+    Returns:
+        pd.DataFrame: Indice 'chiave', fattori in chiaro e le colonne 'produzione_media', 'profitto',
+                      'prezzo_pareggio' (€/kg), 'resa_pareggio' (kg/m² al prezzo corrente),
+                      'margine_sicurezza' (quota della resa attesa che si può perdere restando in pari)
+                      e 'probabilita_perdita'.
+    """
+    parametri_economici = (prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+    chiavi = np.arange(N_SCENARI) if chiavi is None else np.atleast_1d(np.asarray(chiavi, dtype=np.int64))
+    tabella = cubo.tabella[chiavi]
+    produzione = tabella['produzione_media']
+    consumi = {'acqua': tabella['acqua_media'], 'fertilizzanti': tabella['fertilizzanti_media']}
+    # Costi attesi: la parte della formula finanziaria che non dipende dalla produzione
+    costi = -simula_performance_finanziaria(0.0, consumi, *parametri_economici)["Profitto Lordo (€/m²)"]
+
+    risultato = cubo.come_dataframe(chiavi)[list(ORDINE_FATTORI) + ['produzione_media']]
+    risultato['profitto'] = prezzo_vendita_kg * produzione - costi
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risultato['prezzo_pareggio'] = costi / produzione
+        resa_pareggio = costi / prezzo_vendita_kg if prezzo_vendita_kg > 0 else np.full(len(chiavi), np.inf)
+    risultato['resa_pareggio'] = resa_pareggio
+    risultato['margine_sicurezza'] = 1 - resa_pareggio / produzione
+    completo = len(chiavi) == N_SCENARI and np.array_equal(chiavi, np.arange(N_SCENARI))
+    risultato['probabilita_perdita'] = probabilita_perdita(parametri_economici, None if completo else chiavi,
+                                                           n_campioni, seed)
+    return risultato
+
+
+# Criteri di classifica per robustezza: colonna -> (etichetta, ordine crescente)
+CRITERI_ROBUSTEZZA = {
+    'margine_sicurezza': ('Margine di sicurezza', False),
+    'probabilita_perdita': ('Probabilità di perdita', True),
+    'prezzo_pareggio': ('Prezzo di pareggio', True),
+    'profitto': ('Profitto atteso', False),
+}
+
+
+def ordina_per_robustezza(analisi: pd.DataFrame, criterio: str = 'margine_sicurezza') -> pd.DataFrame:
+    """
+    Ordina il risultato di analisi_pareggio dalla configurazione più robusta secondo il criterio
+    (chiave di CRITERI_ROBUSTEZZA); a parità decide il margine di sicurezza o, se è già il criterio
+    (a prezzo nullo è -inf per tutte), il prezzo di pareggio.
+    """
+    if criterio not in CRITERI_ROBUSTEZZA:
+        raise ValueError(f"Criterio sconosciuto: {criterio}. Disponibili: {', '.join(CRITERI_ROBUSTEZZA)}")
+    colonne = [criterio, 'prezzo_pareggio' if criterio == 'margine_sicurezza' else 'margine_sicurezza']
+    crescente = [CRITERI_ROBUSTEZZA[colonna][1] for colonna in colonne]
+    return analisi.sort_values(colonne, ascending=crescente, kind='stable')
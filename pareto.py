@@ -0,0 +1,69 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from scenari import CuboScenari
+
+# Frontiera di Pareto tra profitto lordo atteso (da massimizzare), consumo di acqua e consumo di
+# fertilizzanti (da minimizzare) su tutte le configurazioni del cubo degli scenari. Solo il profitto
+# dipende dai parametri economici, quindi a ogni loro modifica si ricalcola una sola colonna e il filtro.
+
+
+def indici_non_dominati(obiettivi: np.ndarray) -> np.ndarray:
+    """
+    Indici delle righe non dominate di una matrice (n, 2) o (n, 3) di obiettivi da minimizzare,
+    in O(n log n) invece del confronto a coppie O(n²): le righe vengono visitate in ordine
+    lessicografico, così ogni riga può essere dominata solo da una già visitata, e delle
+    righe visitate si conserva la sola "scala" non dominata negli altri obiettivi.
+    Tra righe identiche se ne conserva una sola.
+    """
+    obiettivi = np.asarray(obiettivi, dtype=float)
+    n, m = obiettivi.shape
+    if m not in (2, 3):
+        raise ValueError("Sono supportati solo due o tre obiettivi")
+    ordine = np.lexsort(obiettivi.T[::-1])
+    ordinati = obiettivi[ordine]
+    distinti = np.ones(n, dtype=bool)
+    distinti[1:] = np.any(ordinati[1:] != ordinati[:-1], axis=1)
+
+    if m == 2:
+        # Una riga è non dominata se il secondo obiettivo migliora il minimo di tutte le precedenti
+        minimo_precedente = np.minimum.accumulate(np.concatenate([[np.inf], ordinati[:-1, 1]]))
+        return np.sort(ordine[distinti & (ordinati[:, 1] < minimo_precedente)])
+
+    # Scala delle righe non dominate finora nel piano (secondo, terzo obiettivo):
+    # secondo obiettivo crescente e terzo strettamente decrescente
+    scala_x, scala_y = [], []
+    non_dominate = []
+    for indice, (_, x, y), distinta in zip(ordine, ordinati, distinti):
+        if not distinta:
+            continue
+        posizione = bisect.bisect_right(scala_x, x)
+        if posizione > 0 and scala_y[posizione - 1] <= y:
+            continue  # una riga precedente è migliore o uguale in tutti gli obiettivi
+        non_dominate.append(indice)
+        # Rimuove dalla scala le righe che la nuova domina nel piano
+        fine = posizione
+        while fine < len(scala_x) and scala_y[fine] >= y:
+            fine += 1
+        scala_x[posizione:fine] = [x]
+        scala_y[posizione:fine] = [y]
+    return np.sort(np.array(non_dominate, dtype=np.int64))
+
+
+def frontiera_pareto(cubo: CuboScenari, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg,
+                     costi_extra_ha) -> pd.DataFrame:
+    """
+    Configurazioni non dominate per profitto lordo atteso, acqua e fertilizzanti attesi.
+
+    Returns:
+        pd.DataFrame: Una riga per configurazione della frontiera (indice 'chiave'), con i fattori
+                      in chiaro, le statistiche del cubo e il 'profitto' atteso, in ordine di profitto decrescente.
+    """
+    profitto = cubo.profitto_atteso(prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha)
+    tabella = cubo.tabella
+    chiavi = indici_non_dominati(np.column_stack([-profitto, tabella['acqua_media'], tabella['fertilizzanti_media']]))
+    frontiera = cubo.come_dataframe(chiavi)
+    frontiera['profitto'] = profitto[chiavi]
+    return frontiera.sort_values('profitto', ascending=False)
@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+
+from data import (
+    MODELLO,
+    N_DIMENSIONI,
+    N_FATTORI,
+    NOMI_FATTORI,
+    ORDINE_FATTORI,
+    PRESETS,
+    PRODUZIONE_BASE_OTTIMALE,
+    RANGE_OTTIMALE_ACQUA,
+    RANGE_OTTIMALE_FERTILIZZANTI,
+    semi_blocchi,
+    verifica_n_campioni
+)
+from scenari import N_SCENARI
+from sensibilita import NOMI_PARAMETRI_ECONOMICI
+
+# Portafoglio aziendale: molti appezzamenti, ciascuno con la propria configurazione, superficie ed
+# eventuali parametri economici specifici. Gli appezzamenti sono conservati in forma codificata
+# (chiave della configurazione, codice dell'azienda, superficie), ogni configurazione distinta è
+# simulata una sola volta e i totali per azienda si ottengono sommando i campioni pesati per superficie.
+
+CAMPIONI_PORTAFOGLIO = 1_000
+ELEMENTI_PER_LOTTO = 1 << 19  # valori per array temporaneo (configurazioni x campioni o aziende)
+GRANDEZZE_PORTAFOGLIO = ('produzione', 'acqua', 'fertilizzanti', 'profitto')
+UNITA_PORTAFOGLIO = {'produzione': 'kg', 'acqua': 'm³', 'fertilizzanti': 'kg', 'profitto': '€'}
+COLONNA_AZIENDA = 'azienda'
+COLONNA_SUPERFICIE = 'superficie'  # m²
+
+
+class Portafoglio:
+    """
+    Tabella degli appezzamenti in forma compatta: per ogni appezzamento la chiave a radice mista della
+    configurazione (un intero al posto di nove stringhe), il codice dell'azienda, la superficie in float32
+    e, solo se presenti, i parametri economici specifici (NaN = valori generali). Circa 30 byte per
+    appezzamento: 100.000 appezzamenti occupano pochi MB.
+    """
+
+    def __init__(self, aziende, codici_azienda: np.ndarray, chiavi: np.ndarray, superfici: np.ndarray,
+                 economici: np.ndarray = None):
+        if not (len(codici_azienda) == len(chiavi) == len(superfici)) or (
+                economici is not None and economici.shape != (len(chiavi), len(NOMI_PARAMETRI_ECONOMICI))):
+            raise ValueError("Le colonne del portafoglio devono avere la stessa lunghezza")
+        self.aziende = pd.Index(aziende, name=COLONNA_AZIENDA)
+        self.codici_azienda = codici_azienda
+        self.chiavi = chiavi
+        self.superfici = superfici
+        self.economici = economici
+
+    def __len__(self):
+        return len(self.chiavi)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.codici_azienda, self.chiavi, self.superfici, self.economici)
+                   if array is not None)
+
+    @classmethod
+    def da_tabella(cls, tabella: pd.DataFrame) -> 'Portafoglio':
+        """
+        Codifica una tabella con una riga per appezzamento: COLONNA_AZIENDA, COLONNA_SUPERFICIE (m²),
+        i nove fattori (id dei dropdown o nomi di NOMI_FATTORI) e, facoltative, le colonne di
+        NOMI_PARAMETRI_ECONOMICI con i parametri specifici (vuote = valori generali).
+        """
+        tabella = tabella.rename(columns={nome: id_fattore for id_fattore, nome in NOMI_FATTORI.items()})
+        mancanti = [colonna for colonna in (COLONNA_AZIENDA, COLONNA_SUPERFICIE, *ORDINE_FATTORI)
+                    if colonna not in tabella.columns]
+        if mancanti:
+            raise ValueError(f"Colonne mancanti nel portafoglio: {', '.join(mancanti)}")
+
+        codici = np.empty((len(tabella), len(ORDINE_FATTORI)), dtype=np.int16)
+        for i, id_fattore in enumerate(ORDINE_FATTORI):
+            codici[:, i] = pd.Categorical(tabella[id_fattore], categories=MODELLO.opzioni[id_fattore]).codes
+            non_validi = codici[:, i] < 0
+            if non_validi.any():
+                valore = tabella[id_fattore].iloc[int(np.argmax(non_validi))]
+                raise ValueError(f"Opzione '{valore}' non valida per {NOMI_FATTORI[id_fattore]}")
+        superfici = pd.to_numeric(tabella[COLONNA_SUPERFICIE], errors='coerce').to_numpy(dtype=np.float32)
+        if np.isnan(superfici).any() or (superfici < 0).any():
+            raise ValueError("Le superfici devono essere numeri non negativi")
+
+        aziende = pd.Categorical(tabella[COLONNA_AZIENDA].astype(str))
+        colonne_economiche = [nome for nome in NOMI_PARAMETRI_ECONOMICI if nome in tabella.columns]
+        economici = None
+        if colonne_economiche:
+            economici = np.full((len(tabella), len(NOMI_PARAMETRI_ECONOMICI)), np.nan, dtype=np.float32)
+            for j, nome in enumerate(NOMI_PARAMETRI_ECONOMICI):
+                if nome in tabella.columns:
+                    economici[:, j] = pd.to_numeric(tabella[nome], errors='coerce')
+        return cls(aziende.categories, aziende.codes,
+                   MODELLO.chiavi(codici).astype(np.min_scalar_type(N_SCENARI - 1)), superfici, economici)
+
+    def come_dataframe(self) -> pd.DataFrame:
+        """
+        Decodifica il portafoglio in un DataFrame con aziende e fattori come colonne Categorical.
+        """
+        codici = MODELLO.codici_da_chiavi(self.chiavi.astype(np.int64))
+        df = pd.DataFrame({COLONNA_AZIENDA: pd.Categorical.from_codes(self.codici_azienda, self.aziende),
+                           COLONNA_SUPERFICIE: self.superfici})
+        for i, id_fattore in enumerate(ORDINE_FATTORI):
+            df[id_fattore] = pd.Categorical.from_codes(codici[:, i], MODELLO.opzioni[id_fattore])
+        if self.economici is not None:
+            for j, nome in enumerate(NOMI_PARAMETRI_ECONOMICI):
+                df[nome] = self.economici[:, j]
+        return df
+
+
+def leggi_portafoglio(sorgente) -> Portafoglio:
+    """
+    Legge da CSV (percorso o file) un portafoglio nel formato di Portafoglio.da_tabella; aziende e
+    fattori sono letti direttamente come colonne Categorical, senza una stringa per cella.
+    """
+    colonne_testo = {COLONNA_AZIENDA, *ORDINE_FATTORI, *NOMI_FATTORI.values()}
+    return Portafoglio.da_tabella(pd.read_csv(sorgente, dtype={colonna: 'category' for colonna in colonne_testo}))
+
+
+def portafoglio_esempio(n_appezzamenti: int = 10_000, n_aziende: int = 20, seed=None) -> Portafoglio:
+    """
+    Portafoglio casuale per prove e dimostrazioni: ogni azienda adotta uno o due preset,
+    con superfici tra 500 e 20.000 m² e un prezzo di vendita specifico per un appezzamento su dieci.
+    """
+    rng = np.random.default_rng(seed)
+    chiavi_preset = np.array([MODELLO.chiave(preset) for preset in PRESETS.values()])
+    preferiti = rng.choice(chiavi_preset, size=(n_aziende, 2))
+    codici_azienda = rng.integers(0, n_aziende, n_appezzamenti).astype(np.min_scalar_type(n_aziende - 1))
+    chiavi = preferiti[codici_azienda, rng.integers(0, 2, n_appezzamenti)].astype(np.min_scalar_type(N_SCENARI - 1))
+    economici = np.full((n_appezzamenti, len(NOMI_PARAMETRI_ECONOMICI)), np.nan, dtype=np.float32)
+    specifici = rng.random(n_appezzamenti) < 0.1
+    economici[specifici, 0] = rng.uniform(2.5, 5.0, specifici.sum())
+    return Portafoglio([f"Azienda {i + 1:02d}" for i in range(n_aziende)], codici_azienda, chiavi,
+                       rng.uniform(500, 20_000, n_appezzamenti).astype(np.float32), economici)
+
+
+def _valori_opzioni(uniformi: np.ndarray) -> tuple:
+    """
+    Valori estratti per ogni fattore, grandezza e opzione sugli scenari dati, forma (N_FATTORI, 3, opzioni, n):
+    moltiplicatore di produzione e modificatori di acqua e fertilizzanti, come in trasforma_uniformi; inoltre
+    i consumi di base (2, n), comuni a tutte le configurazioni.
+    """
+    colonne = np.stack([np.arange(N_FATTORI), N_FATTORI + 2 + np.arange(N_FATTORI),
+                        2 * N_FATTORI + 2 + np.arange(N_FATTORI)], axis=1)  # (N_FATTORI, 3)
+    basso, alto = MODELLO.basso.transpose(0, 2, 1)[..., None], MODELLO.alto.transpose(0, 2, 1)[..., None]
+    valori = basso + uniformi.T[colonne][:, :, None] * (alto - basso)
+    basi_basso, basi_alto = np.array([RANGE_OTTIMALE_ACQUA, RANGE_OTTIMALE_FERTILIZZANTI]).T[..., None]
+    return valori, basi_basso + uniformi.T[N_FATTORI:N_FATTORI + 2] * (basi_alto - basi_basso)
+
+
+def _campioni_configurazioni(valori: np.ndarray, basi: np.ndarray, codici: np.ndarray) -> dict:
+    """
+    Produzione (kg/m²), acqua (l/m²) e fertilizzanti (kg/m²) di k configurazioni (codici (k, N_FATTORI))
+    sugli stessi scenari, forma (k, n): la formula di trasforma_uniformi, con le righe di _valori_opzioni
+    raccolte per codice invece di ricalcolare per ogni configurazione tutte le N_DIMENSIONI uniformi.
+    """
+    produzione = np.full((len(codici), valori.shape[-1]), PRODUZIONE_BASE_OTTIMALE)
+    mod_acqua, mod_fert = np.ones_like(produzione), np.ones_like(produzione)
+    for i in range(N_FATTORI):
+        produzione *= valori[i, 0][codici[:, i]]
+        mod_acqua += valori[i, 1][codici[:, i]]
+        mod_fert += valori[i, 2][codici[:, i]]
+    # Valori sempre positivi, come in trasforma_uniformi
+    return {'produzione': produzione,
+            'acqua': np.maximum(0.0, np.multiply(mod_acqua, basi[0], out=mod_acqua), out=mod_acqua),
+            'fertilizzanti': np.maximum(0.0, np.multiply(mod_fert, basi[1], out=mod_fert), out=mod_fert)}
+
+
+def _riassumi(campioni: np.ndarray) -> dict:
+    """
+    Media, 5° e 95° percentile lungo l'ultimo asse (campioni).
+    """
+    p5, p95 = np.percentile(campioni, [5, 95], axis=-1)
+    return {'media': campioni.mean(axis=-1), 'p5': p5, 'p95': p95}
+
+
+def simula_portafoglio(portafoglio: Portafoglio, parametri_economici, n_campioni: int = CAMPIONI_PORTAFOGLIO,
+                       seed=None) -> dict:
+    """
+    Produzione (kg), acqua (m³), fertilizzanti (kg) e profitto lordo (€) per azienda e complessivi,
+    con media e fascia tra 5° e 95° percentile.
+
+    Le configurazioni distinte sono simulate una sola volta, a lotti, sugli stessi n_campioni scenari:
+    tutti gli appezzamenti vivono la stessa stagione, quindi le incertezze del modello sono comuni e le
+    fasce dell'aggregato sono prudenziali. Il modello finanziario è lineare nei valori per m², per cui le
+    coppie (azienda, configurazione) si riducono a quattro pesi: superficie e superficie per prezzo,
+    costo dell'acqua e costo dei fertilizzanti di ciascun appezzamento.
+
+    Args:
+        parametri_economici: Tupla nell'ordine di NOMI_PARAMETRI_ECONOMICI, usata dove l'appezzamento
+            non ha valori specifici.
+
+    Returns:
+        dict: 'aziende' (DataFrame indicizzato per azienda con superficie, appezzamenti, configurazioni e per
+              ogni grandezza di GRANDEZZE_PORTAFOGLIO le colonne _media, _p5 e _p95), 'totale' (Series con
+              le stesse colonne), 'n_appezzamenti' e 'n_configurazioni' (simulate).
+    """
+    n_campioni = verifica_n_campioni(n_campioni)
+    superfici = portafoglio.superfici.astype(np.float64)
+    economici = np.broadcast_to(np.asarray(parametri_economici, dtype=np.float64),
+                                (len(portafoglio), len(NOMI_PARAMETRI_ECONOMICI)))
+    if portafoglio.economici is not None:
+        economici = np.where(np.isnan(portafoglio.economici), economici, portafoglio.economici)
+    prezzo, costo_acqua, costo_fert, costi_extra = economici.T
+
+    # Coppie (configurazione, azienda) distinte, ordinate per configurazione, con i pesi sommati
+    n_aziende = len(portafoglio.aziende)
+    chiavi_uniche, configurazione = np.unique(portafoglio.chiavi, return_inverse=True)
+    coppie, coppia = np.unique(configurazione.astype(np.int64) * n_aziende + portafoglio.codici_azienda,
+                               return_inverse=True)
+    configurazione_coppia, azienda_coppia = np.divmod(coppie, n_aziende)
+    pesi = {
+        'superficie': np.bincount(coppia, superfici, len(coppie)),
+        'ricavi': np.bincount(coppia, superfici * prezzo, len(coppie)),
+        'acqua': np.bincount(coppia, superfici * costo_acqua / 1000, len(coppie)),
+        'fertilizzanti': np.bincount(coppia, superfici * costo_fert, len(coppie)),
+    }
+    inizio_coppie = np.searchsorted(configurazione_coppia, np.arange(len(chiavi_uniche) + 1))
+
+    uniformi = np.random.default_rng(semi_blocchi(seed, 1)[0]).random((n_campioni, N_DIMENSIONI))
+    valori, basi = _valori_opzioni(uniformi)
+    codici = MODELLO.codici_da_chiavi(chiavi_uniche.astype(np.int64))
+    totali = {grandezza: np.zeros((n_aziende, n_campioni)) for grandezza in GRANDEZZE_PORTAFOGLIO}
+    per_lotto = max(1, ELEMENTI_PER_LOTTO // max(n_campioni, n_aziende))
+    for inizio in range(0, len(chiavi_uniche), per_lotto):
+        fine = min(inizio + per_lotto, len(chiavi_uniche))
+        campioni = _campioni_configurazioni(valori, basi, codici[inizio:fine])  # (k, n)
+        # Pesi (aziende, k) delle configurazioni del lotto: i totali sono prodotti matriciali con i campioni
+        coppie_lotto = slice(inizio_coppie[inizio], inizio_coppie[fine])
+        indici = azienda_coppia[coppie_lotto], configurazione_coppia[coppie_lotto] - inizio
+        matrici = {}
+        for nome, valori_pesi in pesi.items():
+            matrici[nome] = np.zeros((n_aziende, fine - inizio))
+            matrici[nome][indici] = valori_pesi[coppie_lotto]
+        totali['produzione'] += matrici['superficie'] @ campioni['produzione']
+        totali['acqua'] += matrici['superficie'] @ campioni['acqua'] / 1000
+        totali['fertilizzanti'] += matrici['superficie'] @ campioni['fertilizzanti']
+        totali['profitto'] += (matrici['ricavi'] @ campioni['produzione'] - matrici['acqua'] @ campioni['acqua']
+                               - matrici['fertilizzanti'] @ campioni['fertilizzanti'])
+    # Altri costi variabili (€/Ha): non dipendono dallo scenario
+    totali['profitto'] -= np.bincount(portafoglio.codici_azienda, superfici * costi_extra / 10000, n_aziende)[:, None]
+
+    aziende = pd.DataFrame({
+        'superficie': np.bincount(portafoglio.codici_azienda, superfici, n_aziende),
+        'appezzamenti': np.bincount(portafoglio.codici_azienda, minlength=n_aziende),
+        'configurazioni': np.bincount(azienda_coppia, minlength=n_aziende),
+    }, index=portafoglio.aziende)
+    totale = {'superficie': superfici.sum(), 'appezzamenti': len(portafoglio), 'configurazioni': len(chiavi_uniche)}
+    for grandezza, campioni_aziende in totali.items():
+        for statistica, per_azienda in _riassumi(campioni_aziende).items():
+            aziende[f"{grandezza}_{statistica}"] = per_azienda
+        for statistica, complessivo in _riassumi(campioni_aziende.sum(axis=0)).items():
+            totale[f"{grandezza}_{statistica}"] = float(complessivo)
+    return {'aziende': aziende, 'totale': pd.Series(totale), 'n_appezzamenti': len(portafoglio),
+            'n_configurazioni': len(chiavi_uniche)}
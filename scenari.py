@@ -0,0 +1,201 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data import (
+    IMPATTI_RISORSE,
+    MODELLO,
+    PESI_FATTORI,
+    PRODUZIONE_BASE_OTTIMALE,
+    RANGE_OTTIMALE_ACQUA,
+    RANGE_OTTIMALE_FERTILIZZANTI,
+    momenti_analitici
+)
+
+# Directory dei risultati precalcolati condivisi tra i worker (sovrascrivibile da variabile d'ambiente)
+DIRECTORY_CACHE = os.environ.get('STRAWBERRY_CACHE_DIR',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+N_SCENARI = MODELLO.n_configurazioni
+
+GRANDEZZE_CUBO = ('produzione', 'acqua', 'fertilizzanti')
+STATISTICHE_CUBO = ('media', 'std', 'min', 'max')
+DTYPE_CUBO = np.dtype([(f"{grandezza}_{statistica}", np.float64)
+                       for grandezza in GRANDEZZE_CUBO for statistica in STATISTICHE_CUBO])
+
+
+def costruisci_tabella_scenari() -> np.ndarray:
+    """
+    Valuta analiticamente tutte le combinazioni dei fattori di PESI_FATTORI in un'unica
+    passata vettoriale e restituisce l'array strutturato indicizzato dalla chiave.
+    """
+    basso, alto = MODELLO.intervalli(MODELLO.codici_da_chiavi(np.arange(N_SCENARI)))
+    momenti = momenti_analitici(basso, alto)
+    tabella = np.empty(N_SCENARI, dtype=DTYPE_CUBO)
+    for grandezza in GRANDEZZE_CUBO:
+        tabella[f"{grandezza}_media"] = momenti[grandezza]['media']
+        tabella[f"{grandezza}_std"] = np.sqrt(momenti[grandezza]['varianza'])
+        tabella[f"{grandezza}_min"] = momenti[grandezza]['min']
+        tabella[f"{grandezza}_max"] = momenti[grandezza]['max']
+    return tabella
+
+
+class CuboScenari:
+    """
+    Cubo fattoriale completo degli scenari: una riga per ogni combinazione dei fattori,
+    indicizzata dalla chiave a radice mista, con interrogazioni vettoriali sull'intero spazio.
+    """
+
+    def __init__(self, tabella: np.ndarray):
+        if tabella.shape != (N_SCENARI,) or tabella.dtype != DTYPE_CUBO:
+            raise ValueError("La tabella non corrisponde allo spazio dei fattori corrente")
+        self.tabella = tabella
+
+    def __len__(self):
+        return N_SCENARI
+
+    def cerca(self, fattori: dict) -> dict:
+        """
+        Restituisce in O(1) le statistiche attese di una configurazione.
+        """
+        return dict(zip(DTYPE_CUBO.names, self.tabella[MODELLO.chiave(fattori)].tolist()))
+
+    def profitto_atteso(self, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha) -> np.ndarray:
+        """
+        Profitto lordo atteso (€/m²) di tutte le configurazioni: la formula di
+        simula_performance_finanziaria è lineare, quindi vale sui valori attesi.
+        """
+        return (self.tabella['produzione_media'] * prezzo_vendita_kg
+                - self.tabella['acqua_media'] / 1000 * costo_acqua_m3
+                - self.tabella['fertilizzanti_media'] * costo_fert_kg
+                - costi_extra_ha / 10000)
+
+    def seleziona(self, **limiti) -> np.ndarray:
+        """
+        Restituisce le chiavi delle configurazioni che rispettano i limiti indicati,
+        espressi come campo=(minimo, massimo) con None per un limite assente.
+        Esempio: cubo.seleziona(acqua_media=(None, 300)).
+        """
+        maschera = np.ones(N_SCENARI, dtype=bool)
+        for campo, (minimo, massimo) in limiti.items():
+            if minimo is not None:
+                maschera &= self.tabella[campo] >= minimo
+            if massimo is not None:
+                maschera &= self.tabella[campo] <= massimo
+        return np.nonzero(maschera)[0]
+
+    def classifica(self, valori, k: int = 10, decrescente: bool = True, chiavi=None) -> np.ndarray:
+        """
+        Restituisce le k chiavi migliori secondo un campo della tabella (o un array di valori
+        per ogni configurazione), eventualmente ristrette a un sottoinsieme di chiavi.
+        """
+        valori = self.tabella[valori] if isinstance(valori, str) else np.asarray(valori)
+        chiavi = np.arange(N_SCENARI) if chiavi is None else np.asarray(chiavi)
+        punteggi = valori[chiavi] if decrescente else -valori[chiavi]
+        k = min(k, len(chiavi))
+        if k == 0:
+            return chiavi[:0]
+        migliori = np.argpartition(-punteggi, k - 1)[:k]
+        return chiavi[migliori[np.argsort(-punteggi[migliori], kind='stable')]]
+
+    def come_dataframe(self, chiavi=None) -> pd.DataFrame:
+        """
+        Esporta (una parte del) cubo in un DataFrame con i fattori in chiaro.
+        """
+        chiavi = np.arange(N_SCENARI) if chiavi is None else np.asarray(chiavi)
+        codici = MODELLO.codici_da_chiavi(chiavi)
+        df = pd.DataFrame({id_fattore: pd.Categorical.from_codes(codici[:, i], MODELLO.opzioni[id_fattore])
+                           for i, id_fattore in enumerate(MODELLO.fattori)}, index=pd.Index(chiavi, name='chiave'))
+        for campo in DTYPE_CUBO.names:
+            df[campo] = self.tabella[campo][chiavi]
+        return df
+
+
+def impronta_modello() -> str:
+    """
+    Impronta delle tabelle del modello: cambia (e invalida il file su disco) a ogni modifica dei pesi.
+    """
+    sorgente = repr((PRODUZIONE_BASE_OTTIMALE, RANGE_OTTIMALE_ACQUA, RANGE_OTTIMALE_FERTILIZZANTI,
+                     PESI_FATTORI, IMPATTI_RISORSE, DTYPE_CUBO.descr))
+    return hashlib.sha256(sorgente.encode()).hexdigest()[:16]
+
+
+IMPRONTA_MODELLO = impronta_modello()
+
+
+def percorso_scenari() -> str:
+    """
+    Percorso del file binario del cubo per la versione corrente del modello.
+    """
+    return os.path.join(DIRECTORY_CACHE, f"scenari-{IMPRONTA_MODELLO}.npy")
+
+
+def salva_tabella_scenari(tabella: np.ndarray, percorso: str) -> None:
+    """
+    Scrive la tabella in formato .npy su un file temporaneo nella stessa directory e lo
+    sostituisce atomicamente: i lettori vedono sempre il file vecchio o quello nuovo, mai a metà.
+    """
+    os.makedirs(os.path.dirname(percorso), exist_ok=True)
+    descrittore, temporaneo = tempfile.mkstemp(dir=os.path.dirname(percorso), suffix='.tmp')
+    try:
+        with os.fdopen(descrittore, 'wb') as file:
+            np.save(file, tabella)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temporaneo, 0o644)
+        os.replace(temporaneo, percorso)
+    except BaseException:
+        os.unlink(temporaneo)
+        raise
+
+
+def apri_tabella_scenari(percorso: str) -> np.ndarray:
+    """
+    Apre il file del cubo in memory mapping in sola lettura: le pagine restano nella page cache
+    del sistema operativo e sono condivise senza copie da tutti i worker che lo aprono.
+    """
+    return np.load(percorso, mmap_mode='r')
+
+
+_cubo = None
+_identita_file = None
+
+
+def ottieni_cubo() -> CuboScenari:
+    """
+    Restituisce il cubo degli scenari mappato dal file su disco. Il file viene costruito
+    solo se manca (o è illeggibile) e viene riaperto se è stato sostituito da una ricostruzione.
+    """
+    global _cubo, _identita_file
+    percorso = percorso_scenari()
+    try:
+        stato = os.stat(percorso)
+        identita = (stato.st_ino, stato.st_mtime_ns, stato.st_size)
+        if _cubo is None or identita != _identita_file:
+            _cubo = CuboScenari(apri_tabella_scenari(percorso))
+            _identita_file = identita
+        return _cubo
+    except (OSError, ValueError):
+        pass
+
+    # File assente o non valido: ricostruzione e pubblicazione atomica
+    tabella = costruisci_tabella_scenari()
+    try:
+        salva_tabella_scenari(tabella, percorso)
+        stato = os.stat(percorso)
+        _cubo = CuboScenari(apri_tabella_scenari(percorso))
+        _identita_file = (stato.st_ino, stato.st_mtime_ns, stato.st_size)
+    except OSError:
+        # Directory non scrivibile: si ripiega sul cubo in memoria del singolo processo
+        _cubo = CuboScenari(tabella)
+        _identita_file = None
+    return _cubo
+
+
+if __name__ == '__main__':
+    # Ricostruzione esplicita (es. prima di avviare o ricaricare gunicorn)
+    salva_tabella_scenari(costruisci_tabella_scenari(), percorso_scenari())
+    print(f"Cubo degli scenari scritto in {percorso_scenari()}")
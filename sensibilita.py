@@ -0,0 +1,194 @@
+import numpy as np
+
+from campionamento import genera_uniformi
+from data import (
+    MODELLO,
+    N_DIMENSIONI,
+    N_FATTORI,
+    NOMI_FATTORI,
+    ORDINE_FATTORI,
+    intervalli_configurazione,
+    momenti_analitici,
+    semi_blocchi,
+    simula_performance_finanziaria,
+    trasforma_uniformi,
+    verifica_n_campioni
+)
+
+# Analisi di sensibilità del profitto lordo (€/m²) per una configurazione: oscillazioni one-at-a-time
+# (grafico a tornado), indici di Sobol basati sulla varianza e superficie what-if sui parametri economici,
+# ciascuno in un'unica valutazione vettoriale.
+
+NOMI_PARAMETRI_ECONOMICI = {
+    'prezzo_vendita_kg': 'Prezzo di Vendita',
+    'costo_acqua_m3': 'Costo Acqua',
+    'costo_fert_kg': 'Costo Fertilizzanti',
+    'costi_extra_ha': 'Altri Costi Variabili',
+}
+UNITA_PARAMETRI_ECONOMICI = {
+    'prezzo_vendita_kg': '€/kg',
+    'costo_acqua_m3': '€/m³',
+    'costo_fert_kg': '€/kg',
+    'costi_extra_ha': '€/Ha',
+}
+VARIAZIONE_ECONOMICA = 0.2  # oscillazione relativa (±20%) dei parametri economici
+CAMPIONI_SOBOL = 8_192
+
+# Gruppi di colonne delle uniformi attribuiti a ciascun input nell'analisi di Sobol: per ogni fattore
+# il moltiplicatore di produzione e i due modificatori dei consumi, poi le basi dei consumi e,
+# dopo le N_DIMENSIONI del motore, una colonna per ciascun parametro economico
+GRUPPI_SOBOL = {
+    **{NOMI_FATTORI[id_fattore]: [i, N_FATTORI + 2 + i, 2 * N_FATTORI + 2 + i]
+       for i, id_fattore in enumerate(ORDINE_FATTORI)},
+    'Consumi di Base': [N_FATTORI, N_FATTORI + 1],
+    **{nome: [N_DIMENSIONI + j] for j, nome in enumerate(NOMI_PARAMETRI_ECONOMICI.values())},
+}
+
+
+def profitto_atteso(basso: np.ndarray, alto: np.ndarray, prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg,
+                    costi_extra_ha) -> np.ndarray:
+    """
+    Profitto lordo atteso (€/m²) per una o più configurazioni, dati i limiti delle uniformi con forma
+    (..., N_DIMENSIONI). Il modello finanziario è lineare, quindi basta applicarlo ai valori attesi;
+    i parametri economici possono essere array che si combinano per broadcasting.
+    """
+    momenti = momenti_analitici(basso, alto)
+    consumi = {risorsa: momenti[risorsa]['media'] for risorsa in ('acqua', 'fertilizzanti')}
+    return simula_performance_finanziaria(momenti['produzione']['media'], consumi, prezzo_vendita_kg,
+                                          costo_acqua_m3, costo_fert_kg, costi_extra_ha)["Profitto Lordo (€/m²)"]
+
+
+# Superficie what-if: griglia di PUNTI_WHATIF x PUNTI_WHATIF valori di due parametri economici, da 0 a
+# ESTENSIONE_WHATIF volte il valore corrente (o quello di riferimento della dashboard, se nullo)
+PUNTI_WHATIF = 200
+ESTENSIONE_WHATIF = 2.0
+VALORI_RIFERIMENTO_ECONOMICI = {'prezzo_vendita_kg': 3.5, 'costo_acqua_m3': 1.0, 'costo_fert_kg': 2.5, 'costi_extra_ha': 5000}
+
+
+def superficie_profitto(simulazione: dict, parametri_economici, asse_x: str, asse_y: str,
+                        punti: int = PUNTI_WHATIF, estensione: float = ESTENSIONE_WHATIF) -> dict:
+    """
+    Profitto lordo (€/m²) su una griglia di due parametri economici, con gli altri fissi ai valori correnti,
+    in un'unica valutazione di simula_performance_finanziaria per broadcasting (asse x come riga, asse y come colonna).
+
+    Args:
+        simulazione (dict): 'produzione', 'acqua' e 'fertilizzanti' attesi (come store-simulazione).
+        parametri_economici: Tupla dei valori correnti nell'ordine di NOMI_PARAMETRI_ECONOMICI.
+        asse_x, asse_y (str): Nomi dei parametri sugli assi, chiavi di NOMI_PARAMETRI_ECONOMICI.
+
+    Returns:
+        dict: 'x' e 'y' (valori della griglia), 'profitto' con forma (len(y), len(x)) e 'pareggio',
+              l'ordinata della curva di profitto nullo per ogni x (NaN dove la colonna non cambia segno).
+    """
+    valori = dict(zip(NOMI_PARAMETRI_ECONOMICI, parametri_economici))
+    griglie = {}
+    for asse, forma in ((asse_x, (1, punti)), (asse_y, (punti, 1))):
+        massimo = estensione * (valori[asse] if valori[asse] > 0 else VALORI_RIFERIMENTO_ECONOMICI[asse])
+        griglie[asse] = np.linspace(0, massimo, punti)
+        valori[asse] = griglie[asse].reshape(forma)
+    consumi = {'acqua': simulazione['acqua'], 'fertilizzanti': simulazione['fertilizzanti']}
+    profitto = simula_performance_finanziaria(simulazione['produzione'], consumi, **valori)["Profitto Lordo (€/m²)"]
+    profitto = np.broadcast_to(profitto, (punti, punti))
+    y = griglie[asse_y]
+
+    # Curva di pareggio: primo cambio di segno lungo ogni colonna, interpolato linearmente tra i due punti
+    cambi = np.signbit(profitto[1:]) != np.signbit(profitto[:-1])
+    riga = cambi.argmax(axis=0)
+    colonne = np.arange(punti)
+    prima, dopo = profitto[riga, colonne], profitto[riga + 1, colonne]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pareggio = y[riga] + (y[riga + 1] - y[riga]) * prima / (prima - dopo)
+    pareggio[~cambi.any(axis=0)] = np.nan
+    return {'x': griglie[asse_x], 'y': y, 'profitto': profitto, 'pareggio': pareggio}
+
+
+def oscillazioni_tornado(fattori: dict, parametri_economici, variazione_economica: float = VARIAZIONE_ECONOMICA) -> dict:
+    """
+    Oscillazioni one-at-a-time del profitto atteso: ogni fattore viene portato su tutte le sue opzioni
+    (tenendo fermi gli altri) e ogni parametro economico di ±variazione_economica. Tutte le
+    configurazioni alternative sono valutate analiticamente in un'unica chiamata vettoriale.
+
+    Returns:
+        dict: 'base' (profitto della configurazione) e 'voci', ordinate per ampiezza decrescente,
+              ciascuna con 'nome', 'minimo', 'massimo', 'etichetta_minimo' ed 'etichetta_massimo'.
+    """
+    codici_base = MODELLO.codifica(fattori)
+    varianti = [(i, codice) for i, id_fattore in enumerate(ORDINE_FATTORI)
+                for codice in range(len(MODELLO.opzioni[id_fattore]))]
+    codici = np.tile(codici_base, (len(varianti) + 1, 1))
+    for riga, (i, codice) in enumerate(varianti, start=1):
+        codici[riga, i] = codice
+    profitti = profitto_atteso(*MODELLO.intervalli(codici), *parametri_economici)
+    base = float(profitti[0])
+
+    voci = []
+    for i, id_fattore in enumerate(ORDINE_FATTORI):
+        righe = [riga for riga, (j, _) in enumerate(varianti, start=1) if j == i]
+        peggiore, migliore = min(righe, key=profitti.__getitem__), max(righe, key=profitti.__getitem__)
+        voci.append({'nome': NOMI_FATTORI[id_fattore],
+                     'minimo': float(profitti[peggiore]), 'etichetta_minimo': MODELLO.opzioni[id_fattore][varianti[peggiore - 1][1]],
+                     'massimo': float(profitti[migliore]), 'etichetta_massimo': MODELLO.opzioni[id_fattore][varianti[migliore - 1][1]]})
+
+    # Parametri economici: il profitto è lineare in ciascuno, quindi bastano i due estremi
+    fattori_variazione = np.array([1 - variazione_economica, 1 + variazione_economica])
+    basso, alto = intervalli_configurazione(fattori)
+    for j, nome in enumerate(NOMI_PARAMETRI_ECONOMICI.values()):
+        parametri = [np.full(2, valore) for valore in parametri_economici]
+        parametri[j] = parametri[j] * fattori_variazione
+        estremi = profitto_atteso(basso, alto, *parametri)
+        ordine = np.argsort(estremi)
+        etichette = [f"{parametri[j][k]:.4g}" for k in ordine]
+        voci.append({'nome': nome, 'minimo': float(estremi[ordine[0]]), 'etichetta_minimo': etichette[0],
+                     'massimo': float(estremi[ordine[1]]), 'etichetta_massimo': etichette[1]})
+
+    voci.sort(key=lambda voce: voce['massimo'] - voce['minimo'], reverse=True)
+    return {'base': base, 'voci': voci}
+
+
+def indici_sobol(fattori: dict, parametri_economici, n_campioni: int = CAMPIONI_SOBOL,
+                 variazione_economica: float = VARIAZIONE_ECONOMICA, seed=None,
+                 campionatore: str = 'ipercubo_latino') -> dict:
+    """
+    Indici di Sobol del primo ordine e totali del profitto lordo rispetto agli input di GRUPPI_SOBOL:
+    l'incertezza di ciascun fattore nel suo range per la configurazione data, le basi dei consumi e
+    i parametri economici, uniformi entro ±variazione_economica. Le matrici A, B e le k matrici miste
+    A_B^(i) sono valutate insieme in un unico lotto di (k + 2) · n_campioni scenari (stimatori di
+    Saltelli per il primo ordine e di Jansen per gli indici totali).
+
+    Returns:
+        dict: 'media' e 'varianza' del profitto, 'n_valutazioni' e 'indici' (per nome del gruppo,
+              in ordine di indice totale decrescente) con 'primo_ordine' e 'totale'.
+    """
+    n_campioni = verifica_n_campioni(n_campioni)
+    gruppi = list(GRUPPI_SOBOL.items())
+    dimensioni = N_DIMENSIONI + len(NOMI_PARAMETRI_ECONOMICI)
+    seme_a, seme_b = semi_blocchi(seed, 2)
+    a = genera_uniformi(campionatore, n_campioni, dimensioni, seme_a)
+    b = genera_uniformi(campionatore, n_campioni, dimensioni, seme_b)
+
+    # Lotto unico: A, B e per ogni gruppo A con le colonne del gruppo prese da B
+    lotto = np.empty((len(gruppi) + 2, n_campioni, dimensioni))
+    lotto[0], lotto[1] = a, b
+    for k, (_, colonne) in enumerate(gruppi, start=2):
+        lotto[k] = a
+        lotto[k][:, colonne] = b[:, colonne]
+    lotto = lotto.reshape(-1, dimensioni)
+
+    basso, alto = intervalli_configurazione(fattori)
+    campioni = trasforma_uniformi(lotto[:, :N_DIMENSIONI], basso, alto)
+    economici = np.asarray(parametri_economici, dtype=float) * (1 + variazione_economica * (2 * lotto[:, N_DIMENSIONI:] - 1))
+    profitti = simula_performance_finanziaria(campioni['produzione'], campioni,
+                                              *economici.T)["Profitto Lordo (€/m²)"].reshape(len(gruppi) + 2, n_campioni)
+
+    f_a, f_b, f_ab = profitti[0], profitti[1], profitti[2:]
+    varianza = np.concatenate([f_a, f_b]).var()
+    primo_ordine = (f_b * (f_ab - f_a)).mean(axis=1) / varianza
+    totale = 0.5 * ((f_a - f_ab) ** 2).mean(axis=1) / varianza
+    indici = {nome: {'primo_ordine': float(primo_ordine[k]), 'totale': float(totale[k])}
+              for k, (nome, _) in enumerate(gruppi)}
+    return {
+        'media': float(np.concatenate([f_a, f_b]).mean()),
+        'varianza': float(varianza),
+        'n_valutazioni': int(profitti.size),
+        'indici': dict(sorted(indici.items(), key=lambda voce: voce[1]['totale'], reverse=True)),
+    }
@@ -0,0 +1,117 @@
+import numpy as np
+
+from campionamento import CAMPIONATORI, genera_uniformi
+from data import (
+    CALENDARIO_COLTURALE,
+    N_DIMENSIONI,
+    PESI_MENSILI,
+    intervalli_configurazione,
+    semi_blocchi,
+    simula_performance_finanziaria,
+    trasforma_uniformi,
+    verifica_n_campioni
+)
+
+# Simulazione mensile su più stagioni guidata dal calendario colturale: produzione e consumi di ogni
+# stagione sono ripartiti sui mesi con i pesi di CALENDARIO_COLTURALE e i ricavi usano una curva
+# mensile dei prezzi. Campioni, stagioni e mesi formano un unico array (campioni, stagioni, 12);
+# orizzonti lunghi sono elaborati a lotti di stagioni, così la memoria resta limitata.
+
+MESI = tuple(mese.mese for mese in CALENDARIO_COLTURALE)
+
+# Profili mensili del prezzo di vendita, come multipli del prezzo medio: normalizzati in modo che la
+# media pesata sulla produzione sia 1, così il ricavo annuo atteso coincide con quello del modello annuale.
+# Lo stagionale ha il premio di inizio campagna e il minimo durante il picco di raccolta
+_PROFILO_STAGIONALE = np.array([1.50, 1.35, 1.10, 0.90, 0.85, 0.95, 1.05, 1.05, 1.05, 1.10, 1.20, 1.40])
+PROFILI_PREZZI = {
+    'stagionale': _PROFILO_STAGIONALE / (PESI_MENSILI @ _PROFILO_STAGIONALE),
+    'costante': np.ones(len(MESI)),
+}
+for _profilo in PROFILI_PREZZI.values():
+    _profilo.setflags(write=False)
+
+VOLATILITA_PREZZI = 0.10  # deviazione standard del logaritmo del prezzo in ciascun mese, attorno al profilo
+QUOTE_ALTRI_COSTI = np.full(len(MESI), 1 / len(MESI))  # altri costi variabili ripartiti uniformemente sull'anno
+QUOTE_ALTRI_COSTI.setflags(write=False)
+
+CAMPIONI_SERIE = 2_000
+ELEMENTI_PER_LOTTO = 1 << 17  # valori (campioni x stagioni x mesi) per grandezza in un lotto, picco ~25 MB
+GRANDEZZE_MENSILI = ('produzione', 'acqua', 'fertilizzanti', 'ricavi', 'costi', 'flusso')
+
+
+def genera_stagioni(fattori: dict, parametri_economici, n_campioni: int = CAMPIONI_SERIE, n_stagioni: int = 1,
+                    seed=None, profilo_prezzi=PROFILI_PREZZI['stagionale'],
+                    volatilita_prezzi: float = VOLATILITA_PREZZI, pesi_mensili=PESI_MENSILI,
+                    campionatore: str = 'casuale'):
+    """
+    Genera a lotti di stagioni le serie mensili simulate di una configurazione. Ogni stagione ha
+    un proprio flusso casuale (semi_blocchi), quindi con lo stesso seed il risultato non dipende
+    dalla dimensione dei lotti.
+
+    Args:
+        fattori (dict): Il dizionario con i valori selezionati dai dropdown.
+        parametri_economici: Tupla (prezzo_vendita_kg, costo_acqua_m3, costo_fert_kg, costi_extra_ha);
+            il prezzo è quello medio, modulato mese per mese da profilo_prezzi.
+        profilo_prezzi: 12 moltiplicatori del prezzo medio, da Gennaio a Dicembre.
+        volatilita_prezzi (float): Deviazione standard del rumore log-normale (a media 1) sul prezzo di ogni mese.
+        pesi_mensili: Quote mensili di produzione e consumi (somma 1), per default quelle del calendario colturale.
+
+    Yields:
+        tuple: (prima stagione del lotto, dict con gli array (n_campioni, stagioni del lotto, 12) di GRANDEZZE_MENSILI).
+    """
+    n_campioni, n_stagioni = verifica_n_campioni(n_campioni), verifica_n_campioni(n_stagioni, 'stagioni')
+    if campionatore not in CAMPIONATORI:
+        raise ValueError(f"Campionatore '{campionatore}' non valido: scegliere tra {', '.join(CAMPIONATORI)}")
+    prezzo_vendita, costo_acqua, costo_fert, costi_extra = parametri_economici
+    basso, alto = intervalli_configurazione(fattori)
+    # Curva dei prezzi corretta per la media del rumore log-normale, exp(σ²/2)
+    prezzi = prezzo_vendita * np.asarray(profilo_prezzi) * np.exp(-volatilita_prezzi ** 2 / 2)
+    semi = semi_blocchi(seed, n_stagioni)
+    stagioni_per_lotto = max(1, ELEMENTI_PER_LOTTO // (n_campioni * len(MESI)))
+
+    for inizio in range(0, n_stagioni, stagioni_per_lotto):
+        semi_lotto = semi[inizio:inizio + stagioni_per_lotto]
+        uniformi = np.empty((n_campioni, len(semi_lotto), N_DIMENSIONI))
+        rumore = np.empty((n_campioni, len(semi_lotto), len(MESI)))
+        for j, seme in enumerate(semi_lotto):
+            rng = np.random.default_rng(seme)
+            uniformi[:, j] = genera_uniformi(campionatore, n_campioni, N_DIMENSIONI, rng)
+            rumore[:, j] = rng.standard_normal((n_campioni, len(MESI)))
+
+        annuali = trasforma_uniformi(uniformi.reshape(-1, N_DIMENSIONI), basso, alto)
+        mensili = {nome: valori.reshape(n_campioni, -1, 1) * pesi_mensili for nome, valori in annuali.items()}
+        np.multiply(rumore, volatilita_prezzi, out=rumore)
+        finanza = simula_performance_finanziaria(mensili['produzione'], mensili, prezzi * np.exp(rumore, out=rumore),
+                                                 costo_acqua, costo_fert, costi_extra * QUOTE_ALTRI_COSTI)
+        ricavi, flusso = finanza["Ricavi (€/m²)"], finanza["Profitto Lordo (€/m²)"]
+        yield inizio, {**mensili, 'ricavi': ricavi, 'costi': ricavi - flusso, 'flusso': flusso}
+
+
+def simula_serie_mensili(fattori: dict, parametri_economici, n_campioni: int = CAMPIONI_SERIE, n_stagioni: int = 1,
+                         seed=None, **opzioni) -> dict:
+    """
+    Statistiche mese per mese delle serie generate da genera_stagioni, consumate un lotto alla volta:
+    in memoria restano solo le statistiche (stagioni, 12) e il flusso cumulato di ciascun campione.
+
+    Args:
+        opzioni: profilo_prezzi, volatilita_prezzi, pesi_mensili e campionatore, come in genera_stagioni.
+
+    Returns:
+        dict: 'mesi', 'n_campioni', 'n_stagioni' e 'serie', con per ogni grandezza di GRANDEZZE_MENSILI
+              e per il flusso 'cumulato' dall'inizio dell'orizzonte gli array (n_stagioni, 12) di
+              'media', 'p5' e 'p95'.
+    """
+    n_campioni, n_stagioni = verifica_n_campioni(n_campioni), verifica_n_campioni(n_stagioni, 'stagioni')
+    serie = {nome: {statistica: np.empty((n_stagioni, len(MESI))) for statistica in ('media', 'p5', 'p95')}
+             for nome in GRANDEZZE_MENSILI + ('cumulato',)}
+    cumulato = np.zeros((n_campioni, 1))
+    for inizio, lotto in genera_stagioni(fattori, parametri_economici, n_campioni, n_stagioni, seed, **opzioni):
+        # Flusso cumulato: somma lungo stagioni e mesi del lotto, a partire dal totale dei lotti precedenti
+        flussi = lotto['flusso'].reshape(n_campioni, -1)
+        lotto['cumulato'] = (np.cumsum(flussi, axis=1) + cumulato).reshape(lotto['flusso'].shape)
+        cumulato = lotto['cumulato'][:, -1, -1:]
+        fine = inizio + lotto['flusso'].shape[1]
+        for nome, valori in lotto.items():
+            serie[nome]['media'][inizio:fine] = valori.mean(axis=0)
+            serie[nome]['p5'][inizio:fine], serie[nome]['p95'][inizio:fine] = np.percentile(valori, [5, 95], axis=0)
+    return {'mesi': MESI, 'n_campioni': n_campioni, 'n_stagioni': n_stagioni, 'serie': serie}
@@ -0,0 +1,404 @@
+import argparse
+import itertools
+import json
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psutil
+
+from data import (
+    GRANDEZZE_SIMULATE,
+    MODELLO,
+    aggiungi_finanza,
+    riassumi_campioni,
+    simula_campioni_agronomici
+)
+from scenari import IMPRONTA_MODELLO, N_SCENARI, salva_tabella_scenari
+
+# Sweep Monte Carlo dell'intero spazio dei fattori (PESI_FATTORI) per una griglia di parametri economici.
+# Lo spazio delle configurazioni è diviso in shard di chiavi contigue; ogni shard completato è un file
+# .npy nella directory del job, descritta da manifest.json. Più processi (anche su host diversi con un
+# filesystem condiviso) prendono in carico gli shard tramite file di claim creati in modo esclusivo.
+
+VERSIONE_SWEEP = 1
+PARAMETRI_ECONOMICI = ('prezzo_vendita_kg', 'costo_acqua_m3', 'costo_fert_kg', 'costi_extra_ha')
+GRIGLIA_ECONOMICA_PREDEFINITA = {
+    'prezzo_vendita_kg': (2.5, 3.5, 4.5, 5.5),
+    'costo_acqua_m3': (0.5, 1.0, 1.5),
+    'costo_fert_kg': (1.5, 2.5, 3.5),
+    'costi_extra_ha': (3000, 5000, 8000),
+}
+STATISTICHE_SWEEP = ('media', 'std', 'p5', 'p50', 'p95')
+DTYPE_SWEEP = np.dtype([('chiave', np.int32)]
+                       + [(parametro, np.float64) for parametro in PARAMETRI_ECONOMICI]
+                       + [(f"{grandezza}_{statistica}", np.float64)
+                          for grandezza in GRANDEZZE_SIMULATE for statistica in STATISTICHE_SWEEP])
+
+# Un claim non aggiornato da più di questo tempo appartiene a un processo morto e può essere ripreso
+SCADENZA_CLAIM_SECONDI = 30 * 60
+# Attesa di un worker quando tutti gli shard mancanti sono in carico ad altri: raddoppia fino al massimo
+ATTESA_INIZIALE_SECONDI = 1.0
+ATTESA_MASSIMA_SECONDI = 60.0
+
+
+class ErroreSweep(RuntimeError):
+    """
+    Job di sweep incompatibile con i parametri richiesti o non ancora completo.
+    """
+
+
+class ClaimPerso(ErroreSweep):
+    """
+    Il claim di uno shard in calcolo è passato a un altro processo.
+    """
+
+
+def punti_economici(griglia: dict) -> np.ndarray:
+    """
+    Prodotto cartesiano della griglia economica, forma (n_punti, 4) nell'ordine di PARAMETRI_ECONOMICI.
+    """
+    return np.array(list(itertools.product(*(griglia[parametro] for parametro in PARAMETRI_ECONOMICI))),
+                    dtype=np.float64)
+
+
+# --- Manifest e layout della directory del job ---
+
+def percorso_manifest(directory: str) -> str:
+    return os.path.join(directory, 'manifest.json')
+
+
+def percorso_shard(directory: str, indice: int) -> str:
+    return os.path.join(directory, f"shard-{indice:05d}.npy")
+
+
+def percorso_claim(directory: str, indice: int) -> str:
+    return os.path.join(directory, f"shard-{indice:05d}.claim")
+
+
+def percorso_risultati(directory: str) -> str:
+    return os.path.join(directory, 'risultati.npy')
+
+
+def crea_manifest(griglia: dict, n_campioni: int, seed: int, dimensione_shard: int) -> dict:
+    return {
+        'versione': VERSIONE_SWEEP,
+        'impronta_modello': IMPRONTA_MODELLO,
+        'griglia_economica': {parametro: [float(valore) for valore in griglia[parametro]]
+                              for parametro in PARAMETRI_ECONOMICI},
+        'n_campioni': int(n_campioni),
+        'seed': int(seed),
+        'dimensione_shard': int(dimensione_shard),
+        'n_configurazioni': N_SCENARI,
+        'n_shard': -(-N_SCENARI // dimensione_shard),
+    }
+
+
+def scrivi_json_atomico(dati: dict, percorso: str) -> None:
+    descrittore, temporaneo = tempfile.mkstemp(dir=os.path.dirname(percorso), suffix='.tmp')
+    try:
+        with os.fdopen(descrittore, 'w') as file:
+            json.dump(dati, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temporaneo, 0o644)
+        os.replace(temporaneo, percorso)
+    except BaseException:
+        os.unlink(temporaneo)
+        raise
+
+
+def leggi_manifest(directory: str) -> dict:
+    with open(percorso_manifest(directory)) as file:
+        return json.load(file)
+
+
+def prepara_job(directory: str, griglia: dict = None, n_campioni: int = 100_000, seed: int = 0,
+                dimensione_shard: int = 256) -> dict:
+    """
+    Crea la directory e il manifest del job oppure, se esiste già, verifica che i parametri coincidano,
+    così che un riavvio riprenda lo stesso job invece di mescolare risultati diversi.
+    """
+    manifest = crea_manifest(griglia or GRIGLIA_ECONOMICA_PREDEFINITA, n_campioni, seed, dimensione_shard)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        esistente = leggi_manifest(directory)
+    except FileNotFoundError:
+        scrivi_json_atomico(manifest, percorso_manifest(directory))
+        # Più processi possono creare il manifest in contemporanea: vale l'ultimo, purché identico
+        esistente = leggi_manifest(directory)
+    if esistente != manifest:
+        differenze = sorted(campo for campo in manifest if esistente.get(campo) != manifest[campo])
+        raise ErroreSweep(f"La directory {directory} contiene un job con parametri diversi: {', '.join(differenze)}")
+    return manifest
+
+
+def shard_completato(directory: str, indice: int) -> bool:
+    return os.path.exists(percorso_shard(directory, indice))
+
+
+def stato_job(directory: str) -> dict:
+    """
+    Avanzamento del job: shard completati, in corso (claim attivi) e mancanti.
+    """
+    manifest = leggi_manifest(directory)
+    completati = [i for i in range(manifest['n_shard']) if shard_completato(directory, i)]
+    in_corso = [i for i in range(manifest['n_shard'])
+                if i not in completati and os.path.exists(percorso_claim(directory, i))]
+    return {'n_shard': manifest['n_shard'], 'completati': len(completati), 'in_corso': len(in_corso),
+            'mancanti': manifest['n_shard'] - len(completati) - len(in_corso)}
+
+
+# --- Presa in carico degli shard ---
+
+def claim_scaduto(percorso: str, scadenza_secondi: float = SCADENZA_CLAIM_SECONDI) -> bool:
+    """
+    Un claim è scaduto se non viene rinnovato da più di scadenza_secondi oppure, subito, se è
+    stato creato su questo host da un processo che non esiste più (worker terminato e riavviato).
+    """
+    try:
+        if time.time() - os.stat(percorso).st_mtime > scadenza_secondi:
+            return True
+        with open(percorso) as file:
+            proprietario = json.load(file)
+    except (OSError, ValueError):
+        # Claim assente, appena creato e non ancora scritto, o illeggibile: vale solo la scadenza
+        return False
+    return proprietario.get('host') == socket.gethostname() and not psutil.pid_exists(proprietario.get('pid', 0))
+
+
+def claim_proprio(percorso: str) -> bool:
+    """
+    Vero se il claim esiste ed è stato creato da questo processo.
+    """
+    try:
+        with open(percorso) as file:
+            proprietario = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return proprietario.get('host') == socket.gethostname() and proprietario.get('pid') == os.getpid()
+
+
+def prendi_shard(directory: str, indice: int, scadenza_secondi: float = SCADENZA_CLAIM_SECONDI) -> bool:
+    """
+    Tenta di prendere in carico uno shard creando il suo claim in modo esclusivo (O_EXCL,
+    atomico anche su NFS moderni). Un claim scaduto viene prima rinominato: solo uno dei
+    processi concorrenti riesce nella rinomina, e la scadenza è verificata di nuovo sul file
+    rinominato. Se nel frattempo un altro processo aveva già sostituito il claim scaduto con
+    uno nuovo, quello viene rimesso al suo posto e la presa fallisce; un claim creato da un terzo
+    processo nell'intervallo viene sovrascritto, e quel processo se ne accorge al rinnovo.
+    """
+    claim = percorso_claim(directory, indice)
+    if claim_scaduto(claim, scadenza_secondi):
+        recuperato = f"{claim}.scaduto-{socket.gethostname()}-{os.getpid()}"
+        try:
+            os.rename(claim, recuperato)
+        except OSError:
+            return False
+        if not claim_scaduto(recuperato, scadenza_secondi):
+            os.replace(recuperato, claim)
+            return False
+        os.unlink(recuperato)
+    try:
+        descrittore = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(descrittore, 'w') as file:
+        json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'inizio': time.time()}, file)
+    # Lo shard potrebbe essere stato completato tra il controllo e il claim
+    if shard_completato(directory, indice):
+        rilascia_shard(directory, indice)
+        return False
+    return True
+
+
+def rinnova_shard(directory: str, indice: int) -> bool:
+    """
+    Aggiorna l'mtime del claim, segnalando che il processo è ancora attivo. Restituisce False,
+    senza toccarlo, se il claim non è (più) di questo processo.
+    """
+    claim = percorso_claim(directory, indice)
+    if not claim_proprio(claim):
+        return False
+    try:
+        os.utime(claim)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def rilascia_shard(directory: str, indice: int) -> None:
+    """
+    Elimina il claim solo se è di questo processo: quello di un altro worker resta al suo posto.
+    """
+    claim = percorso_claim(directory, indice)
+    if not claim_proprio(claim):
+        return
+    try:
+        os.unlink(claim)
+    except FileNotFoundError:
+        pass
+
+
+# --- Calcolo ---
+
+def simula_shard(manifest: dict, indice: int, al_progresso=None) -> np.ndarray:
+    """
+    Calcola le righe di uno shard: per ogni configurazione un'unica estrazione Monte Carlo
+    (simula_campioni_agronomici) valutata su tutti i punti della griglia economica.
+    Il seme di ogni configurazione dipende solo da seed e chiave, quindi il risultato non
+    dipende da come lo spazio è diviso in shard né da quale processo li calcola.
+    """
+    punti = punti_economici(manifest['griglia_economica'])
+    inizio = indice * manifest['dimensione_shard']
+    chiavi = range(inizio, min(inizio + manifest['dimensione_shard'], manifest['n_configurazioni']))
+
+    righe = np.empty(len(chiavi) * len(punti), dtype=DTYPE_SWEEP)
+    for posizione, chiave in enumerate(chiavi):
+        campioni = simula_campioni_agronomici(MODELLO.decodifica(chiave), manifest['n_campioni'],
+                                              seed=np.random.SeedSequence([manifest['seed'], chiave]))
+        blocco = righe[posizione * len(punti):(posizione + 1) * len(punti)]
+        blocco['chiave'] = chiave
+        for j, parametro in enumerate(PARAMETRI_ECONOMICI):
+            blocco[parametro] = punti[:, j]
+        for grandezza in ('produzione', 'acqua', 'fertilizzanti'):
+            for statistica, valore in riassumi_campioni(campioni[grandezza]).items():
+                blocco[f"{grandezza}_{statistica}"] = valore
+        for k, punto in enumerate(punti):
+            completi = aggiungi_finanza(campioni, *punto)
+            for grandezza in ('ricavi', 'costi', 'profitto'):
+                for statistica, valore in riassumi_campioni(completi[grandezza]).items():
+                    blocco[f"{grandezza}_{statistica}"][k] = valore
+        if al_progresso is not None:
+            al_progresso()
+    return righe
+
+
+def lavora(directory: str, scadenza_secondi: float = SCADENZA_CLAIM_SECONDI,
+           attesa_massima: float = ATTESA_MASSIMA_SECONDI) -> int:
+    """
+    Ciclo di un worker: prende in carico gli shard non completati uno alla volta, li calcola
+    e li pubblica atomicamente, finché tutti gli shard sono completi. Se i mancanti sono tutti
+    in carico ad altri processi attende (con attesa crescente fino ad attesa_massima) e riprova,
+    così recupera anche i claim che nel frattempo scadono. Uno shard il cui claim passa a un altro
+    processo durante il calcolo viene abbandonato. Restituisce il numero di shard calcolati da
+    questo processo.
+    """
+    def rinnova(indice):
+        if not rinnova_shard(directory, indice):
+            raise ClaimPerso(f"Il claim dello shard {indice} è passato a un altro processo")
+
+    manifest = leggi_manifest(directory)
+    calcolati = 0
+    attesa = ATTESA_INIZIALE_SECONDI
+    while True:
+        mancanti = [indice for indice in range(manifest['n_shard']) if not shard_completato(directory, indice)]
+        if not mancanti:
+            return calcolati
+        presi = 0
+        for indice in mancanti:
+            if shard_completato(directory, indice) or not prendi_shard(directory, indice, scadenza_secondi):
+                continue
+            try:
+                righe = simula_shard(manifest, indice, al_progresso=lambda: rinnova(indice))
+                salva_tabella_scenari(righe, percorso_shard(directory, indice))
+                calcolati += 1
+                presi += 1
+            except ClaimPerso:
+                continue
+            finally:
+                rilascia_shard(directory, indice)
+        if presi:
+            attesa = ATTESA_INIZIALE_SECONDI
+        else:
+            time.sleep(attesa)
+            attesa = min(2 * attesa, attesa_massima)
+
+
+def esegui_sweep(directory: str, griglia: dict = None, n_campioni: int = 100_000, seed: int = 0,
+                 dimensione_shard: int = 256, n_processi: int = 1) -> int:
+    """
+    Avvia (o riprende) uno sweep con n_processi worker locali. Gli shard già presenti su
+    disco vengono saltati; altri host possono lavorare in parallelo sulla stessa directory.
+    """
+    prepara_job(directory, griglia, n_campioni, seed, dimensione_shard)
+    n_processi = n_processi or os.cpu_count() or 1
+    if n_processi == 1:
+        return lavora(directory)
+    with ProcessPoolExecutor(max_workers=n_processi) as pool:
+        return sum(pool.map(lavora, [directory] * n_processi))
+
+
+# --- Unione dei risultati ---
+
+def unisci_shard(directory: str) -> np.ndarray:
+    """
+    Unisce tutti gli shard in un unico file risultati.npy (scritto su disco shard per shard,
+    senza caricarli tutti in memoria) e lo restituisce in memory mapping.
+    """
+    manifest = leggi_manifest(directory)
+    mancanti = [i for i in range(manifest['n_shard']) if not shard_completato(directory, i)]
+    if mancanti:
+        raise ErroreSweep(f"Sweep incompleto: mancano {len(mancanti)} shard su {manifest['n_shard']}")
+
+    n_righe = manifest['n_configurazioni'] * len(punti_economici(manifest['griglia_economica']))
+    descrittore, temporaneo = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(descrittore)
+    try:
+        risultati = np.lib.format.open_memmap(temporaneo, mode='w+', dtype=DTYPE_SWEEP, shape=(n_righe,))
+        posizione = 0
+        for indice in range(manifest['n_shard']):
+            shard = np.load(percorso_shard(directory, indice), mmap_mode='r')
+            risultati[posizione:posizione + len(shard)] = shard
+            posizione += len(shard)
+        if posizione != n_righe:
+            raise ErroreSweep(f"Gli shard contengono {posizione} righe invece di {n_righe}")
+        risultati.flush()
+        del risultati
+        os.chmod(temporaneo, 0o644)
+        os.replace(temporaneo, percorso_risultati(directory))
+    except BaseException:
+        os.unlink(temporaneo)
+        raise
+    return np.load(percorso_risultati(directory), mmap_mode='r')
+
+
+def risultati_come_dataframe(risultati: np.ndarray) -> pd.DataFrame:
+    """
+    Converte i risultati dello sweep in un DataFrame con i fattori in chiaro.
+    """
+    codici = MODELLO.codici_da_chiavi(np.asarray(risultati['chiave']))
+    df = pd.DataFrame({id_fattore: pd.Categorical.from_codes(codici[:, i], MODELLO.opzioni[id_fattore])
+                       for i, id_fattore in enumerate(MODELLO.fattori)})
+    for campo in DTYPE_SWEEP.names:
+        df[campo] = risultati[campo]
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep Monte Carlo riprendibile dello spazio dei fattori")
+    sotto = parser.add_subparsers(dest='comando', required=True)
+    avvia = sotto.add_parser('avvia', help="avvia o riprende lo sweep nella directory indicata")
+    avvia.add_argument('directory')
+    avvia.add_argument('--campioni', type=int, default=100_000)
+    avvia.add_argument('--seed', type=int, default=0)
+    avvia.add_argument('--dimensione-shard', type=int, default=256)
+    avvia.add_argument('--processi', type=int, default=1, help="worker locali (0 = tutti i core)")
+    sotto.add_parser('stato', help="mostra l'avanzamento").add_argument('directory')
+    sotto.add_parser('unisci', help="unisce gli shard in risultati.npy").add_argument('directory')
+    argomenti = parser.parse_args()
+
+    if argomenti.comando == 'avvia':
+        calcolati = esegui_sweep(argomenti.directory, n_campioni=argomenti.campioni, seed=argomenti.seed,
+                                 dimensione_shard=argomenti.dimensione_shard, n_processi=argomenti.processi)
+        print(f"Shard calcolati da questa esecuzione: {calcolati}")
+        print(stato_job(argomenti.directory))
+    elif argomenti.comando == 'stato':
+        print(stato_job(argomenti.directory))
+    else:
+        risultati = unisci_shard(argomenti.directory)
+        print(f"{len(risultati)} righe scritte in {percorso_risultati(argomenti.directory)}")
@@ -0,0 +1,140 @@
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import sweep
+
+# Prese in carico degli shard con più worker: claim scaduti, worker concorrenti e riavvii.
+# Eseguibile con: python -m unittest test_sweep
+
+
+def scrivi_claim(directory: str, indice: int, pid: int, eta_secondi: float = 0.0) -> str:
+    """
+    Crea il claim di uno shard a nome di un processo di questo host, con mtime indietro di eta_secondi.
+    """
+    claim = sweep.percorso_claim(directory, indice)
+    with open(claim, 'w') as file:
+        json.dump({'host': socket.gethostname(), 'pid': pid, 'inizio': time.time()}, file)
+    mtime = time.time() - eta_secondi
+    os.utime(claim, (mtime, mtime))
+    return claim
+
+
+def pid_terminato() -> int:
+    processo = subprocess.Popen([sys.executable, '-c', ''])
+    processo.wait()
+    return processo.pid
+
+
+def _worker_concorrente(directory, barriera, risultati):
+    barriera.wait()
+    risultati.put(sweep.prendi_shard(directory, 0, scadenza_secondi=60))
+
+
+class TestClaim(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_claim_di_processo_terminato_scade_subito(self):
+        claim = scrivi_claim(self.directory, 0, pid_terminato())
+        self.assertTrue(sweep.claim_scaduto(claim))
+        scrivi_claim(self.directory, 0, os.getpid())
+        self.assertFalse(sweep.claim_scaduto(claim))
+
+    def test_claim_ripreso_da_altri_non_viene_sottratto(self):
+        # Il controllo vede il claim scaduto, ma prima della rinomina un altro worker lo ha già
+        # sostituito con uno nuovo: la rinomina lo sposta, la verifica lo rimette al suo posto
+        claim = scrivi_claim(self.directory, 0, os.getpid())
+        with open(claim) as file:
+            contenuto = file.read()
+        verifiche = iter([True])
+        originale = sweep.claim_scaduto
+        with mock.patch.object(sweep, 'claim_scaduto',
+                               side_effect=lambda *args: next(verifiche, None) or originale(*args)):
+            self.assertFalse(sweep.prendi_shard(self.directory, 0))
+        with open(claim) as file:
+            self.assertEqual(file.read(), contenuto)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(claim)])
+
+    def test_claim_creato_da_un_terzo_non_toglie_il_claim_al_proprietario(self):
+        # Mentre il claim del proprietario è rinominato, un terzo processo ne crea uno nuovo:
+        # al ripristino resta quello del proprietario, e il terzo (qui questo processo) lo scopre al rinnovo
+        claim = scrivi_claim(self.directory, 0, os.getppid())
+        with open(claim) as file:
+            contenuto = file.read()
+        originale = sweep.claim_scaduto
+
+        def verifica(percorso, *args):
+            if percorso == claim:
+                return True
+            scrivi_claim(self.directory, 0, os.getpid())
+            return originale(percorso, *args)
+
+        with mock.patch.object(sweep, 'claim_scaduto', side_effect=verifica):
+            self.assertFalse(sweep.prendi_shard(self.directory, 0))
+        with open(claim) as file:
+            self.assertEqual(file.read(), contenuto)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(claim)])
+        self.assertFalse(sweep.rinnova_shard(self.directory, 0))
+
+    def test_rilascia_solo_il_proprio_claim(self):
+        claim = scrivi_claim(self.directory, 0, os.getppid())
+        sweep.rilascia_shard(self.directory, 0)
+        self.assertTrue(os.path.exists(claim))
+        os.unlink(claim)
+        self.assertTrue(sweep.prendi_shard(self.directory, 0))
+        sweep.rilascia_shard(self.directory, 0)
+        self.assertFalse(os.path.exists(claim))
+
+    def test_due_worker_su_un_claim_scaduto(self):
+        contesto = multiprocessing.get_context()
+        for _ in range(20):
+            claim = scrivi_claim(self.directory, 0, os.getpid(), eta_secondi=3600)
+            barriera, risultati = contesto.Barrier(2), contesto.Queue()
+            processi = [contesto.Process(target=_worker_concorrente, args=(self.directory, barriera, risultati))
+                        for _ in range(2)]
+            for processo in processi:
+                processo.start()
+            presi = [risultati.get(timeout=30) for _ in processi]
+            for processo in processi:
+                processo.join()
+            self.assertEqual(sorted(presi), [False, True])
+            self.assertEqual(os.listdir(self.directory), [os.path.basename(claim)])
+            os.unlink(claim)
+
+
+class TestLavora(unittest.TestCase):
+
+    def setUp(self):
+        # Job ridotto a 4 configurazioni in 2 shard, con un solo punto economico
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        griglia = {parametro: valori[:1] for parametro, valori in sweep.GRIGLIA_ECONOMICA_PREDEFINITA.items()}
+        manifest = sweep.crea_manifest(griglia, n_campioni=64, seed=0, dimensione_shard=2)
+        manifest.update(n_configurazioni=4, n_shard=2)
+        sweep.scrivi_json_atomico(manifest, sweep.percorso_manifest(self.directory))
+
+    def test_riprende_lo_shard_di_un_worker_terminato(self):
+        scrivi_claim(self.directory, 1, pid_terminato())
+        self.assertEqual(sweep.lavora(self.directory), 2)
+        self.assertEqual(sweep.stato_job(self.directory)['completati'], 2)
+
+    def test_attende_la_scadenza_dei_claim_attivi(self):
+        scrivi_claim(self.directory, 0, os.getpid())
+        inizio = time.monotonic()
+        self.assertEqual(sweep.lavora(self.directory, scadenza_secondi=0.5, attesa_massima=0.5), 2)
+        self.assertGreater(time.monotonic() - inizio, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
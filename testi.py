@@ -0,0 +1,231 @@
+# Testi statici della dashboard, condivisi tra il layout, i callback server e quelli clientside
+
+# Commento della vista produttiva: il segnaposto {produzione} (kg/m²) è sostituito con str.format
+COMMENTO_PRODUTTIVO = """
+    Questa sezione analizza i parametri selezionati al fine di determinare una stima di produzione annuale.
+    Basandosi sui suddetti parametri, la produzione annua stimata è di **{produzione:.2f} kg/m²**.
+
+    Il grafico confronta questo risultato con i benchmark di riferimento:
+    *   **Produzione Ottimale**: 8.50 kg/m²
+    *   **Produzione Media**: 5.50 kg/m²
+    *   **Produzione Sfavorevole**: 3.00 kg/m²
+
+    La resa produttiva è il risultato diretto delle scelte effettuate. Si noti che il **Sistema di Coltura** è uno dei fattori più determinanti. 
+    
+    Mentre i sistemi tradizionali tendono ad allinearsi con fatica a questi benchmark, le tecnologie avanzate come il **Fuori Suolo** e soprattutto l'**Idroponica a Ricircolo** hanno il potenziale per superarli ampiamente. Questo perché permettono un controllo capillare dell'ambiente di crescita, massimizzando l'efficienza della pianta.
+
+    Utilizzando i **PRESET PER TIPO DI COLTURA** si può osservare direttamente questa dinamica e vedere come una gestione ottimale possa portare a risultati produttivi al di sopra dei **10 kg/m²**.
+
+    *Nota: questa è una stima basata su un modello simulativo.*
+    """
+
+# Commento della vista risorse: segnaposti {acqua} (l/m²) e {fertilizzanti} (kg/m²)
+COMMENTO_RISORSE = """
+            Questa sezione analizza l'efficienza nell'uso delle risorse idriche e nutritive, fondamentali per una produzione di qualità.
+
+            #### Utilizzo dell'Acqua
+            Il consumo stimato è di **{acqua:.0f} l/m²**. Il range ottimale è 300-450 l/m². Condizioni sfavorevoli possono indicare:
+            *   **Carenza (< 300 l/m²)**: indica uno stress idrico che compromette la crescita della pianta e la pezzatura (dimensione) dei frutti.
+            *   **Spreco (> 650 l/m²)**: rappresenta un impatto economico e ambientale considerevole. Può creare condizioni di asfissia per le radici e favorire lo sviluppo di malattie fungine.
+
+            #### Utilizzo dei Fertilizzanti
+            Il consumo stimato è di **{fertilizzanti:.3f} kg/m²**. Questo valore rappresenta il consumo totale di elementi, calcolato sui fabbisogni principali della fragola: **Azoto (N)**, **Fosforo (P₂O₅)** e **Potassio (K₂O)**. Condizioni sfavorevoli possono indicare:
+            *   **Carenza (< 0.01 kg/m²)**: limita fortemente lo sviluppo vegetativo, la fioritura e l'ingrossamento dei frutti, riducendo la qualità del raccolto.
+            *   **Eccesso (> 0.02 kg/m²)**: oltre a essere un costo superfluo, può causare squilibri nutrizionali, eccessiva vegetazione a scapito dei frutti e potenziale inquinamento delle falde.
+            
+            In un sistema **Idroponico a Ricircolo**, i benchmark tradizionali vengono rivoluzionati: l'efficienza è massima perché acqua e nutrienti vengono recuperati e riutilizzati.
+            
+            **In questo scenario, un basso consumo non indica carenza, ma concreta efficienza.**
+
+            *   **Acqua**: minore sarà il valore, più il risultato sarà considerato eccellente, riflettendo un risparmio idrico che può arrivare fino al 90% rispetto alla coltura in suolo. Lo spreco è quasi nullo.
+            *   **Fertilizzanti**: allo stesso modo, il basso consumo è indice di una gestione ottimale, in ogni grammo di nutriente viene reso disponibile alla pianta, limitando la dispersione/spreco e garantendo un risparmio fino al 60% rispetto alla coltura in suolo. 
+            
+            I grafici mostrano come questa tecnologia ridefinisca il concetto di "ottimale".
+            
+            *Nota: questa è una stima basata su un modello simulativo.*
+            """
+
+# Commento della vista finanziaria: i segnaposto {ricavi}, {costi} e {profitto} (€/m², due decimali)
+# vengono sostituiti nel browser da assets/finanza.js
+COMMENTO_FINANZIARIO = """
+        Questa sezione analizza la sostenibilità economica della coltivazione, mostrando come le scelte agronomiche e i parametri di mercato si traducono in profitto.
+
+        **Interazione e Analisi "What-if":**
+        questa è la sezione più sensibile alle fluttuazioni di mercato. Modificando i **parametri economici** (soprattutto il **prezzo di vendita**) si può osservare come un piccolo cambiamento possa avere un impatto enorme sul profitto. Ad esempio, una produzione alta ad un prezzo di vendita basso potrebbe risultare meno redditizia di una produzione media venduta ad un prezzo più alto.
+
+        **Grafico di Flusso (Sankey)** a sinistra:
+        illustra il percorso economico complessivo. I **Ricavi Totali ({ricavi} €/m²)**, generati dalla vendita della produzione, si dividono in due flussi: i **Costi Totali ({costi} €/m²)** sostenuti e il **Profitto Lordo ({profitto} €/m²)** finale. Questo grafico evidenzia immediatamente la proporzione tra costi e ricavi.
+
+        **Grafico a Ciambella** a destra:
+        offre uno spaccato dettagliato dei **costi variabili**. Mostra il peso percentuale di ogni voce, consentendo di comprendere quali fattori incidono maggiormente sulle spese.
+
+        **Cosa si intende per "Altri Costi Variabili":**
+        questa macro-categoria include tutte le spese operative non legate direttamente ad acqua e fertilizzanti, come ad esempio:
+        *   Manodopera per trapianto, gestione e raccolta.
+        *   Costo delle piante e del materiale di propagazione.
+        *   Noleggio o acquisto di insetti impollinatori (bombi).
+        *   Energia elettrica per pompe e sistemi di controllo.
+        *   Materiali di consumo (es. substrati, teli per pacciamatura).
+        
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+# Modale informativo: Impollinazione controllata
+INFO_IMPOLLINAZIONE = """
+        L'impollinazione controllata, specialmente in coltura protetta (serre), è una tecnica fondamentale per garantire un'elevata qualità e uniformità dei frutti.
+
+        Vengono utilizzate arnie di **bombi** (solitamente della specie *Bombus terrestris*) posizionate direttamente tra le coltivazioni. A differenza delle api, i bombi sono impollinatori estremamente efficienti anche a basse temperature e in condizioni di luce non ottimali, tipiche dei periodi di produzione precoce della fragola.
+
+        Questa pratica assicura una fecondazione completa di ogni fiore, che si traduce in:
+        *   **Fragole ben formate e di calibro maggiore.**
+        *   **Riduzione drastica delle malformazioni.**
+        *   **Aumento del valore commerciale e della percentuale di prodotto di prima scelta.**
+
+        Come confermato da diverse realtà lucane nel Metapontino, l'uso dei bombi è ormai uno standard per le produzioni di alta qualità.
+        """
+
+# Modale informativo: Controllo dei patogeni
+INFO_PATOGENI = """
+        La gestione delle malattie e dei parassiti è cruciale per la fragolicoltura. Le principali strategie si differenziano per approccio e impatto ambientale.
+
+        #### Lotta Integrata
+        È l'approccio più moderno ed equilibrato, promosso a livello europeo. Non mira a eliminare completamente i patogeni, ma a mantenerli sotto una soglia di danno economico. Si basa su:
+        *   **Monitoraggio costante** delle colture per intervenire solo quando necessario.
+        *   **Utilizzo prioritario di metodi naturali**: insetti utili (antagonisti), trappole, pratiche agronomiche preventive.
+        *   **Interventi chimici mirati**: si ricorre a fitofarmaci solo come ultima risorsa, scegliendo prodotti a basso impatto ambientale e selettivi, per preservare gli organismi utili.
+        
+        È la strategia che garantisce il miglior compromesso tra efficacia, sostenibilità economica e rispetto per l'ambiente.
+
+        ---
+
+        #### Lotta Biologica
+        Prevede l'uso **esclusivo** di organismi viventi (predatori, parassitoidi), microrganismi (funghi, batteri) o sostanze di origine naturale per controllare i patogeni. **Vieta completamente l'uso di fitofarmaci di sintesi**. Sebbene sia la scelta più ecologica, può risultare meno efficace in caso di forti infestazioni.
+
+        #### Lotta Convenzionale (o a Calendario)
+        È l'approccio tradizionale, basato su trattamenti con fitofarmaci di sintesi eseguiti a scadenze fisse ("a calendario"), indipendentemente dalla reale presenza del patogeno. Pur essendo efficace nel breve termine, presenta maggiori rischi di inquinamento, sviluppo di resistenze nei patogeni e danni agli insetti impollinatori.
+        """
+
+# Modale informativo: Sistema di coltura
+INFO_COLTURA = """
+        Il sistema di coltura definisce l'ambiente in cui le radici della pianta si sviluppano e assorbono nutrienti, influenzando drasticamente l'efficienza e la produttività.
+
+        #### Suolo Tradizionale
+        Le piante vengono coltivate direttamente nel terreno agricolo, in campo aperto o in serre. È il metodo più classico e diffuso.
+        *   **Punti di Forza**: Bassi costi iniziali di impianto, minore complessità tecnologica.
+        *   **Punti di Debolezza**: Maggiore consumo di acqua e fertilizzanti (dovuto a perdite per percolazione ed evaporazione), difficoltà nel controllare patogeni del suolo (stanchezza del terreno), produzione soggetta alle condizioni pedoclimatiche.
+
+        ---
+
+        #### Fuori Suolo (Soilless)
+        Le piante crescono in contenitori (vasi, sacchi) riempiti con un substrato inerte (es. fibra di cocco, perlite, torba) anziché nel terreno. L'irrigazione e la nutrizione sono fornite tramite fertirrigazione a goccia.
+        *   **Punti di Forza**: Eliminazione dei problemi legati ai patogeni del suolo, controllo preciso della nutrizione, maggiore efficienza nell'uso delle risorse rispetto al suolo, produzioni più uniformi e anticipate.
+        *   **Punti di Debolezza**: Costo più elevato dell'impianto, necessità di gestire il drenaggio della soluzione nutritiva in eccesso (ciclo aperto).
+
+        ---
+
+        #### Idroponico a Ricircolo (Ciclo Chiuso)
+        È la forma più avanzata di fuori suolo. Le radici sono immerse direttamente in una soluzione nutritiva liquida o in un film d'acqua che scorre in canali. Non c'è substrato solido o è minimo.
+        *   **Punti di Forza**: **Massima efficienza** nell'uso di acqua e fertilizzanti (rispettivo risparmio fino al 90% e 60%), grazie al recupero e riutilizzo della soluzione nutritiva. Controllo totale dell'ambiente radicale, densità di impianto più elevate e produzioni potenzialmente maggiori.
+        *   **Punti di Debolezza**: **Costi di impianto molto elevati**, alta dipendenza dalla tecnologia (pompe, sensori, sistemi di controllo), rischio di rapida diffusione di malattie radicali in tutto il sistema in caso di contaminazione.
+        """
+
+# Modale del suggerimento di configurazione
+INFO_SUGGERIMENTO = """
+        Cerca le configurazioni con il **Profitto Lordo atteso più alto** (con i parametri economici della vista **Performance Finanziaria**) che rispettano i limiti indicati sul consumo atteso di **acqua** e **fertilizzanti**. I fattori spuntati, ad esempio quelli climatici, restano quelli attualmente selezionati.
+
+        Premere **Applica** su una delle proposte per copiarla nei menu di selezione.
+        """
+
+# Commento della vista Analisi Monte Carlo
+COMMENTO_MONTECARLO = """
+        Questa sezione stima la **variabilità** dei risultati, oltre al loro valore atteso: per la configurazione e i parametri economici selezionati vengono simulati fino a milioni di scenari casuali di produzione e consumo.
+
+        **Come funziona:**
+        scegliere il numero di scenari e premere **Avvia Analisi**. La simulazione viene eseguita in background: la barra mostra l'avanzamento e l'analisi può essere interrotta in qualunque momento con **Annulla**, mentre il resto della dashboard resta utilizzabile.
+
+        **Istogramma:**
+        mostra la distribuzione del **Profitto Lordo (€/m²)**. Le linee tratteggiate indicano il **5° percentile** (scenario sfavorevole), la **mediana** e il **95° percentile** (scenario favorevole): il 90% degli scenari simulati ricade tra le due linee rosse.
+
+        I parametri economici utilizzati sono quelli impostati nella vista **Performance Finanziaria**.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+# Commento della vista Confronto Scenari
+COMMENTO_CONFRONTO = """
+        Questa sezione confronta più configurazioni sugli **stessi scenari simulati** (numeri casuali comuni): in ogni scenario tutte le configurazioni incontrano le stesse condizioni favorevoli o sfavorevoli, quindi le differenze riflettono solo le scelte colturali e non il caso.
+
+        **Come funziona:**
+        selezionare le configurazioni da confrontare (la **prima** è il riferimento) e premere **Confronta**. Oltre alla configurazione corrente sono disponibili tutti i preset.
+
+        **Grafici:**
+        a sinistra il **Profitto Lordo atteso (€/m²)** di ciascuna configurazione; a destra la **differenza rispetto al riferimento**, con l'intervallo di confidenza al 95% ottenuto dal confronto appaiato (scuro) e quello che si avrebbe simulando le configurazioni separatamente (chiaro).
+
+        La tabella riporta anche la **probabilità di superare il riferimento** nei singoli scenari e di quanto il confronto appaiato riduce la varianza della stima.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+# Commento della vista Analisi di Sensibilità
+COMMENTO_SENSIBILITA = """
+        Questa sezione mostra **quali scelte e quali parametri economici pesano di più** sul Profitto Lordo della configurazione selezionata.
+
+        **Grafico a tornado:**
+        per ogni fattore il profitto atteso ottenuto con l'opzione **peggiore** (rosso) e con la **migliore** (verde), lasciando invariati tutti gli altri; per i parametri economici l'oscillazione è di **±20%** rispetto ai valori della vista **Performance Finanziaria**. Le barre più lunghe, in alto, indicano dove un cambiamento rende di più.
+
+        **Indici di Sobol:**
+        scompongono la **variabilità** del profitto, cioè l'incertezza che resta anche a configurazione fissata, tra i diversi input. L'indice del **primo ordine** misura l'effetto diretto dell'input, quello **totale** include le interazioni con gli altri.
+
+        I grafici si aggiornano automaticamente a ogni modifica di dropdown o parametri economici.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+# Commento della vista Frontiera di Sostenibilità
+COMMENTO_FRONTIERA = """
+        Questa sezione mostra il **compromesso** tra Profitto Lordo atteso, consumo di **acqua** e consumo di **fertilizzanti**, considerando tutte le combinazioni possibili dei fattori.
+
+        **Frontiera di Pareto:**
+        sono riportate solo le configurazioni **non dominate**, cioè quelle per cui nessun'altra configurazione ottiene un profitto almeno pari consumando al massimo la stessa acqua e gli stessi fertilizzanti. Spostarsi lungo la frontiera significa rinunciare a un po' di profitto per risparmiare risorse, o viceversa. Il colore indica il consumo di fertilizzanti; la stella è la configurazione attualmente selezionata.
+
+        **Come usarla:**
+        passando sopra un punto si leggono i fattori della configurazione; **cliccando** la configurazione viene caricata nei menu di selezione. La frontiera si ricalcola quando cambiano i parametri economici della vista **Performance Finanziaria**.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+COMMENTO_PAREGGIO = """
+        Questa sezione indica **quanto margine** ha ciascuna configurazione prima di andare in perdita, ai parametri economici della vista **Performance Finanziaria**.
+
+        **Indicatori:**
+        il **prezzo di pareggio** è il prezzo di vendita minimo che copre i costi attesi; la **resa di pareggio** è la produzione minima che li copre al prezzo corrente; il **margine di sicurezza** è la quota della produzione attesa che si può perdere restando in pari. La **probabilità di perdita** è la frequenza con cui il profitto risulta negativo su migliaia di scenari simulati, gli stessi per tutte le configurazioni.
+
+        **Classifica:**
+        tutte le combinazioni dei fattori sono valutate insieme e ordinate per robustezza secondo il criterio scelto; la tabella mostra le prime, con i fattori che cambiano rispetto alla configurazione corrente. Il pulsante **Scarica CSV** esporta la classifica completa.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+COMMENTO_FLUSSO = """
+        Questa sezione ripartisce la simulazione **mese per mese**, su una o più stagioni consecutive, seguendo il **calendario colturale** della fragola nel Metapontino (pulsante **Distribuzione Mensile**).
+
+        **Come è costruita:**
+        produzione e consumi di ogni stagione sono distribuiti sui mesi con i pesi del calendario; i ricavi usano una **curva mensile dei prezzi**, con il premio di inizio campagna e i prezzi più bassi durante il picco di raccolta, più un'oscillazione casuale di ogni mese. Gli altri costi variabili sono ripartiti in modo uniforme sull'anno. Con la curva **costante** il prezzo è lo stesso tutto l'anno.
+
+        **Grafico:**
+        le barre sono il flusso di cassa medio di ciascun mese (verde se positivo, rosso se negativo) con l'intervallo tra 5° e 95° percentile; la linea è il **flusso cumulato** dall'inizio della prima stagione, con la relativa fascia di incertezza. Nei mesi di trapianto e riposo vegetativo il flusso è tipicamente negativo: il cumulato mostra quanta liquidità serve prima che la raccolta la restituisca.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """
+
+COMMENTO_PORTAFOGLIO = """
+        Questa sezione simula un intero **portafoglio di appezzamenti**, anche di più aziende, e ne somma produzione, consumi e profitto.
+
+        **Come caricarlo:**
+        un file CSV con una riga per appezzamento e le colonne **azienda**, **superficie** (m²) e i nove fattori agronomici, con le stesse opzioni dei menu di selezione. Le colonne facoltative *prezzo_vendita_kg*, *costo_acqua_m3*, *costo_fert_kg* e *costi_extra_ha* indicano parametri economici specifici dell'appezzamento; dove mancano valgono quelli della vista **Performance Finanziaria**. Il pulsante **Portafoglio di Esempio** genera 10.000 appezzamenti di 20 aziende a partire dai preset.
+
+        **Come è calcolato:**
+        gli appezzamenti con la stessa configurazione sono simulati una sola volta e pesati per la loro superficie, così anche centinaia di migliaia di appezzamenti richiedono pochi secondi. Tutti gli appezzamenti vivono **la stessa stagione**: le incertezze del modello sono comuni e l'intervallo tra 5° e 95° percentile dei totali è quindi prudenziale.
+
+        *Nota: questa è una stima basata su un modello simulativo.*
+        """